@@ -1,9 +1,23 @@
 import os
+import re
+import json
+import asyncio
 import sqlite3
 import logging
-from fastapi import FastAPI, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
-from fetch_listings import init_db
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from fetch_listings import init_db, close_shared_browser_pool, read_generation, read_listing_counts
+from db import get_database, close_databases
+from response_cache import ResponseCache
+from events import event_bus
+from jobs import JobRunner
+from scheduler import SourceScheduler
+from metrics import MetricsWriter, write_fetch_metrics
+from seen_writer import SeenCoalescer
 
 # Configure logging
 logging.basicConfig(
@@ -17,12 +31,70 @@ app = FastAPI(title="OldTimeCrank Search Engine")
 # Get database path from environment variable or default to local path
 DATABASE_PATH = os.environ.get("DATABASE_PATH", "./data/listings.db")
 
+# Pooled readers and the serialized writer shared with background fetches
+database = get_database(DATABASE_PATH)
+
+# Single-flight fetch jobs (FETCH_JOB_MODE=thread|process)
+job_runner = JobRunner()
+
+# Seen updates from all requests, written in coalesced transactions
+seen_writer = SeenCoalescer(database)
+
+# Read-only endpoints served through the response cache
+CACHED_PATHS = {"/api/listings", "/api/listings/sources", "/api/listings/changes", "/api/search", "/api/status"}
+response_cache = ResponseCache(max_entries=int(os.environ.get("RESPONSE_CACHE_ENTRIES", "256")))
+
 # Initialize database on startup
 @app.on_event("startup")
 def startup_event():
     logger.info("Initializing database on startup...")
     init_db()
 
+@app.on_event("shutdown")
+def shutdown_event():
+    job_runner.shutdown()
+    close_shared_browser_pool()
+    seen_writer.close()
+    close_databases()
+
+def _current_generation():
+    """Database generation for cache validation, or None when there is no database yet."""
+    if not os.path.exists(DATABASE_PATH):
+        return None
+    try:
+        with database.reader() as conn:
+            return read_generation(conn.cursor())
+    except sqlite3.Error:
+        return None
+
+@app.middleware("http")
+async def cache_read_endpoints(request: Request, call_next):
+    """Serves cached JSON for read endpoints until the DB generation moves, with ETag/304 support."""
+    if request.method != "GET" or request.url.path not in CACHED_PATHS:
+        return await call_next(request)
+
+    generation = await run_in_threadpool(_current_generation)
+    if generation is None:
+        return await call_next(request)
+
+    key = ResponseCache.make_key(request.url.path, request.query_params)
+    entry = response_cache.get(key, generation)
+    if entry is None:
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        entry = response_cache.put(key, generation, body)
+
+    etag, body = entry
+    # no-cache lets browsers keep the body but revalidate it on every poll
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get("/")
 def read_root():
     """Serves the static index.html dashboard."""
@@ -35,27 +107,174 @@ def read_root():
             content={"error": "index.html dashboard file not found in root directory."}
         )
 
+# Page size bounds for /api/listings
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+LISTING_COLUMNS = "id, listing_id, title, price, price_cents, location, source, url, image_url, posted_at, posted_ts, first_seen_at, seen, keyword, change_seq, canonical_id, score, classification"
+
+# sort name -> (key column, direction); every sort breaks ties on id in the same direction
+LISTING_SORTS = {
+    "newest": ("posted_ts", "DESC"),
+    "price_asc": ("price_cents", "ASC"),
+    "price_desc": ("price_cents", "DESC"),
+    "score": ("score", "DESC")
+}
+
+# Keyset cursors tag the sort value's type: scores are REAL, the other sort keys integers,
+# and a REAL such as 1e-05 cannot be told from an integer by its text
+CURSOR_TYPES = {"i": int, "f": float}
+
+def _encode_cursor(sort_value, row_id):
+    tag = "f" if isinstance(sort_value, float) else "i"
+    return f"{tag}:{sort_value!r}:{row_id}"
+
+def _decode_cursor(cursor):
+    """(sort value, row id) from a next_cursor; raises ValueError for anything else."""
+    tag, sort_value, row_id = cursor.split(":")
+    if tag not in CURSOR_TYPES:
+        raise ValueError(f"Unknown cursor type '{tag}'")
+    return CURSOR_TYPES[tag](sort_value), int(row_id)
+
+def _parse_date_param(value, end_of_day=False):
+    """Converts an ISO date or datetime query param to epoch seconds."""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return int(parsed.timestamp())
+
+def _fts_query(text):
+    """Turns free text into an FTS5 query: every word must match, each as a prefix."""
+    terms = re.findall(r"\w+", text or "")
+    return " ".join(f'"{term}"*' for term in terms)
+
+def _build_listing_filters(source=None, q=None, min_price=None, max_price=None, seen=None, since=None, until=None, dedupe=False,
+                           min_score=None, classification=None, archived=False):
+    """
+    Translates the /api/listings filter params into WHERE clauses and bound params.
+
+    archived=True builds them for listings_archive, which has no FTS index: each word of q
+    must then appear somewhere in the title, location or keyword.
+    """
+    clauses = []
+    params = []
+    if dedupe:
+        # Only the canonical (oldest) listing of each near-duplicate group
+        clauses.append("(canonical_id IS NULL OR canonical_id = id)")
+    if source:
+        clauses.append("source = ?")
+        params.append(source)
+    if archived:
+        for term in re.findall(r"\w+", q or ""):
+            clauses.append("(title LIKE ? OR location LIKE ? OR keyword LIKE ?)")
+            params.extend([f"%{term}%"] * 3)
+    else:
+        match = _fts_query(q)
+        if match:
+            clauses.append("id IN (SELECT rowid FROM listings_fts WHERE listings_fts MATCH ?)")
+            params.append(match)
+    # Prices are given in dollars; unpriced listings never match a price bound
+    if min_price is not None:
+        clauses.append("price_cents >= ?")
+        params.append(int(round(min_price * 100)))
+    if max_price is not None:
+        clauses.append("price_cents <= ?")
+        params.append(int(round(max_price * 100)))
+    if seen is not None:
+        clauses.append("seen = ?")
+        params.append(1 if seen else 0)
+    if since:
+        clauses.append("posted_ts >= ?")
+        params.append(_parse_date_param(since))
+    if until:
+        # A bare date includes that whole day
+        clauses.append("posted_ts < ?")
+        params.append(_parse_date_param(until, end_of_day=True))
+    # Stored by scoring.py at ingest; listings not scored yet never match a score bound
+    if min_score is not None:
+        clauses.append("score >= ?")
+        params.append(min_score)
+    if classification:
+        clauses.append("classification = ?")
+        params.append(classification.upper())
+    return clauses, params
+
 @app.get("/api/listings")
-def get_listings():
-    """Queries the SQLite listings table and returns all listings sorted by posted_at DESC."""
+def get_listings(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    source: Optional[str] = None,
+    q: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    seen: Optional[bool] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    sort: str = "newest",
+    dedupe: bool = False,
+    min_score: Optional[float] = Query(None, ge=0, le=10),
+    classification: Optional[str] = None,
+    include_archived: bool = False
+):
+    """
+    Returns one page of listings with optional server-side filters.
+
+    sort is newest (default), price_asc, price_desc or score (most relevant first);
+    price sorts only include priced listings and the score sort only scored ones.
+    min_score and classification (MACHINE, PARTS, RECORDS, REPRODUCTION, UNKNOWN)
+    filter on the stored relevance score. Pages are keyset-paginated on (sort key, id): pass the
+    returned next_cursor to get the following page. since/until accept ISO
+    dates or datetimes. dedupe=true hides reposts and cross-search copies,
+    keeping the canonical listing of each group. include_archived=true also pages through
+    listings moved to listings_archive by retention.py (archived is 1 on those rows).
+    """
+    if sort not in LISTING_SORTS:
+        return JSONResponse(status_code=400, content={"error": f"Unknown sort '{sort}'."})
+    sort_column, direction = LISTING_SORTS[sort]
+
     if not os.path.exists(DATABASE_PATH):
-        return []
+        return {"listings": [], "next_cursor": None}
+
+    # Archived rows keep their ids, which never collide with live ones (AUTOINCREMENT),
+    # so one (sort key, id) cursor pages through both tables
+    tables = ("listings", "listings_archive") if include_archived else ("listings",)
+    order = f"ORDER BY {sort_column} {direction}, id {direction}"
+    branches = []
+    params = []
+    try:
+        for table in tables:
+            archived = table == "listings_archive"
+            clauses, branch_params = _build_listing_filters(source, q, min_price, max_price, seen, since, until, dedupe,
+                                                            min_score, classification, archived)
+            if sort_column in ("price_cents", "score"):
+                clauses.append(f"{sort_column} IS NOT NULL")
+            if cursor:
+                clauses.append(f"({sort_column}, id) {'<' if direction == 'DESC' else '>'} (?, ?)")
+                branch_params.extend(_decode_cursor(cursor))
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            # Fetch one extra row to learn whether another page exists
+            branches.append(f"SELECT * FROM (SELECT {LISTING_COLUMNS}, {int(archived)} AS archived FROM {table} {where} {order} LIMIT ?)")
+            params.extend(branch_params)
+            params.append(limit + 1)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid cursor or date filter."})
+
+    query = branches[0] if len(branches) == 1 else f"{' UNION ALL '.join(branches)} {order} LIMIT ?"
+    if len(branches) > 1:
+        params.append(limit + 1)
 
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, title, price, location, source, url, image_url, posted_at, first_seen_at, seen, keyword 
-            FROM listings 
-            ORDER BY datetime(posted_at) DESC, id DESC
-        """)
-        
-        rows = cursor.fetchall()
-        listings = [dict(row) for row in rows]
-        conn.close()
-        return listings
+        with database.reader() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        listings = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = listings[-1]
+            next_cursor = _encode_cursor(last[sort_column], last["id"])
+        return {"listings": listings, "next_cursor": next_cursor}
     except Exception as e:
         logger.error(f"Error reading listings: {e}")
         return JSONResponse(
@@ -63,6 +282,166 @@ def get_listings():
             content={"error": "Failed to retrieve listings from database."}
         )
 
+@app.get("/api/listings/sources")
+def get_listing_sources():
+    """Returns the distinct source names present in the listings table."""
+    if not os.path.exists(DATABASE_PATH):
+        return []
+
+    try:
+        with database.reader() as conn:
+            # Skip-scan the source index: one seek per distinct source instead of a full scan
+            rows = conn.execute("""
+                WITH RECURSIVE sources(source) AS (
+                    SELECT MIN(source) FROM listings
+                    UNION ALL
+                    SELECT (SELECT MIN(source) FROM listings WHERE source > sources.source)
+                    FROM sources WHERE sources.source IS NOT NULL
+                )
+                SELECT source FROM sources WHERE source IS NOT NULL
+            """).fetchall()
+
+        return [row[0] for row in rows]
+    except Exception as e:
+        logger.error(f"Error reading listing sources: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Failed to retrieve listing sources from database."}
+        )
+
+@app.get("/api/listings/changes")
+def get_listing_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    """
+    Returns listings inserted or marked seen after the change cursor since, oldest change first.
+
+    Start with since=0 (or the largest change_seq already held) and pass next_cursor back;
+    it only moves forward, so a poller transfers each change once. has_more means another
+    page is ready now.
+    """
+    if not os.path.exists(DATABASE_PATH):
+        return {"changes": [], "next_cursor": since, "has_more": False}
+
+    try:
+        with database.reader() as conn:
+            rows = conn.execute(f"""
+                SELECT {LISTING_COLUMNS}
+                FROM listings
+                WHERE change_seq > ?
+                ORDER BY change_seq
+                LIMIT ?
+            """, (since, limit + 1)).fetchall()
+
+        changes = [dict(row) for row in rows[:limit]]
+        next_cursor = changes[-1]["change_seq"] if changes else since
+        return {"changes": changes, "next_cursor": next_cursor, "has_more": len(rows) > limit}
+    except Exception as e:
+        logger.error(f"Error reading listing changes: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Failed to retrieve listing changes from database."}
+        )
+
+@app.get("/api/listings/{listing_rowid}/duplicates")
+def get_listing_duplicates(listing_rowid: int):
+    """Returns the near-duplicate group of a listing (by row id), canonical listing first."""
+    if not os.path.exists(DATABASE_PATH):
+        return JSONResponse(status_code=404, content={"error": "Listing not found."})
+
+    try:
+        with database.reader() as conn:
+            row = conn.execute("SELECT canonical_id FROM listings WHERE id = ?", (listing_rowid,)).fetchone()
+            if row is None:
+                return JSONResponse(status_code=404, content={"error": "Listing not found."})
+            canonical_id = row["canonical_id"] or listing_rowid
+            rows = conn.execute(f"""
+                SELECT {LISTING_COLUMNS}
+                FROM listings
+                WHERE canonical_id = ? OR id = ?
+                ORDER BY id
+            """, (canonical_id, canonical_id)).fetchall()
+
+        return {"canonical_id": canonical_id, "listings": [dict(row) for row in rows]}
+    except Exception as e:
+        logger.error(f"Error reading duplicates of listing {listing_rowid}: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Failed to retrieve duplicate listings."}
+        )
+
+@app.get("/api/sources")
+def get_sources():
+    """Configured sources with their health and the time each may next be fetched."""
+    from fetch_listings import build_source, SOURCES_PATH
+    if not os.path.exists(SOURCES_PATH):
+        return JSONResponse(status_code=404, content={"error": "sources.json not found."})
+
+    try:
+        with open(SOURCES_PATH, "r", encoding="utf-8") as f:
+            sources = [build_source(config) for config in json.load(f)]
+
+        scheduler = SourceScheduler()
+        if os.path.exists(DATABASE_PATH):
+            with database.reader() as conn:
+                scheduler.load(conn.cursor())
+        return scheduler.describe(sources)
+    except Exception as e:
+        logger.error(f"Error reading source schedule: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Failed to retrieve source schedule."}
+        )
+
+@app.get("/api/search")
+def search_listings(
+    q: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """
+    Full-text search over title, location and keyword, best matches first.
+
+    Each word in q is matched as a prefix; results are ranked with BM25 weighting
+    title above location above keyword. Pass next_cursor back as cursor to page.
+    """
+    match = _fts_query(q)
+    if not match or not os.path.exists(DATABASE_PATH):
+        return {"listings": [], "next_cursor": None}
+
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid cursor."})
+
+    try:
+        # Rank inside FTS5 first so only the requested page is joined back to listings
+        columns = ", ".join(f"l.{column.strip()}" for column in LISTING_COLUMNS.split(","))
+        with database.reader() as conn:
+            rows = conn.execute(f"""
+                SELECT {columns}, hits.rank AS rank
+                FROM (
+                    SELECT rowid, rank
+                    FROM listings_fts
+                    WHERE listings_fts MATCH ? AND rank MATCH 'bm25(10.0, 2.0, 1.0)'
+                    ORDER BY rank
+                    LIMIT ? OFFSET ?
+                ) AS hits
+                JOIN listings l ON l.id = hits.rowid
+                ORDER BY hits.rank
+            """, (match, limit + 1, offset)).fetchall()
+
+        listings = [dict(row) for row in rows[:limit]]
+        next_cursor = str(offset + limit) if len(rows) > limit else None
+        return {"listings": listings, "next_cursor": next_cursor}
+    except Exception as e:
+        logger.error(f"Error searching listings: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Failed to search listings."}
+        )
+
 @app.get("/api/status")
 def get_status():
     """Retrieves the last execution status and statistics from update_logs."""
@@ -70,24 +449,24 @@ def get_status():
         return {"status": "pending", "message": "Database not populated yet."}
 
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT status, checked_count, inserted_count, skipped_count, error_message, run_at 
-            FROM update_logs 
-            ORDER BY id DESC 
-            LIMIT 1
-        """)
-        
-        row = cursor.fetchone()
-        conn.close()
-        
+        with database.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT status, checked_count, inserted_count, skipped_count, error_message, run_at 
+                FROM update_logs 
+                ORDER BY id DESC 
+                LIMIT 1
+            """)
+
+            row = cursor.fetchone()
+
+            # Dashboard header counters, kept in app_meta by every write that changes them
+            total_listings, unseen_listings = read_listing_counts(cursor)
+
         if row:
-            return dict(row)
+            return {**dict(row), "total_listings": total_listings, "unseen_listings": unseen_listings}
         else:
-            return {"status": "pending", "message": "No update logs found."}
+            return {"status": "pending", "message": "No update logs found.", "total_listings": total_listings, "unseen_listings": unseen_listings}
     except Exception as e:
         logger.error(f"Error reading status logs: {e}")
         return JSONResponse(
@@ -102,17 +481,7 @@ def mark_as_seen(listing_id: str):
         return JSONResponse(status_code=404, content={"error": "Database not found."})
 
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE listings SET seen = 1 WHERE listing_id = ?", (listing_id,))
-        conn.commit()
-        updated = cursor.rowcount
-        conn.close()
-        
-        if updated > 0:
-            return {"status": "success", "message": f"Listing {listing_id} marked as seen."}
-        else:
-            return JSONResponse(status_code=404, content={"error": "Listing ID not found."})
+        result = seen_writer.mark_seen([listing_id])
     except Exception as e:
         logger.error(f"Error updating listing seen state: {e}")
         return JSONResponse(
@@ -120,13 +489,287 @@ def mark_as_seen(listing_id: str):
             content={"error": "Failed to update seen state."}
         )
 
-@app.post("/api/fetch")
-def trigger_fetch(background_tasks: BackgroundTasks, token: str = None):
-    """Triggers the listing fetch process in the background, authenticated by FETCH_TOKEN."""
+    if result["found"]:
+        return {"status": "success", "message": f"Listing {listing_id} marked as seen."}
+    else:
+        return JSONResponse(status_code=404, content={"error": "Listing ID not found."})
+
+# Most listings one POST /api/seen marks; larger filters report has_more
+SEEN_BULK_MAX = int(os.environ.get("SEEN_BULK_MAX", "5000"))
+
+class SeenRequest(BaseModel):
+    """POST /api/seen body: listing_ids, or /api/listings filters with an optional cursor."""
+    listing_ids: Optional[List[str]] = None
+    source: Optional[str] = None
+    q: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    since: Optional[str] = None
+    until: Optional[str] = None
+    dedupe: bool = False
+    min_score: Optional[float] = None
+    classification: Optional[str] = None
+    sort: str = "newest"
+    cursor: Optional[str] = None
+
+def _unseen_ids_matching(body):
+    """Unseen listing_ids matching the body's filters, up to and including the cursor row."""
+    sort_column, direction = LISTING_SORTS[body.sort]
+    clauses, params = _build_listing_filters(
+        body.source, body.q, body.min_price, body.max_price, False, body.since, body.until,
+        body.dedupe, body.min_score, body.classification
+    )
+    if sort_column in ("price_cents", "score"):
+        clauses.append(f"{sort_column} IS NOT NULL")
+    if body.cursor:
+        # The cursor is the last row the client loaded, so it is included
+        clauses.append(f"({sort_column}, id) {'>=' if direction == 'DESC' else '<='} (?, ?)")
+        params.extend(_decode_cursor(body.cursor))
+    with database.reader() as conn:
+        rows = conn.execute(f"""
+            SELECT listing_id FROM listings
+            WHERE {' AND '.join(clauses)}
+            ORDER BY {sort_column} {direction}, id {direction}
+            LIMIT ?
+        """, (*params, SEEN_BULK_MAX + 1)).fetchall()
+    return [row[0] for row in rows[:SEEN_BULK_MAX]], len(rows) > SEEN_BULK_MAX
+
+@app.post("/api/seen")
+def mark_many_as_seen(body: SeenRequest):
+    """
+    Marks many listings seen in one call: the given listing_ids, or every unseen listing
+    matching the /api/listings filters in the body. With a cursor (a next_cursor from
+    /api/listings), only rows up to and including that position are marked, i.e. the
+    pages the client has loaded. Writes share transactions with concurrent seen updates.
+    """
+    if not os.path.exists(DATABASE_PATH):
+        return JSONResponse(status_code=404, content={"error": "Database not found."})
+
+    has_more = False
+    if body.listing_ids is not None:
+        if len(body.listing_ids) > SEEN_BULK_MAX:
+            return JSONResponse(status_code=400, content={"error": f"At most {SEEN_BULK_MAX} listing_ids per request."})
+        listing_ids = body.listing_ids
+    else:
+        if body.sort not in LISTING_SORTS:
+            return JSONResponse(status_code=400, content={"error": f"Unknown sort '{body.sort}'."})
+        try:
+            listing_ids, has_more = _unseen_ids_matching(body)
+        except ValueError:
+            return JSONResponse(status_code=400, content={"error": "Invalid cursor or date filter."})
+        except Exception as e:
+            logger.error(f"Error selecting listings to mark seen: {e}")
+            return JSONResponse(status_code=500, content={"error": "Failed to update seen state."})
+
+    try:
+        result = seen_writer.mark_seen(listing_ids) if listing_ids else {"found": [], "changed": []}
+    except Exception as e:
+        logger.error(f"Error updating listing seen state: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Failed to update seen state."}
+        )
+
+    return {
+        "status": "success",
+        "requested": len(listing_ids),
+        "found": len(result["found"]),
+        "marked": len(result["changed"]),
+        "has_more": has_more
+    }
+
+# /api/stream tuning: idle poll interval (also the cross-process fallback), rows per
+# read, and the largest resume backlog replayed before telling the client to reload
+STREAM_POLL_SECONDS = float(os.environ.get("STREAM_POLL_SECONDS", "5"))
+STREAM_BATCH_SIZE = 200
+STREAM_MAX_BACKLOG = int(os.environ.get("STREAM_MAX_BACKLOG", "2000"))
+STREAM_RETRY_MS = 3000
+
+def _sse(event, data, event_id=None):
+    """Formats one Server-Sent Event."""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+def _stream_position():
+    """Newest listing id and update_logs id, where a fresh stream starts."""
+    with database.reader() as conn:
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM listings").fetchone()[0]
+        log_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM update_logs").fetchone()[0]
+    return max_id, log_id
+
+def _stream_backlog(last_id):
+    with database.reader() as conn:
+        return conn.execute("SELECT COUNT(*) FROM listings WHERE id > ?", (last_id,)).fetchone()[0]
+
+def _listings_after(last_id, limit):
+    with database.reader() as conn:
+        rows = conn.execute(f"""
+            SELECT {LISTING_COLUMNS} FROM listings WHERE id > ? ORDER BY id LIMIT ?
+        """, (last_id, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+def _runs_after(log_id):
+    with database.reader() as conn:
+        rows = conn.execute("""
+            SELECT id, status, checked_count, inserted_count, skipped_count, error_message, run_at
+            FROM update_logs WHERE id > ? ORDER BY id
+        """, (log_id,)).fetchall()
+    return [dict(row) for row in rows]
+
+@app.get("/api/stream")
+async def stream_events(request: Request, last_id: Optional[int] = None):
+    """
+    Server-Sent Events feed of new listings, seen updates and fetch run progress.
+
+    listing events carry the row id as the SSE id, so a reconnecting EventSource resumes
+    from Last-Event-ID (or ?last_id=) with only the rows it missed. Without either, the
+    stream starts at the newest listing. Rows are always read back from the database,
+    and it is polled every STREAM_POLL_SECONDS so writes from the cron process arrive too.
+    """
+    if not os.path.exists(DATABASE_PATH):
+        return JSONResponse(status_code=503, content={"error": "Database not populated yet."})
+
+    resume_header = request.headers.get("last-event-id")
+    if resume_header:
+        try:
+            last_id = int(resume_header)
+        except ValueError:
+            return JSONResponse(status_code=400, content={"error": "Invalid Last-Event-ID."})
+
+    async def events():
+        subscription = event_bus.subscribe()
+        try:
+            max_id, log_id = await run_in_threadpool(_stream_position)
+            cursor_id = max_id if last_id is None or last_id > max_id else last_id
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            if cursor_id < max_id and await run_in_threadpool(_stream_backlog, cursor_id) > STREAM_MAX_BACKLOG:
+                # Too far behind to replay: the client reloads from /api/listings instead
+                cursor_id = max_id
+                yield _sse("reset", {"last_id": cursor_id}, cursor_id)
+            else:
+                yield _sse("ready", {"last_id": cursor_id}, cursor_id)
+
+            while True:
+                while True:
+                    rows = await run_in_threadpool(_listings_after, cursor_id, STREAM_BATCH_SIZE)
+                    for row in rows:
+                        yield _sse("listing", row, row["id"])
+                    if rows:
+                        cursor_id = rows[-1]["id"]
+                    if len(rows) < STREAM_BATCH_SIZE:
+                        break
+
+                try:
+                    kind, data = await asyncio.wait_for(subscription.queue.get(), STREAM_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    kind, data = "poll", None
+
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    cursor_id, log_id = await run_in_threadpool(_stream_position)
+                    yield _sse("reset", {"last_id": cursor_id}, cursor_id)
+                elif kind in ("seen", "progress"):
+                    yield _sse(kind, data)
+                elif kind in ("run", "poll"):
+                    # Completed runs are read from update_logs so cron runs are reported too
+                    for run in await run_in_threadpool(_runs_after, log_id):
+                        log_id = run["id"]
+                        yield _sse("progress", {"phase": "done", **run})
+                    if kind == "poll":
+                        yield ": keepalive\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    """Response cache hit/miss counters for monitoring."""
+    return {**response_cache.stats(), "generation": _current_generation()}
+
+@app.get("/api/metrics")
+def get_metrics():
+    """Fetch run, response cache and stream metrics in the Prometheus text format."""
+    writer = MetricsWriter()
+    cache_stats = response_cache.stats()
+    writer.add("response_cache_hits_total", "counter", "Read requests served from the response cache.", cache_stats["hits"])
+    writer.add("response_cache_misses_total", "counter", "Read requests that ran the handler.", cache_stats["misses"])
+    writer.add("response_cache_not_modified_total", "counter", "Conditional requests answered with 304.", cache_stats["not_modified"])
+    writer.add("response_cache_entries", "gauge", "Responses held in the cache.", cache_stats["entries"])
+    writer.add("stream_subscribers", "gauge", "Open /api/stream connections.", event_bus.subscriber_count)
+    seen_stats = seen_writer.stats()
+    writer.add("seen_requests_total", "counter", "Seen update requests written by the coalescer.", seen_stats["requests"])
+    writer.add("seen_transactions_total", "counter", "Write transactions the seen coalescer committed.", seen_stats["transactions"])
+    writer.add("seen_listings_marked_total", "counter", "Listings flipped from unseen to seen.", seen_stats["rows_changed"])
+    jobs = job_runner.list()
+    writer.add("fetch_job_active", "gauge", "1 while a fetch job is queued or running.",
+               int(any(job["status"] in ("queued", "running") for job in jobs)))
+
+    if os.path.exists(DATABASE_PATH):
+        try:
+            with database.reader() as conn:
+                write_fetch_metrics(writer, conn.cursor())
+        except Exception as e:
+            logger.error(f"Error reading fetch metrics: {e}")
+            return JSONResponse(status_code=500, content={"error": "Failed to read fetch metrics."})
+
+    return Response(content=writer.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _authorized(token):
     expected_token = os.environ.get("FETCH_TOKEN")
-    if expected_token and token != expected_token:
+    return not expected_token or token == expected_token
+
+@app.post("/api/fetch")
+def trigger_fetch(token: str = None):
+    """
+    Starts a background fetch job, authenticated by FETCH_TOKEN, and returns its id.
+
+    Only one job runs at a time: while one is active the same job id is returned
+    with started=false instead of launching a second scrape.
+    """
+    if not _authorized(token):
+        return JSONResponse(status_code=401, content={"error": "Unauthorized. Invalid token."})
+
+    browser_pool = None
+    if job_runner.mode == "thread":
+        from fetch_listings import get_shared_browser_pool
+        # Reuse one Chromium across triggered runs instead of launching per source
+        browser_pool = get_shared_browser_pool()
+    job, started = job_runner.submit(browser_pool=browser_pool)
+    message = "Fetch job triggered in background." if started else "A fetch job is already running."
+    return {"status": "success", "message": message, "job_id": job.id, "started": started}
+
+@app.get("/api/jobs")
+def list_jobs():
+    """Recent fetch jobs, newest first."""
+    return job_runner.list()
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status and per-source progress of a fetch job."""
+    job = job_runner.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found."})
+    return job
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_job(job_id: str, token: str = None):
+    """Cancels a fetch job; sources already being fetched finish and are saved."""
+    if not _authorized(token):
         return JSONResponse(status_code=401, content={"error": "Unauthorized. Invalid token."})
 
-    from fetch_listings import fetch_and_save
-    background_tasks.add_task(fetch_and_save)
-    return {"status": "success", "message": "Fetch job triggered in background."}
+    job = job_runner.cancel(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found."})
+    if job["status"] not in ("queued", "running"):
+        return JSONResponse(status_code=409, content={"error": f"Job already {job['status']}."})
+    return job
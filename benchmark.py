@@ -0,0 +1,1090 @@
+"""
+Performance benchmarks for the OldTimeCrank fetch pipeline.
+
+Usage:
+    python benchmark.py browser [--sources N]
+    python benchmark.py conditional [--items N]
+    python benchmark.py ingest [--rows N]
+    python benchmark.py parse [--items N]
+    python benchmark.py extract [--rows N]
+    python benchmark.py loadtest [--clients N] [--requests N]
+    python benchmark.py schedule [--sources N] [--days N]
+    python benchmark.py seen [--clients N] [--clicks N]
+    python benchmark.py records [--items N]
+    python benchmark.py fixtures --output-dir DIR [--sizes N,N]
+    python benchmark.py pipeline [--sizes N,N] [--output results.json]
+    python benchmark.py compare BASELINE.json CURRENT.json
+"""
+import io
+import os
+import re
+import sys
+import json
+import math
+import time
+import logging
+import platform
+import subprocess
+import sqlite3
+import hashlib
+import tempfile
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime
+import random
+import socket
+import argparse
+import threading
+import statistics
+import http.client
+from contextlib import contextmanager, redirect_stdout
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+import fetch_listings
+from db import close_databases
+from fetch_listings import BrowserPool, CraigslistListingSource, ListingRecord, RssListingSource
+
+
+def generate_rdf_feed(item_count):
+    """Builds a Craigslist-style RDF feed with item_count items, shaped like sample_feed.xml."""
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" xmlns="http://purl.org/rss/1.0/" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:enc="http://purl.org/rss/1.0/modules/enc/">\n'
+        '<channel rdf:about="https://miami.craigslist.org/search/atq"><title>miami antiques - craigslist</title>'
+        '<link>https://miami.craigslist.org/search/atq</link></channel>\n'
+    ]
+    for i in range(item_count):
+        url = f"https://miami.craigslist.org/mdc/atq/d/miami-antique-victrola-{i}/{7900000000 + i}.html"
+        title = f"Antique Victrola Talking Machine No. {i}"
+        parts.append(
+            f'<item rdf:about="{url}"><title><![CDATA[{title} - ${100 + i % 900} (Miami)]]></title>'
+            f'<link>{url}</link><description><![CDATA[Oak cabinet, crank works.]]></description>'
+            f'<dc:date>2026-06-{1 + i % 28:02d}T12:00:00-04:00</dc:date><dc:title><![CDATA[{escape(title)}]]></dc:title>'
+            f'<enc:enclosure resource="https://images.craigslist.org/{i:05d}_600x450.jpg" type="image/jpeg"/></item>\n'
+        )
+    parts.append("</rdf:RDF>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def generate_rss2_feed(item_count):
+    """Builds an RSS 2.0 feed with item_count items."""
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0"><channel>'
+        '<title>antiques</title><link>https://tampa.craigslist.org/search/atq</link>\n'
+    ]
+    for i in range(item_count):
+        url = f"https://tampa.craigslist.org/hil/atq/d/tampa-edison-phonograph-{i}/{7800000000 + i}.html"
+        parts.append(
+            f'<item><title>Edison Cylinder Phonograph No. {i} - ${50 + i % 2000:,} (Tampa)</title>'
+            f'<link>{url}</link><description>Works well.</description>'
+            f'<enclosure url="https://images.craigslist.org/{i:05d}_300x300.jpg" type="image/jpeg"/></item>\n'
+        )
+    parts.append("</channel></rss>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def generate_search_page(row_count):
+    """Builds a Craigslist search results page (gallery layout) with row_count result rows."""
+    rows = []
+    for i in range(row_count):
+        pid = 7700000000 + i
+        href = f"https://miami.craigslist.org/mdc/atq/d/miami-victor-victrola-{i}/{pid}.html"
+        rows.append(
+            f'<div class="cl-search-result cl-search-view-mode-gallery" data-pid="{pid}">'
+            f'<a class="main" href="{href}"><img alt="" src="https://images.craigslist.org/{i:05d}_300x300.jpg"></a>'
+            f'<div class="gallery-card"><a class="cl-app-anchor text-only posting-title" href="{href}">'
+            f'<span class="label">Victor Victrola Talking Machine No. {i}</span></a>'
+            f'<div class="meta">6/{1 + i % 28}<span class="separator">·</span>Miami</div>'
+            f'<span class="priceinfo">${100 + i % 900}</span></div></div>\n'
+        )
+    return (
+        '<!DOCTYPE html><html><head><title>miami antiques "victrola" - craigslist</title></head>'
+        '<body><div class="results cl-results-page">\n' + "".join(rows) + '</div></body></html>'
+    )
+
+
+def generate_listings(count, offset=0):
+    """Synthetic ListingRecords as produced by the sources."""
+    return [
+        ListingRecord(
+            title=f"Antique Victrola Talking Machine No. {i}",
+            price=f"${100 + i % 900}",
+            location="Miami",
+            source="Bench Source",
+            url=f"https://miami.craigslist.org/mdc/atq/d/victrola-{i}/{7900000000 + i}.html",
+            image_url="https://www.transparenttextures.com/patterns/aged-paper.png",
+            posted_at=f"2026-06-{1 + i % 28:02d}T12:00:00-04:00",
+            listing_id=str(7900000000 + i),
+            keyword="victrola",
+            price_cents=(100 + i % 900) * 100
+        )
+        for i in range(offset, offset + count)
+    ]
+
+
+class FeedStubServer:
+    """Local stand-in for a feed host, honouring ETag/Last-Modified and counting bytes served."""
+
+    def __init__(self, body, validators=True):
+        self.body = body
+        self.validators = validators
+        self.etag = f'"{hash(body) & 0xffffffff:08x}"'
+        self.last_modified = formatdate(usegmt=True)
+        self.bytes_sent = 0
+        self.responses = []
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if stub.validators and (
+                    self.headers.get("If-None-Match") == stub.etag
+                    or self.headers.get("If-Modified-Since") == stub.last_modified
+                ):
+                    stub.responses.append(304)
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                stub.responses.append(200)
+                stub.bytes_sent += len(stub.body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/rdf+xml")
+                self.send_header("Content-Length", str(len(stub.body)))
+                if stub.validators:
+                    self.send_header("ETag", stub.etag)
+                    self.send_header("Last-Modified", stub.last_modified)
+                self.end_headers()
+                self.wfile.write(stub.body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/feed.rdf"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _load_configs(sources_path, source_type):
+    with open(sources_path, "r", encoding="utf-8") as f:
+        configs = json.load(f)
+    return [c for c in configs if c.get("type", "rss") == source_type and c.get("enabled", True)]
+
+
+def _timed_fetch(source):
+    started = time.perf_counter()
+    try:
+        count = len(source.fetch())
+        outcome = f"{count} rows"
+    except Exception as e:
+        outcome = f"error: {type(e).__name__}"
+    return time.perf_counter() - started, outcome
+
+
+def _print_latencies(label, results):
+    print(f"\n{label}")
+    for name, seconds, outcome in results:
+        print(f"  {name:<45} {seconds * 1000:>9.0f} ms  ({outcome})")
+    timings = [seconds for _, seconds, _ in results]
+    if timings:
+        print(f"  {'mean':<45} {statistics.mean(timings) * 1000:>9.0f} ms")
+        print(f"  {'total':<45} {sum(timings) * 1000:>9.0f} ms")
+
+
+def bench_browser(args):
+    """Per-source Craigslist latency: a Chromium launch per source vs. one shared BrowserPool."""
+    configs = _load_configs(args.sources_path, "craigslist")[:args.sources]
+    if not configs:
+        print("No enabled Craigslist sources to benchmark.")
+        return
+
+    # Before: every source launches and tears down its own browser
+    cold = []
+    for config in configs:
+        seconds, outcome = _timed_fetch(CraigslistListingSource(config))
+        cold.append((config.get("name"), seconds, outcome))
+    _print_latencies("Browser per source (launch + stealth + close each time)", cold)
+
+    # After: one pooled browser, contexts reused across sources
+    pool = BrowserPool()
+    warm = []
+    try:
+        for config in configs:
+            seconds, outcome = _timed_fetch(CraigslistListingSource(config, browser_pool=pool))
+            warm.append((config.get("name"), seconds, outcome))
+    finally:
+        pool.close()
+    _print_latencies("Shared BrowserPool (first source pays the launch)", warm)
+
+
+def bench_conditional(args):
+    """Repeat RSS fetches against a local stub: full download vs. 304 vs. unchanged-body hash."""
+    body = generate_rdf_feed(args.items)
+    config = {"id": "bench_feed", "name": "Bench Feed", "type": "rss", "region": "Miami", "keyword": "victrola"}
+
+    for label, validators in (("Server sends ETag/Last-Modified", True), ("Server sends no validators", False)):
+        stub = FeedStubServer(body, validators=validators)
+        config["url"] = stub.url
+        cache = None
+        print(f"\n{label} ({len(body)} byte feed, {args.items} items)")
+        try:
+            for run in range(1, 4):
+                source = RssListingSource(config)
+                source.http_cache = cache
+                started = time.perf_counter()
+                rows = source.fetch()
+                elapsed = time.perf_counter() - started
+                cache = source.http_validators
+                print(f"  run {run}: {elapsed * 1000:>8.1f} ms  cache={source.cache_status:<4}  "
+                      f"parsed={len(rows):>6}  http={stub.responses[-1]}  bytes_served={stub.bytes_sent}")
+        finally:
+            stub.close()
+
+
+def _legacy_ingest(conn, listings):
+    """The pre-batching insert loop: one execute and rowcount check per listing, one commit. Nothing is validated, so nothing is rejected."""
+    cursor = conn.cursor()
+    inserted = skipped = 0
+    for listing in listings:
+        cursor.execute(fetch_listings.INSERT_LISTING_SQL, listing + (0,))
+        if cursor.rowcount > 0:
+            inserted += 1
+        else:
+            skipped += 1
+    conn.commit()
+    return inserted, skipped, 0
+
+
+def bench_ingest(args):
+    """
+    Rows/sec for the per-row insert loop vs. ingest_listings, on fresh and fully-duplicate batches.
+
+    The per-row loop predates near-duplicate grouping and scoring, so it does neither;
+    ingest_listings does both. The last mode hashes fingerprints before the timed ingest,
+    as the fetch workers do, so its time is what the writer lock is held for.
+    """
+    from dedup import fingerprint_listings
+
+    listings = generate_listings(args.rows)
+    started = time.perf_counter()
+    fingerprints = fingerprint_listings(listings)
+    print(f"Fingerprinting {len(listings)} listings ahead of the writer: {time.perf_counter() - started:.2f}s")
+
+    def ingest_prehashed(conn, rows):
+        return fetch_listings.ingest_listings(conn, rows, fingerprints=fingerprints)
+
+    for label, ingest, connect in (
+        ("Per-row INSERT OR IGNORE (default journal, no dedup or scoring)", _legacy_ingest, lambda: sqlite3.connect(fetch_listings.DATABASE_PATH)),
+        ("ingest_listings (WAL, prefilter, executemany, dedup, scoring)", fetch_listings.ingest_listings, fetch_listings.connect_db),
+        ("ingest_listings, fingerprints hashed ahead", ingest_prehashed, fetch_listings.connect_db),
+    ):
+        with tempfile.TemporaryDirectory() as tmp:
+            fetch_listings.DATABASE_PATH = os.path.join(tmp, "bench.db")
+            fetch_listings.init_db()
+            close_databases()
+            conn = connect()
+            if ingest is _legacy_ingest:
+                conn.execute("PRAGMA journal_mode=DELETE;")
+            print(f"\n{label}")
+            for phase in ("new rows", "all duplicates"):
+                started = time.perf_counter()
+                inserted, skipped, rejected = ingest(conn, listings)
+                elapsed = time.perf_counter() - started
+                print(f"  {phase:<15} {len(listings) / elapsed:>10.0f} rows/sec  "
+                      f"({elapsed:.2f}s, inserted={inserted}, skipped={skipped}, rejected={rejected})")
+            conn.close()
+
+
+def _legacy_parse_rdf_or_rss(source, xml_content):
+    """The ElementTree findall/find_text parser that iter_rdf_or_rss replaced, kept for comparison."""
+    ns = {
+        'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+        'rss': 'http://purl.org/rss/1.0/',
+        'dc': 'http://purl.org/dc/elements/1.1/',
+        'enc': 'http://purl.org/rss/1.0/modules/enc/'
+    }
+    root = ET.fromstring(xml_content)
+    items = root.findall('.//item')
+    if not items:
+        items = root.findall('.//{http://purl.org/rss/1.0/}item')
+        if not items:
+            items = root.findall('item')
+
+    normalized_listings = []
+    for item in items:
+        def find_text(tag, default=""):
+            for prefix, uri in ns.items():
+                elem = item.find(f"{prefix}:{tag}", ns)
+                if elem is not None:
+                    return elem.text or default
+                elem = item.find(f"{{{uri}}}{tag}")
+                if elem is not None:
+                    return elem.text or default
+            elem = item.find(tag)
+            return elem.text if elem is not None else default
+
+        raw_title = find_text('title')
+        clean_title = find_text('title')
+        price = "N/A"
+        location = source.region
+        dc_title_elem = item.find('{http://purl.org/dc/elements/1.1/}title')
+        if dc_title_elem is not None and dc_title_elem.text:
+            clean_title = dc_title_elem.text
+        if raw_title:
+            price_match = re.search(r'\$([0-9,]+)', raw_title)
+            if price_match:
+                price = f"${price_match.group(1)}"
+            loc_match = re.search(r'\(([^)]+)\)\s*$', raw_title)
+            if loc_match:
+                location = loc_match.group(1)
+            if clean_title == raw_title:
+                clean_title = re.sub(r'\s+-\s+\$[0-9,]+.*$', '', raw_title)
+                clean_title = re.sub(r'\s*\([^)]+\)\s*$', '', clean_title).strip()
+        url = find_text('link')
+        if not url:
+            url = item.attrib.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about', '')
+        image_url = ""
+        enclosure = item.find('{http://purl.org/rss/1.0/modules/enc/}enclosure')
+        if enclosure is not None:
+            image_url = enclosure.attrib.get('resource', '')
+        else:
+            enclosure = item.find('enclosure')
+            if enclosure is not None:
+                image_url = enclosure.attrib.get('url', '')
+        posted_at = find_text('date')
+        if not posted_at:
+            posted_at = datetime.utcnow().isoformat()
+        listing_id = ""
+        if url:
+            id_match = re.search(r'/(\d+)\.html', url)
+            if id_match:
+                listing_id = id_match.group(1)
+            else:
+                listing_id = hashlib.md5(url.encode('utf-8')).hexdigest()
+        if not clean_title or not url:
+            continue
+        normalized_listings.append({
+            "title": clean_title,
+            "price": price,
+            "price_cents": fetch_listings.parse_price_cents(price),
+            "location": location,
+            "source": source.name,
+            "url": url,
+            "image_url": image_url or "https://www.transparenttextures.com/patterns/aged-paper.png",
+            "posted_at": posted_at,
+            "listing_id": listing_id,
+            "keyword": source.keyword
+        })
+    return normalized_listings
+
+
+def _measure(func):
+    """Runs func once for wall time, then again under tracemalloc for peak memory."""
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _as_dicts(listings):
+    # The legacy parser returns dicts, the sources ListingRecords
+    return [listing._asdict() if isinstance(listing, ListingRecord) else listing for listing in listings]
+
+
+def _comparable(listings):
+    # RSS 2.0 items carry no date, so posted_at is the parse time and differs between runs
+    return [{k: v for k, v in listing.items() if k != "posted_at"} for listing in _as_dicts(listings)]
+
+
+def bench_parse(args):
+    """Items/sec and peak memory of the findall parser vs. the streaming iterparse parser."""
+    source = RssListingSource({"name": "Bench Feed", "region": "Miami", "keyword": "victrola"})
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_feed.xml"), "rb") as f:
+        sample = f.read()
+    same = _as_dicts(_legacy_parse_rdf_or_rss(source, sample)) == _as_dicts(source.parse_rdf_or_rss(sample))
+    print(f"sample_feed.xml output identical: {same}")
+
+    for label, body in (("RDF", generate_rdf_feed(args.items)), ("RSS 2.0", generate_rss2_feed(args.items))):
+        print(f"\n{label} feed, {args.items} items, {len(body) / 1e6:.1f} MB")
+        legacy, legacy_time, legacy_peak = _measure(lambda: _legacy_parse_rdf_or_rss(source, body))
+        streamed, stream_time, stream_peak = _measure(lambda: sum(1 for _ in source.iter_rdf_or_rss(body)))
+        print(f"  findall parser     {len(legacy) / legacy_time:>10.0f} items/sec  peak {legacy_peak / 1e6:>7.1f} MB")
+        print(f"  iterparse stream   {streamed / stream_time:>10.0f} items/sec  peak {stream_peak / 1e6:>7.1f} MB")
+        print(f"  output identical: {_comparable(legacy) == _comparable(source.parse_rdf_or_rss(body))}")
+
+
+def bench_extract(args):
+    """Rows/sec and peak memory of Craigslist HTML extraction: BeautifulSoup vs. lxml."""
+    source = CraigslistListingSource({"name": "Bench CL", "url": "https://miami.craigslist.org/search/atq", "region": "Miami"})
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_search.html"), "r", encoding="utf-8") as f:
+        sample = f.read()
+    same = fetch_listings._extract_rows_bs4(sample) == fetch_listings._extract_rows_lxml(sample)
+    print(f"sample_search.html rows identical: {same}")
+
+    html = generate_search_page(args.rows)
+    print(f"\nSearch page, {args.rows} rows, {len(html) / 1e6:.1f} MB")
+    results = {}
+    for label, extract in (
+        ("html.parser + select_one (previous path)", fetch_listings._extract_rows_bs4),
+        ("lxml + XPath", fetch_listings._extract_rows_lxml),
+    ):
+        listings, elapsed, peak = _measure(lambda: source.normalize_rows(extract(html)))
+        results[label] = listings
+        print(f"  {label:<42} {len(listings) / elapsed:>9.0f} rows/sec  peak {peak / 1e6:>7.1f} MB")
+    print(f"  output identical: {len(set(json.dumps(r, sort_keys=True) for r in results.values())) == 1}")
+    print("  (the in-page page.evaluate extractor needs a live browser and is not measured offline)")
+
+
+class _ConnectPerRequest:
+    """The pre-pool access pattern: a fresh sqlite3 connection for every read and write."""
+
+    def __init__(self, path):
+        self.path = path
+
+    @contextmanager
+    def reader(self):
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def writer(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def _loadtest_request(connection, listing_count, write_ratio, rng):
+    """Issues one dashboard-shaped request and returns its kind."""
+    if rng.random() < write_ratio:
+        listing_id = 7900000000 + rng.randrange(listing_count)
+        connection.request("POST", f"/api/seen/{listing_id}")
+        kind = "POST /api/seen"
+    else:
+        path = rng.choice([
+            "/api/listings?limit=100",
+            "/api/listings?limit=100&seen=false",
+            f"/api/listings?limit=100&max_price={rng.randrange(100, 1000)}",
+            f"/api/listings?limit=100&cursor={1780000000 - rng.randrange(2000000)}:{rng.randrange(listing_count)}",
+            f"/api/listings?limit=100&q=victrola+{rng.randrange(100)}",
+            "/api/status",
+            f"/api/search?q=machine+{rng.randrange(1000)}",
+        ])
+        connection.request("GET", path)
+        kind = "GET " + path.split("?")[0]
+    response = connection.getresponse()
+    response.read()
+    if response.status >= 500:
+        raise RuntimeError(f"{kind} returned {response.status}")
+    return kind
+
+
+def _run_loadtest(port, args):
+    """Runs args.clients keep-alive clients to completion; returns latencies by request kind."""
+    latencies = {}
+    lock = threading.Lock()
+    per_client = args.requests // args.clients
+
+    def client(seed):
+        rng = random.Random(seed)
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local = {}
+        try:
+            for _ in range(per_client):
+                started = time.perf_counter()
+                kind = _loadtest_request(connection, args.rows, args.write_ratio, rng)
+                local.setdefault(kind, []).append(time.perf_counter() - started)
+        finally:
+            connection.close()
+        with lock:
+            for kind, timings in local.items():
+                latencies.setdefault(kind, []).extend(timings)
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - started
+
+
+def _percentile(timings, fraction):
+    """Nearest-rank percentile: always one of the samples, so p99 never exceeds max."""
+    ordered = sorted(timings)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def _print_percentiles(label, latencies, elapsed):
+    total = sum(len(timings) for timings in latencies.values())
+    print(f"\n{label}: {total} requests in {elapsed:.1f}s ({total / elapsed:.0f} req/s)")
+    print(f"  {'request':<26} {'count':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    everything = []
+    for kind in sorted(latencies):
+        timings = latencies[kind]
+        everything.extend(timings)
+        print(f"  {kind:<26} {len(timings):>6} {statistics.median(timings) * 1000:>8.1f} "
+              f"{_percentile(timings, 0.99) * 1000:>8.1f} {max(timings) * 1000:>8.1f}")
+    if everything:
+        print(f"  {'all':<26} {len(everything):>6} {statistics.median(everything) * 1000:>8.1f} "
+              f"{_percentile(everything, 0.99) * 1000:>8.1f} {max(everything) * 1000:>8.1f}")
+
+
+def bench_loadtest(args):
+    """p50/p99 API latency under concurrent dashboard reads, seen writes and a background ingest."""
+    import uvicorn
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        fetch_listings.DATABASE_PATH = path
+        os.environ["DATABASE_PATH"] = path
+        fetch_listings.init_db()
+        conn = fetch_listings.connect_db()
+        fetch_listings.ingest_listings(conn, generate_listings(args.rows))
+        conn.close()
+
+        # Imported late so app.py picks up the benchmark database path
+        import app as app_module
+        from response_cache import ResponseCache
+        if not args.cache:
+            # Measure the database layer rather than cache hits
+            app_module.response_cache = ResponseCache(max_entries=0)
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=port, log_level="warning"))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+
+        pooled = app_module.database
+        try:
+            for label, database in (
+                ("Connection per request", _ConnectPerRequest(path)),
+                ("Pooled readers + serialized writer (db.py)", pooled),
+            ):
+                app_module.database = database
+                stop = threading.Event()
+
+                def background_ingest():
+                    # Stands in for a fetch run writing batches while the dashboard is in use
+                    offset = args.rows
+                    while not stop.wait(args.ingest_interval):
+                        with database.writer() as writer_conn:
+                            fetch_listings.ingest_listings(writer_conn, generate_listings(args.ingest_batch, offset))
+                        offset += args.ingest_batch
+
+                ingest_thread = threading.Thread(target=background_ingest)
+                if args.ingest_batch:
+                    ingest_thread.start()
+                try:
+                    latencies, elapsed = _run_loadtest(port, args)
+                finally:
+                    stop.set()
+                    if args.ingest_batch:
+                        ingest_thread.join()
+                _print_percentiles(label, latencies, elapsed)
+        finally:
+            app_module.database = pooled
+            server.should_exit = True
+            time.sleep(0.2)
+            close_databases()
+
+
+class _SimClock:
+    def __init__(self, start):
+        self.current = start
+
+    def now(self):
+        return self.current
+
+    def sleep(self, seconds):
+        self.current += seconds
+
+
+class _SimSource:
+    def __init__(self, index):
+        self.id = f"sim_{index}"
+        self.name = f"Simulated source {index}"
+        self.url = f"file:///sim/{index}"
+
+
+def _simulate_schedule(mode, rates, args):
+    """Replays Poisson listing arrivals against hourly runs; returns (fetches, found, mean delay hours)."""
+    from scheduler import SourceScheduler
+
+    rng = random.Random(42)
+    horizon = args.days * 86400
+    arrivals = []
+    for rate in rates:
+        times, t = [], 0.0
+        while rate > 0:
+            t += rng.expovariate(rate / 3600)
+            if t >= horizon:
+                break
+            times.append(t)
+        arrivals.append(times)
+
+    clock = _SimClock(0.0)
+    scheduler = SourceScheduler(clock=clock, rng=random.Random(0), mode=mode)
+    sources = [_SimSource(i) for i in range(len(rates))]
+    cursors = [0] * len(rates)
+    fetches = found = 0
+    delay_total = 0.0
+    for run_at in range(0, int(horizon), args.run_interval):
+        clock.current = float(run_at)
+        due, _ = scheduler.partition(sources)
+        for source in due:
+            index = sources.index(source)
+            fetches += 1
+            times = arrivals[index]
+            start = cursors[index]
+            while cursors[index] < len(times) and times[cursors[index]] <= run_at:
+                delay_total += run_at - times[cursors[index]]
+                cursors[index] += 1
+            inserted = cursors[index] - start
+            found += inserted
+            scheduler.record_success(source, inserted)
+    return fetches, found, (delay_total / found / 3600) if found else 0.0
+
+
+def bench_schedule(args):
+    """Fetches per new listing and discovery delay, polling every source vs. adaptive intervals."""
+    rng = random.Random(7)
+    # Skewed yields: a few busy searches, a long tail that rarely turns anything up
+    rates = [rng.lognormvariate(-3, 1.5) for _ in range(args.sources)]
+    print(f"{args.sources} sources, {args.days} days, a run every {args.run_interval}s, "
+          f"{sum(rates):.2f} new listings/hour in total")
+    print(f"  {'mode':<10} {'fetches':>8} {'found':>7} {'fetches/new':>12} {'mean delay h':>13}")
+    for mode in ("all", "adaptive"):
+        fetches, found, delay = _simulate_schedule(mode, rates, args)
+        per_new = fetches / found if found else float("inf")
+        print(f"  {mode:<10} {fetches:>8} {found:>7} {per_new:>12.1f} {delay:>13.2f}")
+
+
+def _run_seen_clients(mark, clients, ids_per_client, batch):
+    """Each client marks its own listing ids, batch ids per call; returns elapsed seconds."""
+    def client(index):
+        first = 7900000000 + index * ids_per_client
+        ids = [str(first + offset) for offset in range(ids_per_client)]
+        for start in range(0, len(ids), batch):
+            mark(ids[start:start + batch])
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def bench_seen(args):
+    """Transactions and WAL bytes per seen update: a commit per click vs. the coalescing writer."""
+    from db import Database
+    from seen_writer import SeenCoalescer, mark_seen
+
+    ids_per_client = args.clicks // args.clients
+    updates = ids_per_client * args.clients
+    print(f"{args.clients} clients marking {updates} listings seen")
+    print(f"  {'mode':<34} {'txns':>6} {'WAL KB':>9} {'WAL B/update':>13} {'updates/s':>10}")
+    for label, batch, coalesce in (
+        ("commit per click (before)", 1, False),
+        ("coalesced clicks", 1, True),
+        (f"bulk POST, {args.batch} ids per request", args.batch, True),
+    ):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            fetch_listings.DATABASE_PATH = path
+            fetch_listings.init_db()
+            conn = fetch_listings.connect_db()
+            fetch_listings.ingest_listings(conn, generate_listings(args.rows))
+            conn.close()
+            close_databases()
+
+            database = Database(path)
+            with database.writer() as writer_conn:
+                # Keep every frame in the WAL so its size is the bytes written
+                writer_conn.execute("PRAGMA wal_autocheckpoint=0;")
+                writer_conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+            transactions = 0
+            if coalesce:
+                coalescer = SeenCoalescer(database, window_ms=args.window_ms)
+                elapsed = _run_seen_clients(coalescer.mark_seen, args.clients, ids_per_client, batch)
+                coalescer.close()
+                transactions = coalescer.transactions
+            else:
+                def mark(ids):
+                    with database.writer() as writer_conn:
+                        mark_seen(writer_conn.cursor(), ids)
+                elapsed = _run_seen_clients(mark, args.clients, ids_per_client, batch)
+                transactions = updates
+            wal_bytes = os.path.getsize(f"{path}-wal")
+            database.close()
+            print(f"  {label:<34} {transactions:>6} {wal_bytes / 1024:>9.0f} {wal_bytes / updates:>13.0f} "
+                  f"{updates / elapsed:>10.0f}")
+
+
+def _legacy_batched_ingest(conn, listings):
+    """ingest_listings before ListingRecord: listing dicts in, the whole batch converted and prefiltered up front, no validation."""
+    chunk_size = fetch_listings.INGEST_CHUNK_SIZE
+    cursor = conn.cursor()
+    rows = [tuple(listing[field] for field in ListingRecord._fields) for listing in listings]
+    cursor.execute(fetch_listings.KNOWN_IDS_SQL, (json.dumps([row[7] for row in rows]),))
+    known_ids = {row[0] for row in cursor.fetchall()}
+    pending = [row for row in rows if row[7] not in known_ids]
+    inserted = 0
+    for start in range(0, len(pending), chunk_size):
+        first_seq = fetch_listings.reserve_change_seq(cursor, min(chunk_size, len(pending) - start))
+        chunk = [row + (first_seq + offset,) for offset, row in enumerate(pending[start:start + chunk_size])]
+        cursor.executemany(fetch_listings.INSERT_LISTING_SQL, chunk)
+        inserted += cursor.rowcount
+        fetch_listings.assign_pending(cursor)
+        fetch_listings.score_pending(cursor)
+        fetch_listings.bump_generation(cursor)
+        conn.commit()
+    return inserted, len(rows) - inserted, 0
+
+
+def bench_records(args):
+    """Peak memory and items/sec from feed bytes to committed rows: listing dicts vs. ListingRecords."""
+    logging.getLogger("fetch_listings").setLevel(logging.WARNING)
+    source = RssListingSource({"name": "Bench Feed", "region": "Miami", "keyword": "victrola"})
+    body = generate_rdf_feed(args.items)
+    print(f"RDF feed, {args.items} items, {len(body) / 1e6:.1f} MB")
+
+    # Container overhead only; the field values are the same strings either way
+    sample = next(source.iter_rdf_or_rss(body))
+    print(f"  one listing: dict {sys.getsizeof(sample._asdict())} bytes, ListingRecord {sys.getsizeof(sample)} bytes")
+
+    modes = (
+        ("dicts, batch prefiltered (before)",
+         lambda conn: _legacy_batched_ingest(conn, [dict(zip(ListingRecord._fields, record)) for record in source.iter_rdf_or_rss(body)])),
+        ("ListingRecord list (fetch() result)",
+         lambda conn: fetch_listings.ingest_listings(conn, source.parse_rdf_or_rss(body))),
+        ("ListingRecord generator, parser to writer",
+         lambda conn: fetch_listings.ingest_listings(conn, source.iter_rdf_or_rss(body))),
+    )
+    print(f"  {'path':<44} {'items/sec':>10} {'seconds':>8} {'peak MB':>8} {'inserted':>9} {'rejected':>9}")
+    for label, run in modes:
+        results = []
+        for traced in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                fetch_listings.DATABASE_PATH = os.path.join(tmp, "bench.db")
+                fetch_listings.init_db()
+                close_databases()
+                conn = fetch_listings.connect_db()
+                if traced:
+                    tracemalloc.start()
+                started = time.perf_counter()
+                inserted, _, rejected = run(conn)
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1] if traced else None
+                tracemalloc.stop()
+                conn.close()
+                results.append((elapsed, peak, inserted, rejected))
+        (elapsed, _, inserted, rejected), (_, peak, _, _) = results
+        print(f"  {label:<44} {args.items / elapsed:>10.0f} {elapsed:>8.2f} {peak / 1e6:>8.1f} {inserted:>9} {rejected:>9}")
+
+
+FIXTURE_KINDS = ("rdf", "rss2", "craigslist")
+
+
+def write_fixtures(directory, size):
+    """Writes an RDF feed, an RSS 2.0 feed and a Craigslist results page of size items; returns {kind: path}."""
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for kind, name, body in (
+        ("rdf", f"feed-rdf-{size}.xml", generate_rdf_feed(size)),
+        ("rss2", f"feed-rss2-{size}.xml", generate_rss2_feed(size)),
+        ("craigslist", f"search-{size}.html", generate_search_page(size).encode("utf-8")),
+    ):
+        paths[kind] = os.path.join(directory, name)
+        with open(paths[kind], "wb") as f:
+            f.write(body)
+    return paths
+
+
+def _fixture_sources(urls):
+    """sources.json entries for fixture URLs keyed by kind."""
+    return [
+        {
+            "id": f"bench_{kind}",
+            "name": f"Bench {kind}",
+            "type": "craigslist" if kind == "craigslist" else "rss",
+            "url": url,
+            "region": "Miami",
+            "keyword": "victrola"
+        }
+        for kind, url in urls.items()
+    ]
+
+
+def _stage_result(seconds, items, peak=None, **extra):
+    result = {"seconds": round(seconds, 6), "items": items, "items_per_sec": round(items / seconds, 1) if seconds else None}
+    if peak is not None:
+        result["peak_mb"] = round(peak / 1e6, 2)
+    result.update(extra)
+    return result
+
+
+def _run_fetch(configs, tmp, database_path):
+    """One fetch_and_save run over configs against database_path; returns (result, seconds, source_runs rows)."""
+    from scheduler import SourceScheduler
+
+    sources_path = os.path.join(tmp, "bench-sources.json")
+    with open(sources_path, "w", encoding="utf-8") as f:
+        json.dump(configs, f)
+    fetch_listings.DATABASE_PATH = database_path
+    # Local fixtures need neither politeness limits nor adaptive skipping
+    scheduler = SourceScheduler(rate_per_minute=1e9, burst=1e9, max_wait=0, mode="all")
+    started = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        result = fetch_listings.fetch_and_save(scheduler=scheduler, sources_path=sources_path)
+    elapsed = time.perf_counter() - started
+    conn = sqlite3.connect(database_path)
+    rows = conn.execute("""
+        SELECT source_name, status, checked_count, inserted_count, fetch_ms, parse_ms, insert_ms, bytes_downloaded, cache_status
+        FROM source_runs WHERE log_id = ? ORDER BY id
+    """, (result["log_id"],)).fetchall()
+    conn.close()
+    return result, elapsed, rows
+
+
+def _pipeline_stages(configs, tmp, label):
+    """Cold and warm fetch_and_save runs, plus a traced cold run for peak memory."""
+    results = {}
+    database_path = os.path.join(tmp, f"{label}.db")
+    for phase in ("cold", "warm"):
+        result, elapsed, rows = _run_fetch(configs, tmp, database_path)
+        if result["status"] != "success":
+            raise RuntimeError(f"{label} {phase} run failed: {result.get('error_message')}")
+        results[phase] = _stage_result(
+            elapsed, result["checked_count"],
+            inserted=result["inserted_count"],
+            fetch_ms=sum(row[4] or 0 for row in rows),
+            parse_ms=sum(row[5] or 0 for row in rows),
+            insert_ms=sum(row[6] or 0 for row in rows),
+            bytes_downloaded=sum(row[7] or 0 for row in rows),
+            sources={row[0]: {"status": row[1], "items": row[2], "fetch_ms": row[4], "parse_ms": row[5],
+                              "insert_ms": row[6], "cache": row[8]} for row in rows}
+        )
+    close_databases()
+
+    tracemalloc.start()
+    _run_fetch(configs, tmp, os.path.join(tmp, f"{label}-traced.db"))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    close_databases()
+    results["cold"]["peak_mb"] = round(peak / 1e6, 2)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def bench_fixtures(args):
+    """Records synthetic feeds and result pages to a directory for reuse as file:// sources."""
+    for size in args.sizes:
+        paths = write_fixtures(args.output_dir, size)
+        for kind in FIXTURE_KINDS:
+            print(f"  {paths[kind]}  ({os.path.getsize(paths[kind]) / 1e3:.0f} kB)")
+
+
+def bench_pipeline(args):
+    """Per-stage throughput, latency and memory of the whole fetch pipeline over file:// and HTTP fixtures."""
+    logging.getLogger("fetch_listings").setLevel(logging.WARNING)
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "sizes": args.sizes,
+        "results": {}
+    }
+    results = report["results"]
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = write_fixtures(os.path.join(tmp, "fixtures"), size)
+            print(f"\n{size} items per fixture")
+
+            # Parse alone, straight from the fixture files
+            parsed = []
+            for kind in FIXTURE_KINDS:
+                config = _fixture_sources({kind: f"file://{paths[kind]}"})[0]
+                source = fetch_listings.build_source(config)
+                listings, elapsed, peak = _measure(source.fetch)
+                parsed.extend(listings)
+                results[f"parse/{kind}/{size}"] = _stage_result(elapsed, len(listings), peak)
+
+            # Ingest alone (insert, FTS triggers and dedup) into an empty database
+            fetch_listings.DATABASE_PATH = os.path.join(tmp, "ingest.db")
+            fetch_listings.init_db()
+            close_databases()
+            conn = fetch_listings.connect_db()
+            started = time.perf_counter()
+            inserted, _, _ = fetch_listings.ingest_listings(conn, parsed)
+            results[f"ingest/{size}"] = _stage_result(time.perf_counter() - started, len(parsed), inserted=inserted)
+            conn.close()
+
+            # The whole pipeline: saved files, then feeds served over HTTP with validators
+            file_urls = {kind: f"file://{paths[kind]}" for kind in FIXTURE_KINDS}
+            for phase, stage in _pipeline_stages(_fixture_sources(file_urls), tmp, "file").items():
+                results[f"pipeline/file/{size}/{phase}"] = stage
+
+            # Craigslist over HTTP needs Chromium, so only the feeds go through the stub server
+            stubs = {kind: FeedStubServer(generate_rdf_feed(size) if kind == "rdf" else generate_rss2_feed(size))
+                     for kind in ("rdf", "rss2")}
+            try:
+                http_urls = {kind: stub.url for kind, stub in stubs.items()}
+                for phase, stage in _pipeline_stages(_fixture_sources(http_urls), tmp, "http").items():
+                    results[f"pipeline/http/{size}/{phase}"] = stage
+            finally:
+                for stub in stubs.values():
+                    stub.close()
+
+        print(f"  {'stage':<32} {'items':>7} {'items/sec':>11} {'ms':>9} {'peak MB':>8}")
+        for key, stage in results.items():
+            if f"/{size}" not in key:
+                continue
+            peak = f"{stage['peak_mb']:>8.1f}" if "peak_mb" in stage else f"{'':>8}"
+            rate = f"{stage['items_per_sec']:>11.0f}" if stage["items_per_sec"] else f"{'-':>11}"
+            print(f"  {key:<32} {stage['items']:>7} {rate} {stage['seconds'] * 1000:>9.1f} {peak}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+    return out
+
+
+def bench_compare(args):
+    """Side-by-side numbers from two pipeline result files, with the relative change."""
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    print(f"baseline {baseline.get('commit')} ({baseline.get('created_at')})  vs  current {current.get('commit')} ({current.get('created_at')})")
+    before = _flatten("", baseline["results"], {})
+    after = _flatten("", current["results"], {})
+    # Per-source detail is noisy; compare the stage totals
+    keys = [key for key in before if key in after and ".sources." not in key]
+    print(f"  {'metric':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key in keys:
+        old, new = before[key], after[key]
+        change = f"{(new - old) / old * 100:>+7.1f}%" if old else f"{'':>8}"
+        print(f"  {key:<48} {old:>12g} {new:>12g} {change}")
+    missing = sorted(set(before) ^ set(after))
+    if missing:
+        print(f"  ({len(missing)} metrics present in only one file)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OldTimeCrank performance benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    browser = subparsers.add_parser("browser", help="Craigslist per-source latency with and without the browser pool")
+    browser.add_argument("--sources", type=int, default=3, help="Number of Craigslist sources to load")
+    browser.add_argument("--sources-path", default="./sources.json")
+    browser.set_defaults(func=bench_browser)
+
+    conditional = subparsers.add_parser("conditional", help="RSS fetch cost with and without the HTTP validator cache")
+    conditional.add_argument("--items", type=int, default=2000, help="Items in the synthetic feed")
+    conditional.set_defaults(func=bench_conditional)
+
+    ingest = subparsers.add_parser("ingest", help="Listing insert throughput, per-row vs. batched")
+    ingest.add_argument("--rows", type=int, default=100000, help="Synthetic listings to ingest")
+    ingest.set_defaults(func=bench_ingest)
+
+    parse = subparsers.add_parser("parse", help="Feed parser throughput and peak memory")
+    parse.add_argument("--items", type=int, default=50000, help="Items per synthetic feed")
+    parse.set_defaults(func=bench_parse)
+
+    extract = subparsers.add_parser("extract", help="Craigslist result-page extraction throughput and peak memory")
+    extract.add_argument("--rows", type=int, default=5000, help="Result rows in the synthetic page")
+    extract.set_defaults(func=bench_extract)
+
+    loadtest = subparsers.add_parser("loadtest", help="API p50/p99 latency under mixed concurrent reads and writes")
+    loadtest.add_argument("--clients", type=int, default=16, help="Concurrent keep-alive clients")
+    loadtest.add_argument("--requests", type=int, default=4000, help="Total requests per mode")
+    loadtest.add_argument("--rows", type=int, default=50000, help="Listings preloaded into the database")
+    loadtest.add_argument("--write-ratio", type=float, default=0.1, help="Share of requests that mark a listing seen")
+    loadtest.add_argument("--ingest-batch", type=int, default=500, help="Rows per background ingest batch (0 disables)")
+    loadtest.add_argument("--ingest-interval", type=float, default=0.25, help="Seconds between background ingest batches")
+    loadtest.add_argument("--cache", action="store_true", help="Keep the response cache enabled")
+    loadtest.set_defaults(func=bench_loadtest)
+
+    schedule = subparsers.add_parser("schedule", help="Fetches per new listing, polling every source vs. adaptive intervals")
+    schedule.add_argument("--sources", type=int, default=50, help="Simulated sources")
+    schedule.add_argument("--days", type=int, default=30, help="Simulated days")
+    schedule.add_argument("--run-interval", type=int, default=3600, help="Seconds between fetch runs (the cron period)")
+    schedule.set_defaults(func=bench_schedule)
+
+    seen = subparsers.add_parser("seen", help="Write amplification of seen updates, per-click commits vs. coalesced")
+    seen.add_argument("--clients", type=int, default=16, help="Concurrent clients clicking")
+    seen.add_argument("--clicks", type=int, default=4000, help="Listings marked seen in total")
+    seen.add_argument("--rows", type=int, default=20000, help="Listings preloaded into the database")
+    seen.add_argument("--batch", type=int, default=100, help="Listing ids per bulk request")
+    seen.add_argument("--window-ms", type=float, default=2, help="Coalescing window (SEEN_COALESCE_MS)")
+    seen.set_defaults(func=bench_seen)
+
+    records = subparsers.add_parser("records", help="Ingest memory and throughput, listing dicts vs. ListingRecords")
+    records.add_argument("--items", type=int, default=100000, help="Items in the synthetic feed")
+    records.set_defaults(func=bench_records)
+
+    def sizes(value):
+        return [int(size) for size in value.split(",") if size]
+
+    fixtures = subparsers.add_parser("fixtures", help="Write synthetic RSS/RDF feeds and Craigslist pages to a directory")
+    fixtures.add_argument("--output-dir", required=True)
+    fixtures.add_argument("--sizes", type=sizes, default=[100, 1000, 10000], help="Comma-separated item counts")
+    fixtures.set_defaults(func=bench_fixtures)
+
+    pipeline = subparsers.add_parser("pipeline", help="Per-stage throughput, latency and memory of fetch_and_save over fixtures")
+    pipeline.add_argument("--sizes", type=sizes, default=[100, 1000, 10000], help="Comma-separated item counts")
+    pipeline.add_argument("--output", help="Write the results as JSON for later comparison")
+    pipeline.set_defaults(func=bench_pipeline)
+
+    compare = subparsers.add_parser("compare", help="Compare two pipeline result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.set_defaults(func=bench_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
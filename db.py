@@ -0,0 +1,117 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Shared SQLite settings for the web service and the fetcher
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_READ_POOL_SIZE = int(os.environ.get("DB_READ_POOL_SIZE", "8"))
+# Prepared statements kept per connection; pooled connections keep them warm across requests
+DB_CACHED_STATEMENTS = int(os.environ.get("DB_CACHED_STATEMENTS", "256"))
+
+def connect(path, read_only=False):
+    """Opens a connection with the PRAGMAs every reader and writer uses."""
+    conn = sqlite3.connect(
+        path,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=DB_CACHED_STATEMENTS
+    )
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS};")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE};")
+    # Negative cache_size is in KiB: roughly 20 MB of page cache
+    conn.execute("PRAGMA cache_size=-20000;")
+    if read_only:
+        conn.execute("PRAGMA query_only=ON;")
+    else:
+        # Lets retention.py return freed pages a bounded step at a time. It has to precede
+        # journal_mode, and only a new database takes it (see retention.py --convert-vacuum)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+    return conn
+
+class Database:
+    """
+    Process-wide access to one SQLite file: a pool of read-only connections and a
+    single writer connection serialized by a lock.
+
+    WAL lets the readers run alongside the writer; the lock keeps this process's own
+    writes from queueing on SQLite's file lock, and busy_timeout covers writers in
+    other processes (the cron fetcher).
+    """
+
+    def __init__(self, path, read_pool_size=None):
+        self.path = path
+        self.read_pool_size = max(1, read_pool_size or DB_READ_POOL_SIZE)
+        self._idle_readers = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(self.read_pool_size)
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._closed = False
+
+    @contextmanager
+    def reader(self):
+        """Borrows a read-only connection (rows are sqlite3.Row) for the duration of the block."""
+        with self._reader_slots:
+            try:
+                conn = self._idle_readers.get_nowait()
+            except queue.Empty:
+                conn = connect(self.path, read_only=True)
+                conn.row_factory = sqlite3.Row
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                if self._closed:
+                    conn.close()
+                else:
+                    self._idle_readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """Holds the writer connection exclusively; commits on success and rolls back on error."""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = connect(self.path)
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle_readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+def get_database(path):
+    """Returns the shared Database for path, creating it on first use."""
+    key = os.path.abspath(path)
+    with _databases_lock:
+        database = _databases.get(key)
+        if database is None:
+            database = _databases[key] = Database(path)
+        return database
+
+def close_databases():
+    with _databases_lock:
+        databases = list(_databases.values())
+        _databases.clear()
+    for database in databases:
+        database.close()
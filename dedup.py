@@ -0,0 +1,190 @@
+import os
+import re
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+
+# Fingerprints at most this many bits apart are treated as the same item
+DEDUP_MAX_DISTANCE = int(os.environ.get("DEDUP_MAX_DISTANCE", "3"))
+# Candidates read per LSH bucket, newest first (reposts are usually recent)
+DEDUP_MAX_CANDIDATES = int(os.environ.get("DEDUP_MAX_CANDIDATES", "64"))
+# Priced listings also need prices within this fraction of the higher one
+DEDUP_PRICE_TOLERANCE = float(os.environ.get("DEDUP_PRICE_TOLERANCE", "0.2"))
+
+SIMHASH_BITS = 64
+LSH_BANDS = 4
+BAND_BITS = SIMHASH_BITS // LSH_BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+# Filler that sellers add or drop between reposts
+NOISE_WORDS = {
+    "a", "an", "and", "the", "for", "with", "of", "in", "on", "or", "to",
+    "obo", "firm", "must", "sell", "sale", "great", "nice", "condition", "vintage", "antique"
+}
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+DIGIT_RE = re.compile(r"[0-9]")
+NUMBER_WEIGHT = 4
+
+def normalize_words(text):
+    """Lowercased alphanumeric words of text without the noise words."""
+    return [word for word in WORD_RE.findall((text or "").lower()) if word not in NOISE_WORDS]
+
+def listing_features(title, location):
+    """
+    (feature, weight) pairs: title words and adjacent word pairs, plus the normalized
+    location. Words with digits (model numbers, years) weigh more, so listings that differ
+    only in them ("No. 9" vs "No. 10") land far apart instead of in one crowded LSH bucket.
+    """
+    words = normalize_words(title)
+    features = [(word, NUMBER_WEIGHT if DIGIT_RE.search(word) else 1) for word in words]
+    for first, second in zip(words, words[1:]):
+        weight = NUMBER_WEIGHT if DIGIT_RE.search(first + second) else 1
+        features.append((f"{first} {second}", weight))
+    place = " ".join(normalize_words(location))
+    if place:
+        features.append((f"loc:{place}", 1))
+    return features
+
+BIT_SHIFTS = np.arange(SIMHASH_BITS, dtype=np.uint64)
+
+@lru_cache(maxsize=65536)
+def _feature_hash(feature):
+    # Titles repeat the same few words, so most lookups are cache hits
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+def simhash_batch(feature_lists):
+    """
+    64-bit SimHash of each feature list, or None for an empty one.
+
+    Each bit is the weighted majority vote of that bit across the feature hashes. The votes
+    of every feature in the batch are one (features x 64) NumPy matrix, summed per listing
+    with reduceat, so the cost per listing is a few hash lookups rather than a Python loop
+    over 64 bits per feature.
+    """
+    lengths = [len(features) for features in feature_lists]
+    total = sum(lengths)
+    if not total:
+        return [None] * len(feature_lists)
+    hashes = np.fromiter((_feature_hash(feature) for features in feature_lists for feature, _ in features),
+                         dtype=np.uint64, count=total)
+    weights = np.fromiter((weight for features in feature_lists for _, weight in features), dtype=np.int64, count=total)
+    bits = ((hashes[:, None] >> BIT_SHIFTS) & np.uint64(1)).astype(bool)
+    feature_votes = np.where(bits, weights[:, None], -weights[:, None])
+    starts = np.cumsum([0] + [length for length in lengths if length])[:-1]
+    votes = np.add.reduceat(feature_votes, starts, axis=0)
+    # Distinct bits never carry, so the sum is the OR of the set bits
+    fingerprints = iter(((votes > 0).astype(np.uint64) << BIT_SHIFTS).sum(axis=1, dtype=np.uint64).tolist())
+    return [next(fingerprints) if length else None for length in lengths]
+
+def simhash(features):
+    """64-bit SimHash of one feature list (see simhash_batch)."""
+    return simhash_batch([features])[0] or 0
+
+def bands(fingerprint):
+    """Splits a fingerprint into LSH_BANDS bands of BAND_BITS bits."""
+    return [(fingerprint >> (band * BAND_BITS)) & BAND_MASK for band in range(LSH_BANDS)]
+
+def hamming_distance(first, second):
+    return (first ^ second).bit_count()
+
+def _to_signed(fingerprint):
+    # SQLite integers are signed 64-bit
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+# One bucket per band, newest first, at most DEDUP_MAX_CANDIDATES entries read from each
+BUCKET_SQL = [
+    f"SELECT simhash, canonical_id, price_cents FROM listing_fingerprints WHERE band{band} = ? ORDER BY listing_rowid DESC LIMIT ?"
+    for band in range(LSH_BANDS)
+]
+
+def prices_match(first, second):
+    if first is None or second is None:
+        return True
+    high = max(first, second)
+    return high == 0 or abs(first - second) / high <= DEDUP_PRICE_TOLERANCE
+
+def fingerprint_listings(listings):
+    """
+    (title, location) -> SimHash (None when there is nothing to compare on) for ListingRecords.
+
+    Pure computation, so the fetcher runs it before taking the database writer and hands
+    the result to assign_pending.
+    """
+    keys = list(dict.fromkeys((listing.title, listing.location) for listing in listings))
+    return dict(zip(keys, simhash_batch([listing_features(title, location) for title, location in keys])))
+
+def assign_pending(cursor, fingerprints=None):
+    """
+    Fingerprints listings that have no canonical_id yet and groups them; returns the
+    number found to duplicate an earlier listing.
+
+    fingerprints (from fingerprint_listings) covers rows hashed ahead of time; the rest are
+    hashed here in one batch. A row's candidates share at least one band with it. With 4
+    bands of 16 bits, any fingerprint within 3 bits differs in at most 3 bands, so the LSH
+    lookup never misses a match at the default distance. Each bucket is read once per call,
+    cut to its DEDUP_MAX_CANDIDATES newest entries, and the rows of this batch are added to
+    it in memory as they are grouped, so the cost per listing stays bounded however large
+    the table grows. Rows are taken in id order: the oldest listing of a group is its canonical.
+    """
+    cursor.execute("SELECT id, title, location, price_cents FROM listings WHERE canonical_id IS NULL ORDER BY id")
+    pending = cursor.fetchall()
+    if not pending:
+        return 0
+    fingerprints = dict(fingerprints or {})
+    missing = list(dict.fromkeys((title, location) for _, title, location, _ in pending if (title, location) not in fingerprints))
+    if missing:
+        fingerprints.update(zip(missing, simhash_batch([listing_features(title, location) for title, location in missing])))
+
+    # (band, value) -> [(simhash, canonical_id, price_cents)], oldest first
+    buckets = {}
+    fingerprint_rows = []
+    canonical_rows = []
+    duplicates = 0
+    for row_id, title, location, price_cents in pending:
+        fingerprint = fingerprints[(title, location)]
+        if fingerprint is None:
+            # Nothing to compare on; the listing stands alone
+            canonical_rows.append((row_id, row_id))
+            continue
+        row_buckets = []
+        canonical_id = None
+        for band, value in enumerate(bands(fingerprint)):
+            bucket = buckets.get((band, value))
+            if bucket is None:
+                cursor.execute(BUCKET_SQL[band], (value, DEDUP_MAX_CANDIDATES))
+                bucket = [(_to_unsigned(candidate), candidate_canonical, candidate_price)
+                          for candidate, candidate_canonical, candidate_price in reversed(cursor.fetchall())]
+                buckets[(band, value)] = bucket
+            row_buckets.append(bucket)
+            for candidate, candidate_canonical, candidate_price in bucket[-DEDUP_MAX_CANDIDATES:]:
+                if hamming_distance(fingerprint, candidate) > DEDUP_MAX_DISTANCE:
+                    continue
+                if not prices_match(price_cents, candidate_price):
+                    continue
+                if canonical_id is None or candidate_canonical < canonical_id:
+                    canonical_id = candidate_canonical
+        if canonical_id is None:
+            canonical_id = row_id
+        else:
+            duplicates += 1
+        for bucket in row_buckets:
+            bucket.append((fingerprint, canonical_id, price_cents))
+            if len(bucket) > 2 * DEDUP_MAX_CANDIDATES:
+                del bucket[:-DEDUP_MAX_CANDIDATES]
+        fingerprint_rows.append((row_id, _to_signed(fingerprint), canonical_id, price_cents, *bands(fingerprint)))
+        canonical_rows.append((canonical_id, row_id))
+
+    cursor.executemany(
+        """
+        INSERT OR REPLACE INTO listing_fingerprints (listing_rowid, simhash, canonical_id, price_cents, band0, band1, band2, band3)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        fingerprint_rows
+    )
+    cursor.executemany("UPDATE listings SET canonical_id = ? WHERE id = ?", canonical_rows)
+    return duplicates
@@ -0,0 +1,67 @@
+import os
+import asyncio
+import threading
+
+# Events buffered per subscriber before it is marked as lagging and told to reload
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "1000"))
+
+class Subscription:
+    """One consumer's queue, bound to the event loop that created it."""
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+class EventBus:
+    """
+    In-process fan-out of change notifications to asyncio subscribers (the SSE streams).
+
+    publish() is safe from any thread: fetch runs and sync endpoints call it from worker
+    threads, and each event is handed to the subscriber's loop with call_soon_threadsafe.
+    Events are (kind, data) tuples.
+    """
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or EVENT_QUEUE_SIZE
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """Registers a subscriber on the running event loop."""
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, kind, data=None):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(self._deliver, subscription, (kind, data))
+            except RuntimeError:
+                # The subscriber's loop has closed
+                self.unsubscribe(subscription)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    @staticmethod
+    def _deliver(subscription, event):
+        try:
+            subscription.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            subscription.overflowed = True
+
+event_bus = EventBus()
+
+def publish(kind, data=None):
+    """Publishes on the process-wide bus; a no-op when nothing is listening (e.g. the cron run)."""
+    event_bus.publish(kind, data)
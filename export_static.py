@@ -0,0 +1,232 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+import logging
+import argparse
+from datetime import datetime, timezone
+
+from db import get_database
+
+logger = logging.getLogger("export_static")
+
+DATABASE_PATH = os.environ.get("DATABASE_PATH", "./data/listings.db")
+# Snapshot for the static (Netlify) dashboard; the fetcher exports after each run when this is set
+STATIC_EXPORT_DIR = os.environ.get("STATIC_EXPORT_DIR", "")
+DEFAULT_EXPORT_DIR = "./snapshot"
+
+MANIFEST_NAME = "manifest.json"
+SHARD_DIR = "shards"
+MANIFEST_VERSION = 1
+# Hex digits of the content hash kept in shard file names
+SHARD_HASH_LENGTH = 16
+UNDATED_MONTH = "undated"
+
+# seen is per visitor on the static dashboard (localStorage), so it is left out of the shards
+SHARD_COLUMNS = "id, listing_id, title, price, price_cents, location, source, url, image_url, posted_at, posted_ts, keyword, canonical_id, score, classification"
+
+# Listings with an unparseable date (posted_ts 0) go to the "undated" month
+MONTH_SQL = f"CASE WHEN posted_ts > 0 THEN strftime('%Y-%m', posted_ts, 'unixepoch') ELSE '{UNDATED_MONTH}' END"
+
+SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+def source_slug(source):
+    """File-system safe directory name for a source, stable across exports."""
+    slug = SLUG_RE.sub("-", (source or "").lower()).strip("-")[:40] or "source"
+    # Names that differ only in punctuation must not share a directory
+    suffix = hashlib.sha256((source or "").encode("utf-8")).hexdigest()[:6]
+    return f"{slug}-{suffix}"
+
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+def _write_once(path, data):
+    """Writes data unless path already exists; content-hashed names never change content."""
+    if os.path.exists(path):
+        return False
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+def _load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+def partition_stats(cursor):
+    """(source, month) -> (listing count, max change_seq); cheap enough to run on every export."""
+    cursor.execute(f"""
+        SELECT source, {MONTH_SQL} AS month, COUNT(*), MAX(change_seq)
+        FROM listings
+        GROUP BY source, month
+    """)
+    return {(source, month): (count, max_seq) for source, month, count, max_seq in cursor.fetchall()}
+
+def write_shard(cursor, export_dir, source, month, brotli_module):
+    """Serializes one partition and writes its .json/.json.gz/.json.br files; returns the manifest entry."""
+    cursor.execute(f"""
+        SELECT {SHARD_COLUMNS}
+        FROM listings
+        WHERE source = ? AND {MONTH_SQL} = ?
+        ORDER BY posted_ts DESC, id DESC
+    """, (source, month))
+    rows = [dict(row) for row in cursor.fetchall()]
+    # Deterministic bytes, so an unchanged partition hashes to the same file name
+    data = json.dumps(rows, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()[:SHARD_HASH_LENGTH]
+
+    relative_dir = f"{SHARD_DIR}/{source_slug(source)}"
+    os.makedirs(os.path.join(export_dir, relative_dir), exist_ok=True)
+    name = f"{relative_dir}/{month}.{digest}.json"
+    path = os.path.join(export_dir, name)
+
+    _write_once(path, data)
+    # mtime=0 keeps the gzip header, and so the file, identical between exports
+    gzip_data = gzip.compress(data, compresslevel=9, mtime=0)
+    _write_once(f"{path}.gz", gzip_data)
+    entry = {
+        "source": source,
+        "month": month,
+        "count": len(rows),
+        "hash": digest,
+        "file": name,
+        "gzip": f"{name}.gz",
+        "brotli": None,
+        "bytes": len(data),
+        "gzip_bytes": len(gzip_data),
+        "brotli_bytes": None,
+        "min_posted_ts": min((row["posted_ts"] for row in rows), default=0),
+        "max_posted_ts": max((row["posted_ts"] for row in rows), default=0)
+    }
+    if brotli_module is not None:
+        brotli_path = f"{path}.br"
+        if os.path.exists(brotli_path):
+            brotli_bytes = os.path.getsize(brotli_path)
+        else:
+            brotli_data = brotli_module.compress(data, quality=11)
+            _write_once(brotli_path, brotli_data)
+            brotli_bytes = len(brotli_data)
+        entry["brotli"] = f"{name}.br"
+        entry["brotli_bytes"] = brotli_bytes
+    return entry
+
+def _remove_stale_shards(export_dir, manifest):
+    """Deletes shard files the new manifest no longer references; returns how many."""
+    keep = set()
+    for shard in manifest["shards"]:
+        keep.update(name for name in (shard["file"], shard["gzip"], shard["brotli"]) if name)
+    shard_root = os.path.join(export_dir, SHARD_DIR)
+    removed = 0
+    for directory, _, files in os.walk(shard_root, topdown=False):
+        for file_name in files:
+            path = os.path.join(directory, file_name)
+            if os.path.relpath(path, export_dir).replace(os.sep, "/") not in keep:
+                os.remove(path)
+                removed += 1
+        if directory != shard_root and not os.listdir(directory):
+            os.rmdir(directory)
+    return removed
+
+def export_static(export_dir=None, database_path=None, full=False):
+    """
+    Writes a static snapshot of the listings table: one shard per (source, posted month)
+    plus manifest.json. Returns a summary dict.
+
+    Shards are named by a hash of their content and pre-compressed (.gz, and .br when the
+    brotli package is installed), so a host can cache them forever and visitors only
+    download partitions that changed. Partitions whose row count and max change_seq match
+    the previous manifest are not re-read; full=True rebuilds every partition.
+    """
+    export_dir = export_dir or STATIC_EXPORT_DIR or DEFAULT_EXPORT_DIR
+    database_path = database_path or DATABASE_PATH
+    if not os.path.exists(database_path):
+        logger.error(f"Database not found: {database_path}")
+        return {"status": "failure", "error_message": f"Database not found: {database_path}"}
+
+    os.makedirs(export_dir, exist_ok=True)
+    manifest_path = os.path.join(export_dir, MANIFEST_NAME)
+    previous = None if full else _load_manifest(manifest_path)
+    previous_shards = {}
+    if previous is not None:
+        previous_shards = {(shard["source"], shard["month"]): shard for shard in previous["shards"]}
+    brotli_module = _brotli()
+    if brotli_module is None:
+        logger.info("brotli is not installed; writing gzip shards only.")
+
+    shards = []
+    rebuilt = 0
+    with get_database(database_path).reader() as conn:
+        cursor = conn.cursor()
+        # Rescoring does not move change_seq, so a new scoring model rebuilds every shard
+        cursor.execute("SELECT value FROM app_meta WHERE key = 'score_model'")
+        row = cursor.fetchone()
+        score_model = row[0] if row else None
+        if previous is not None and previous.get("score_model") != score_model:
+            previous_shards = {}
+        stats = partition_stats(cursor)
+        for (source, month), (count, max_seq) in sorted(stats.items()):
+            old = previous_shards.get((source, month))
+            reusable = (
+                old is not None
+                and old["count"] == count
+                and old.get("max_change_seq") == max_seq
+                and os.path.exists(os.path.join(export_dir, old["gzip"]))
+                and (brotli_module is None or old["brotli"] is not None)
+            )
+            if reusable:
+                shards.append(old)
+                continue
+            entry = write_shard(cursor, export_dir, source, month, brotli_module)
+            entry["max_change_seq"] = max_seq
+            shards.append(entry)
+            rebuilt += 1
+
+        cursor.execute("SELECT status, run_at FROM update_logs ORDER BY id DESC LIMIT 1")
+        last_run = cursor.fetchone()
+
+    # Newest months first; the dashboard reads shards in this order
+    shards.sort(key=lambda shard: (shard["month"] != UNDATED_MONTH, shard["month"], shard["source"]), reverse=True)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "run_at": last_run["run_at"] if last_run else None,
+        "run_status": last_run["status"] if last_run else None,
+        "score_model": score_model,
+        "total": sum(shard["count"] for shard in shards),
+        "sources": sorted({shard["source"] for shard in shards}),
+        "shards": shards
+    }
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, manifest_path)
+    removed = _remove_stale_shards(export_dir, manifest)
+
+    logger.info(f"Static snapshot in {export_dir}: {len(shards)} shards ({rebuilt} rebuilt, {removed} stale files removed), {manifest['total']} listings.")
+    return {
+        "status": "success",
+        "export_dir": export_dir,
+        "shards": len(shards),
+        "rebuilt": rebuilt,
+        "removed": removed,
+        "total": manifest["total"]
+    }
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Export the listings table as a static dashboard snapshot.")
+    parser.add_argument("--out", help=f"output directory (default: STATIC_EXPORT_DIR or {DEFAULT_EXPORT_DIR})")
+    parser.add_argument("--db", help="SQLite database (default: DATABASE_PATH)")
+    parser.add_argument("--full", action="store_true", help="rebuild every shard instead of only changed partitions")
+    args = parser.parse_args()
+    export_static(export_dir=args.out, database_path=args.db, full=args.full)
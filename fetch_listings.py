@@ -1,12 +1,27 @@
+import io
 import os
 import re
 import json
-import sqlite3
+import hashlib
 import logging
+import threading
+import urllib.error
+import urllib.parse
 import urllib.request
 import xml.etree.ElementTree as ET
 import time
+import queue
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import NamedTuple, Optional
+from db import connect, get_database
+from events import publish
+from dedup import assign_pending, fingerprint_listings
+from scoring import score_pending
+from retention import apply_retention
+from scheduler import SourceScheduler, SourceDeferred, host_for_url, format_ts, is_block_error
+from metrics import Stopwatch, start_profile, stop_profile, to_ms
 
 # Setup logging
 logging.basicConfig(
@@ -21,6 +36,242 @@ logger = logging.getLogger("fetch_listings")
 # Get database path from environment variable or default to local path
 DATABASE_PATH = os.environ.get("DATABASE_PATH", "./data/listings.db")
 
+# Source definitions read by each fetch run
+SOURCES_PATH = os.environ.get("SOURCES_PATH", "./sources.json")
+
+# When set, `python fetch_listings.py` refreshes the static dashboard snapshot after the run
+STATIC_EXPORT_DIR = os.environ.get("STATIC_EXPORT_DIR", "")
+
+# Rows written per ingest transaction
+INGEST_CHUNK_SIZE = int(os.environ.get("INGEST_CHUNK_SIZE", "2000"))
+
+# Parsed chunks fetch workers may hand over ahead of the writer before they wait for it
+FETCH_QUEUE_CHUNKS = int(os.environ.get("FETCH_QUEUE_CHUNKS", "8"))
+
+# Concurrency limits for a fetch run: total worker threads and in-flight fetches per host
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", "4"))
+FETCH_MAX_PER_HOST = int(os.environ.get("FETCH_MAX_PER_HOST", "2"))
+
+# Browser pool sizing: concurrent contexts, and pages a context serves before it is recycled
+BROWSER_MAX_CONTEXTS = int(os.environ.get("BROWSER_MAX_CONTEXTS", "3"))
+BROWSER_PAGES_PER_CONTEXT = int(os.environ.get("BROWSER_PAGES_PER_CONTEXT", "20"))
+
+# Result pages walked per Craigslist search; sources.json "max_pages" overrides it per source
+CRAIGSLIST_MAX_PAGES = int(os.environ.get("CRAIGSLIST_MAX_PAGES", "5"))
+
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+BROWSER_LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-infobars",
+    "--window-position=0,0",
+    "--ignore-certificate-errors"
+]
+
+# Craigslist result rows across the current, static and legacy search layouts
+RESULT_SELECTOR = ".cl-search-result, .cl-static-search-result, .result-row"
+RESULT_TITLE_SELECTOR = "a.posting-title, .title, .result-title"
+RESULT_PRICE_SELECTOR = ".priceinfo, .price, .result-price"
+RESULT_LOCATION_SELECTOR = ".location, .nearby"
+
+# Pulls raw result rows out of the live DOM in one round trip. Text is joined from
+# stripped text nodes to match BeautifulSoup's get_text(strip=True).
+EXTRACT_ROWS_JS = """
+() => {
+    const selectors = %s;
+    const text = (el) => {
+        if (!el) return null;
+        const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+        const parts = [];
+        while (walker.nextNode()) {
+            const value = walker.currentNode.nodeValue.trim();
+            if (value) parts.push(value);
+        }
+        return parts.join('');
+    };
+    return Array.from(document.querySelectorAll(selectors.row)).map(item => {
+        const link = item.querySelector('a[href]');
+        const time = item.querySelector('time');
+        const meta = item.querySelector('.meta');
+        return {
+            pid: item.getAttribute('data-pid'),
+            title: text(item.querySelector(selectors.title)),
+            href: link ? link.getAttribute('href') : null,
+            price: text(item.querySelector(selectors.price)),
+            location: text(item.querySelector(selectors.location)),
+            datetime: time ? time.getAttribute('datetime') : null,
+            meta: meta ? meta.textContent : null
+        };
+    });
+}
+""" % json.dumps({
+    "row": RESULT_SELECTOR,
+    "title": RESULT_TITLE_SELECTOR,
+    "price": RESULT_PRICE_SELECTOR,
+    "location": RESULT_LOCATION_SELECTOR
+})
+
+def _class_test(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# XPath equivalents of the selectors above for lxml; a parenthesized union keeps document order
+RESULT_ROW_XPATH = "//*[" + " or ".join(_class_test(c) for c in ("cl-search-result", "cl-static-search-result", "result-row")) + "]"
+RESULT_TITLE_XPATH = f"(.//a[{_class_test('posting-title')}] | .//*[{_class_test('title')}] | .//*[{_class_test('result-title')}])[1]"
+RESULT_PRICE_XPATH = f"(.//*[{_class_test('priceinfo')}] | .//*[{_class_test('price')}] | .//*[{_class_test('result-price')}])[1]"
+RESULT_LOCATION_XPATH = f"(.//*[{_class_test('location')}] | .//*[{_class_test('nearby')}])[1]"
+
+URL_ORIGIN_RE = re.compile(r"(https?://[^/]+)")
+META_DATE_RE = re.compile(r"(\d{1,2}/\d{1,2})")
+
+_compiled_row_xpaths = None
+
+def _row_xpaths():
+    # Compiled once per process; lxml stays an optional import
+    global _compiled_row_xpaths
+    if _compiled_row_xpaths is None:
+        from lxml import etree
+        _compiled_row_xpaths = {
+            name: etree.XPath(expression)
+            for name, expression in (
+                ("row", RESULT_ROW_XPATH),
+                ("title", RESULT_TITLE_XPATH),
+                ("price", RESULT_PRICE_XPATH),
+                ("location", RESULT_LOCATION_XPATH),
+                ("link", "(.//a[@href])[1]"),
+                ("time", "(.//time)[1]"),
+                ("meta", f"(.//*[{_class_test('meta')}])[1]"),
+                ("text", ".//text()")
+            )
+        }
+    return _compiled_row_xpaths
+
+def _extract_rows_lxml(html):
+    import lxml.html
+
+    xpaths = _row_xpaths()
+
+    def text(elements):
+        if not elements:
+            return None
+        return "".join(part.strip() for part in xpaths["text"](elements[0]) if part.strip())
+
+    rows = []
+    for item in xpaths["row"](lxml.html.fromstring(html)):
+        link = xpaths["link"](item)
+        time_elem = xpaths["time"](item)
+        meta = xpaths["meta"](item)
+        rows.append({
+            "pid": item.get("data-pid"),
+            "title": text(xpaths["title"](item)),
+            "href": link[0].get("href") if link else None,
+            "price": text(xpaths["price"](item)),
+            "location": text(xpaths["location"](item)),
+            "datetime": time_elem[0].get("datetime") if time_elem else None,
+            "meta": meta[0].text_content() if meta else None
+        })
+    return rows
+
+def _extract_rows_bs4(html):
+    from bs4 import BeautifulSoup
+
+    def text(elem):
+        return elem.get_text(strip=True) if elem else None
+
+    rows = []
+    for item in BeautifulSoup(html, "html.parser").select(RESULT_SELECTOR):
+        link = item.select_one("a[href]")
+        time_elem = item.select_one("time")
+        meta = item.select_one(".meta")
+        rows.append({
+            "pid": item.get("data-pid"),
+            "title": text(item.select_one(RESULT_TITLE_SELECTOR)),
+            "href": link["href"] if link else None,
+            "price": text(item.select_one(RESULT_PRICE_SELECTOR)),
+            "location": text(item.select_one(RESULT_LOCATION_SELECTOR)),
+            "datetime": time_elem.get("datetime") if time_elem else None,
+            "meta": meta.get_text() if meta else None
+        })
+    return rows
+
+def extract_result_rows(html):
+    """Raw result rows (the same shape EXTRACT_ROWS_JS returns) from saved page HTML."""
+    try:
+        return _extract_rows_lxml(html)
+    except ImportError:
+        return _extract_rows_bs4(html)
+
+def connect_db():
+    """Opens a standalone writer connection with the shared PRAGMAs (see db.py)."""
+    return connect(DATABASE_PATH)
+
+# Same normalization datetime() applied in the old ORDER BY, as sortable epoch seconds
+POSTED_TS_SQL = "COALESCE(CAST(strftime('%s', {posted_at}) AS INTEGER), 0)"
+
+PRICE_AMOUNT_RE = re.compile(r'([0-9][0-9,]*(?:\.[0-9]+)?)')
+
+def parse_price_cents(price):
+    """Normalizes a free-form price such as "$1,200" or "$45.50" to integer cents; None if it has no amount."""
+    if not price:
+        return None
+    match = PRICE_AMOUNT_RE.search(price)
+    if not match:
+        return None
+    try:
+        return int(round(float(match.group(1).replace(",", "")) * 100))
+    except ValueError:
+        return None
+
+def _ensure_column(cursor, table, column, definition):
+    """Adds a column to an existing table; returns True if it had to be added."""
+    cursor.execute(f"PRAGMA table_info({table});")
+    if any(row[1] == column for row in cursor.fetchall()):
+        return False
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition};")
+    return True
+
+def bump_generation(cursor):
+    """Marks cached API responses stale; call inside the transaction that changes listings or logs."""
+    cursor.execute("""
+        INSERT INTO app_meta (key, value) VALUES ('generation', 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+    """)
+
+def adjust_listing_counts(cursor, total=0, unseen=0):
+    """
+    Moves the listing counters /api/status reports; call inside the transaction that
+    inserts, archives or marks listings seen.
+    """
+    cursor.executemany(
+        "UPDATE app_meta SET value = value + ? WHERE key = ?",
+        [(total, "listing_count"), (unseen, "unseen_count")]
+    )
+
+def read_listing_counts(cursor):
+    """(total, unseen) listings, from the counters in app_meta rather than a table scan."""
+    cursor.execute("SELECT key, value FROM app_meta WHERE key IN ('listing_count', 'unseen_count')")
+    counts = {row[0]: row[1] for row in cursor.fetchall()}
+    return counts.get("listing_count", 0), counts.get("unseen_count", 0)
+
+def reserve_change_seq(cursor, count=1):
+    """
+    Reserves count consecutive change_seq values and returns the first.
+
+    Call inside the write transaction that stamps them: SQLite serializes writers, so
+    sequence order matches commit order even across processes.
+    """
+    cursor.execute("""
+        INSERT INTO app_meta (key, value) VALUES ('change_seq', ?)
+        ON CONFLICT(key) DO UPDATE SET value = value + excluded.value
+    """, (count,))
+    cursor.execute("SELECT value FROM app_meta WHERE key = 'change_seq'")
+    return cursor.fetchone()[0] - count + 1
+
+def read_generation(cursor):
+    cursor.execute("SELECT value FROM app_meta WHERE key = 'generation'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
 def init_db():
     """Initializes the SQLite database tables if they do not exist."""
     db_dir = os.path.dirname(DATABASE_PATH)
@@ -28,47 +279,381 @@ def init_db():
         os.makedirs(db_dir, exist_ok=True)
         logger.info(f"Created database directory: {db_dir}")
 
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    with get_database(DATABASE_PATH).writer() as conn:
+        cursor = conn.cursor()
 
-    # Create listings table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS listings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            price TEXT,
-            location TEXT,
-            source TEXT NOT NULL,
-            url TEXT UNIQUE NOT NULL,
-            image_url TEXT,
-            posted_at TEXT,
-            first_seen_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            listing_id TEXT UNIQUE NOT NULL,
-            seen INTEGER DEFAULT 0,
-            keyword TEXT
-        );
-    """)
+        # Create listings table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS listings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                price TEXT,
+                location TEXT,
+                source TEXT NOT NULL,
+                url TEXT UNIQUE NOT NULL,
+                image_url TEXT,
+                posted_at TEXT,
+                first_seen_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                listing_id TEXT UNIQUE NOT NULL,
+                seen INTEGER DEFAULT 0,
+                keyword TEXT,
+                posted_ts INTEGER DEFAULT 0,
+                price_cents INTEGER,
+                change_seq INTEGER DEFAULT 0,
+                canonical_id INTEGER
+            );
+        """)
 
-    # Index for speed
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_posted_at ON listings (posted_at DESC);")
+        # posted_ts is posted_at as epoch seconds (0 when unparseable) so ordering can use an index
+        if _ensure_column(cursor, "listings", "posted_ts", "INTEGER DEFAULT 0"):
+            logger.info("Backfilling listings.posted_ts from posted_at...")
+            cursor.execute(f"UPDATE listings SET posted_ts = {POSTED_TS_SQL.format(posted_at='posted_at')};")
 
-    # Create update_logs table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS update_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            status TEXT NOT NULL,
-            checked_count INTEGER DEFAULT 0,
-            inserted_count INTEGER DEFAULT 0,
-            skipped_count INTEGER DEFAULT 0,
-            error_message TEXT,
-            run_at TEXT DEFAULT CURRENT_TIMESTAMP
-        );
-    """)
+        # price_cents is the numeric form of the free-text price column, NULL when unpriced
+        if _ensure_column(cursor, "listings", "price_cents", "INTEGER"):
+            logger.info("Backfilling listings.price_cents from price...")
+            cursor.execute("SELECT id, price FROM listings WHERE price IS NOT NULL;")
+            cursor.executemany(
+                "UPDATE listings SET price_cents = ? WHERE id = ?;",
+                [(parse_price_cents(price), row_id) for row_id, price in cursor.fetchall()]
+            )
+
+        # change_seq orders inserts and seen updates for /api/listings/changes; existing rows keep insert order
+        if _ensure_column(cursor, "listings", "change_seq", "INTEGER DEFAULT 0"):
+            logger.info("Backfilling listings.change_seq from id...")
+            cursor.execute("UPDATE listings SET change_seq = id;")
+
+        # Relevance score (0-10) and item class from scoring.py; NULL until scored
+        _ensure_column(cursor, "listings", "score", "REAL")
+        _ensure_column(cursor, "listings", "classification", "TEXT")
+
+        # canonical_id is the id of the oldest near-duplicate (the row's own id when it has none).
+        # listing_fingerprints is the LSH index over SimHash bands; it repeats canonical_id and
+        # price_cents so candidate lookups never touch listings (see dedup.py)
+        _ensure_column(cursor, "listings", "canonical_id", "INTEGER")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS listing_fingerprints (
+                listing_rowid INTEGER PRIMARY KEY,
+                simhash INTEGER NOT NULL,
+                canonical_id INTEGER NOT NULL,
+                price_cents INTEGER,
+                band0 INTEGER NOT NULL,
+                band1 INTEGER NOT NULL,
+                band2 INTEGER NOT NULL,
+                band3 INTEGER NOT NULL
+            );
+        """)
+        for band in range(4):
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_listing_fingerprints_band{band} ON listing_fingerprints (band{band}, listing_rowid);")
+
+        # Index for speed
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_posted_at ON listings (posted_at DESC);")
+        # Keyset pagination order, alone and behind the equality filters the API supports
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_posted_ts ON listings (posted_ts DESC, id DESC);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_source_posted_ts ON listings (source, posted_ts DESC, id DESC);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_seen_posted_ts ON listings (seen, posted_ts DESC, id DESC);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_source_seen_posted_ts ON listings (source, seen, posted_ts DESC, id DESC);")
+        # Price range filters and price-ordered pages
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_price_cents ON listings (price_cents, id);")
+        # Delta sync scans
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_change_seq ON listings (change_seq);")
+        # Duplicate groups, and the rows still waiting for a fingerprint (canonical_id IS NULL)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_canonical_id ON listings (canonical_id);")
+        # Score-ordered pages, alone and within a classification; the partial index finds rows to score
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_score ON listings (score DESC, id DESC);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_classification_score ON listings (classification, score DESC, id DESC);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_unscored ON listings (id) WHERE score IS NULL;")
+        # Retention's age scans for listings without a parseable date
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_undated_seen_first_seen ON listings (seen, first_seen_at) WHERE posted_ts = 0;")
+
+        # Full-text index over title/location/keyword, kept in sync with listings by triggers
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'listings_fts';")
+        fts_exists = cursor.fetchone() is not None
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+                title, location, keyword,
+                content='listings', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            );
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS listings_fts_ai AFTER INSERT ON listings BEGIN
+                INSERT INTO listings_fts (rowid, title, location, keyword)
+                VALUES (new.id, new.title, new.location, new.keyword);
+            END;
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS listings_fts_ad AFTER DELETE ON listings BEGIN
+                INSERT INTO listings_fts (listings_fts, rowid, title, location, keyword)
+                VALUES ('delete', old.id, old.title, old.location, old.keyword);
+            END;
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS listings_fts_au AFTER UPDATE OF title, location, keyword ON listings BEGIN
+                INSERT INTO listings_fts (listings_fts, rowid, title, location, keyword)
+                VALUES ('delete', old.id, old.title, old.location, old.keyword);
+                INSERT INTO listings_fts (rowid, title, location, keyword)
+                VALUES (new.id, new.title, new.location, new.keyword);
+            END;
+        """)
+        if not fts_exists:
+            logger.info("Building full-text index for existing listings...")
+            cursor.execute("INSERT INTO listings_fts (listings_fts) VALUES ('rebuild');")
+
+        # Listings past their retention period (see retention.py); same columns as listings,
+        # kept out of the live table's indexes, FTS and dedup. url is not unique here, since
+        # a live listing may have replaced one that was archived.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS listings_archive (
+                id INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                price TEXT,
+                location TEXT,
+                source TEXT NOT NULL,
+                url TEXT NOT NULL,
+                image_url TEXT,
+                posted_at TEXT,
+                first_seen_at TEXT,
+                listing_id TEXT UNIQUE NOT NULL,
+                seen INTEGER DEFAULT 0,
+                keyword TEXT,
+                posted_ts INTEGER DEFAULT 0,
+                price_cents INTEGER,
+                change_seq INTEGER DEFAULT 0,
+                canonical_id INTEGER,
+                score REAL,
+                classification TEXT,
+                archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_archive_posted_ts ON listings_archive (posted_ts DESC, id DESC);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_listings_archive_source_posted_ts ON listings_archive (source, posted_ts DESC, id DESC);")
+
+        # Listings stored before dedup existed (or by an interrupted ingest) are grouped now
+        cursor.execute("SELECT 1 FROM listings WHERE canonical_id IS NULL LIMIT 1;")
+        if cursor.fetchone() is not None:
+            logger.info("Grouping near-duplicate listings...")
+            assign_pending(cursor)
+
+        # Create update_logs table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS update_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                status TEXT NOT NULL,
+                checked_count INTEGER DEFAULT 0,
+                inserted_count INTEGER DEFAULT 0,
+                skipped_count INTEGER DEFAULT 0,
+                error_message TEXT,
+                run_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                duration_ms INTEGER,
+                browser_launch_ms INTEGER,
+                bytes_downloaded INTEGER DEFAULT 0,
+                blocked_count INTEGER DEFAULT 0
+            );
+        """)
+        # Run-level metrics (see metrics.py and /api/metrics)
+        _ensure_column(cursor, "update_logs", "duration_ms", "INTEGER")
+        _ensure_column(cursor, "update_logs", "browser_launch_ms", "INTEGER")
+        _ensure_column(cursor, "update_logs", "bytes_downloaded", "INTEGER DEFAULT 0")
+        _ensure_column(cursor, "update_logs", "blocked_count", "INTEGER DEFAULT 0")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_update_logs_run_at ON update_logs (run_at);")
+
+        # update_logs rows past RETENTION_LOG_DAYS, summed per day and status (see retention.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS update_log_daily (
+                day TEXT NOT NULL,
+                status TEXT NOT NULL,
+                runs INTEGER DEFAULT 0,
+                checked_count INTEGER DEFAULT 0,
+                inserted_count INTEGER DEFAULT 0,
+                skipped_count INTEGER DEFAULT 0,
+                duration_ms INTEGER DEFAULT 0,
+                bytes_downloaded INTEGER DEFAULT 0,
+                blocked_count INTEGER DEFAULT 0,
+                PRIMARY KEY (day, status)
+            );
+        """)
+
+        # Small key/value counters shared by the fetcher and the API (e.g. the cache generation)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS app_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        # The change sequence starts after any backfilled rows
+        cursor.execute("""
+            INSERT INTO app_meta (key, value)
+            VALUES ('change_seq', (SELECT COALESCE(MAX(change_seq), 0) FROM listings))
+            ON CONFLICT(key) DO NOTHING
+        """)
+
+        # Listing counters for /api/status; seeded once, then moved by ingest, retention and the seen writer
+        cursor.execute("""
+            INSERT INTO app_meta (key, value)
+            VALUES ('listing_count', (SELECT COUNT(*) FROM listings)),
+                   ('unseen_count', (SELECT COUNT(*) FROM listings WHERE seen = 0))
+            ON CONFLICT(key) DO NOTHING
+        """)
+
+        # Scores missing (new column, interrupted ingest) or made by an older model are computed now
+        scored = score_pending(cursor)
+        if scored:
+            logger.info(f"Scored {scored} listings.")
+            bump_generation(cursor)
+
+        # Per-source outcome of each run, linked to its update_logs row
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS source_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                log_id INTEGER NOT NULL,
+                source_id TEXT,
+                source_name TEXT,
+                status TEXT NOT NULL,
+                checked_count INTEGER DEFAULT 0,
+                inserted_count INTEGER DEFAULT 0,
+                skipped_count INTEGER DEFAULT 0,
+                cache_status TEXT,
+                error_message TEXT,
+                fetch_ms INTEGER,
+                parse_ms INTEGER,
+                insert_ms INTEGER,
+                bytes_downloaded INTEGER DEFAULT 0,
+                blocked INTEGER DEFAULT 0
+            );
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_source_runs_log_id ON source_runs (log_id);")
+        # Per-source timings: fetch (request/render and parse, on the worker), parse, and the ingest transaction
+        for column, definition in (
+            ("fetch_ms", "INTEGER"), ("parse_ms", "INTEGER"), ("insert_ms", "INTEGER"),
+            ("bytes_downloaded", "INTEGER DEFAULT 0"), ("blocked", "INTEGER DEFAULT 0")
+        ):
+            _ensure_column(cursor, "source_runs", column, definition)
+
+        # HTTP validators for conditional feed requests
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS http_cache (
+                source_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+
+        # Scheduler state (see scheduler.py); times are epoch seconds
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS source_health (
+                source_id TEXT PRIMARY KEY,
+                source_name TEXT,
+                host TEXT,
+                consecutive_failures INTEGER DEFAULT 0,
+                blocked_count INTEGER DEFAULT 0,
+                last_status TEXT,
+                last_error TEXT,
+                last_attempt_at REAL,
+                last_success_at REAL,
+                next_eligible_at REAL DEFAULT 0,
+                yield_rate REAL,
+                poll_interval REAL,
+                next_poll_at REAL
+            );
+        """)
+        # Adaptive polling state: EWMA of new listings per hour and the interval derived from it
+        _ensure_column(cursor, "source_health", "yield_rate", "REAL")
+        _ensure_column(cursor, "source_health", "poll_interval", "REAL")
+        _ensure_column(cursor, "source_health", "next_poll_at", "REAL")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS host_health (
+                host TEXT PRIMARY KEY,
+                consecutive_failures INTEGER DEFAULT 0,
+                last_blocked_at REAL,
+                next_eligible_at REAL DEFAULT 0,
+                tokens REAL,
+                tokens_updated_at REAL
+            );
+        """)
+        # Rows for URLs without a host (file://) were written before the scheduler skipped them
+        cursor.execute("DELETE FROM host_health WHERE host = '';")
 
-    conn.commit()
-    conn.close()
     logger.info("Database initialized successfully.")
 
+# Feed namespaces, in the order a field's candidate tags are tried
+RDF_NS = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+RSS1_NS = 'http://purl.org/rss/1.0/'
+DC_NS = 'http://purl.org/dc/elements/1.1/'
+ENC_NS = 'http://purl.org/rss/1.0/modules/enc/'
+FEED_NAMESPACES = (RDF_NS, RSS1_NS, DC_NS, ENC_NS)
+
+def _feed_tags(local_name):
+    return tuple(f"{{{uri}}}{local_name}" for uri in FEED_NAMESPACES) + (local_name,)
+
+FEED_ITEM_TAGS = ("item", f"{{{RSS1_NS}}}item")
+FEED_TITLE_TAGS = _feed_tags("title")
+FEED_LINK_TAGS = _feed_tags("link")
+FEED_DATE_TAGS = _feed_tags("date")
+FEED_DC_TITLE_TAG = f"{{{DC_NS}}}title"
+FEED_ENC_ENCLOSURE_TAG = f"{{{ENC_NS}}}enclosure"
+FEED_RDF_ABOUT_ATTR = f"{{{RDF_NS}}}about"
+
+TITLE_PRICE_RE = re.compile(r'\$([0-9,]+)')
+TITLE_LOCATION_RE = re.compile(r'\(([^)]+)\)\s*$')
+TITLE_PRICE_SUFFIX_RE = re.compile(r'\s+-\s+\$[0-9,]+.*$')
+TITLE_LOCATION_SUFFIX_RE = re.compile(r'\s*\([^)]+\)\s*$')
+LISTING_ID_RE = re.compile(r'/(\d+)\.html')
+
+DEFAULT_IMAGE_URL = "https://www.transparenttextures.com/patterns/aged-paper.png"
+
+def listing_id_for_url(url):
+    """Craigslist post id from a listing URL, or an MD5 of the URL when it has none."""
+    id_match = LISTING_ID_RE.search(url)
+    if id_match:
+        return id_match.group(1)
+    return hashlib.md5(url.encode('utf-8')).hexdigest()
+
+class ListingRecord(NamedTuple):
+    """
+    One normalized listing, as every source produces it.
+
+    Fields are in INSERT_LISTING_SQL parameter order, so a record is its own insert row.
+    Being a tuple it has no per-instance __dict__, which keeps a parsed source a fraction
+    of the size of the equivalent list of dicts.
+    """
+    title: str
+    price: str
+    location: str
+    source: str
+    url: str
+    image_url: str
+    posted_at: str
+    listing_id: str
+    keyword: str
+    price_cents: Optional[int]
+
+# Absolute http(s) URL with a host; anything else cannot be opened from the dashboard
+VALID_URL_RE = re.compile(r"https?://[^\s/]")
+
+def validate_batch(records):
+    """
+    Splits a chunk of ListingRecords into (valid, rejected).
+
+    A record is rejected when its title is blank or its URL is not an absolute http(s)
+    URL. These are plain attribute and regex checks over the whole chunk, standing in
+    for the per-row pydantic validation in models.py.
+    """
+    match_url = VALID_URL_RE.match
+    valid = []
+    rejected = []
+    for record in records:
+        title, url = record.title, record.url
+        if isinstance(title, str) and title.strip() and isinstance(url, str) and match_url(url) and record.listing_id:
+            valid.append(record)
+        else:
+            rejected.append(record)
+    return valid, rejected
+
 # Abstract Base Class for Listing Sources
 class ListingSource:
     def __init__(self, config):
@@ -80,15 +665,49 @@ class ListingSource:
         self.keyword = config.get("keyword", "")
         self.source_type = config.get("type", "rss")
 
+        # Conditional-request state: validators from the last run in, fresh ones and hit/miss out
+        self.http_cache = None
+        self.http_validators = None
+        self.cache_status = None
+
+        # Paginating sources: known_ids(ids) returns the ids already stored, before_page()
+        # runs ahead of every page after the first (rate limiting). Both are optional.
+        self.known_ids = None
+        self.before_page = None
+        self.pages_fetched = 0
+        # Why paging ended early when a later page failed; the pages before it are still ingested
+        self.page_error = None
+
+        # Per-run measurements persisted to source_runs (see metrics.py)
+        self.bytes_downloaded = 0
+        self.parse_timer = Stopwatch()
+        self.fetch_seconds = None
+        self.insert_timer = Stopwatch()
+        self.blocked = False
+
     def fetch(self) -> list:
-        raise NotImplementedError("fetch() must be implemented by subclasses.")
+        return list(self.stream())
+
+    def stream(self):
+        """Yields listings as they are parsed; fetch() collects them into a list."""
+        raise NotImplementedError("stream() must be implemented by subclasses.")
+
+    def _timed(self, listings):
+        """Passes listings through, adding the time spent producing each to parse_timer."""
+        listings = iter(listings)
+        while True:
+            with self.parse_timer:
+                listing = next(listings, None)
+            if listing is None:
+                return
+            yield listing
 
 # RSS Listing Source Subclass
 class RssListingSource(ListingSource):
-    def fetch(self) -> list:
+    def stream(self):
         if not self.enabled:
             logger.info(f"Source '{self.name}' is disabled. Skipping.")
-            return []
+            return
 
         logger.info(f"Fetching listings from feed: {self.name} ({self.url})")
         
@@ -99,9 +718,17 @@ class RssListingSource(ListingSource):
             "Accept-Language": "en-US,en;q=0.9"
         }
 
+        cached = self.http_cache or {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        etag = None
+        last_modified = None
+
         try:
             if self.url.startswith("file://"):
-                import urllib.parse
                 parsed_url = urllib.parse.urlparse(self.url)
                 file_path = urllib.request.url2pathname(parsed_url.path)
                 # Fallback to current working directory if absolute path is not found
@@ -116,336 +743,908 @@ class RssListingSource(ListingSource):
                 req = urllib.request.Request(self.url, headers=headers)
                 with urllib.request.urlopen(req, timeout=30) as response:
                     content = response.read()
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                logger.info(f"Feed {self.name} not modified since last run (304). Skipping parse.")
+                self.cache_status = "hit"
+                self.http_validators = dict(cached)
+                return
+            logger.error(f"Failed to fetch feed {self.name} from {self.url}: {e}")
+            raise e
         except Exception as e:
             logger.error(f"Failed to fetch feed {self.name} from {self.url}: {e}")
             raise e
 
+        self.bytes_downloaded = len(content)
+
         # If Craigslist returned a block page in html
         if b"Your request has been blocked" in content or b"<title>blocked</title>" in content:
             err_msg = f"Request to Craigslist source '{self.name}' was blocked by Craigslist firewall (403/Forbidden)."
             logger.warning(err_msg)
             raise PermissionError(err_msg)
 
+        content_hash = hashlib.sha256(content).hexdigest()
+        self.http_validators = {
+            "etag": etag or cached.get("etag"),
+            "last_modified": last_modified or cached.get("last_modified"),
+            "content_hash": content_hash
+        }
+        if cached.get("content_hash") == content_hash:
+            logger.info(f"Feed {self.name} body unchanged since last run. Skipping parse.")
+            self.cache_status = "hit"
+            return
+        self.cache_status = "miss"
+
         try:
-            return self.parse_rdf_or_rss(content)
+            yield from self._timed(self.iter_rdf_or_rss(content))
         except Exception as e:
             logger.error(f"Failed to parse XML content for feed {self.name}: {e}")
             raise e
 
     def parse_rdf_or_rss(self, xml_content: bytes) -> list:
-        ns = {
-            'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
-            'rss': 'http://purl.org/rss/1.0/',
-            'dc': 'http://purl.org/dc/elements/1.1/',
-            'enc': 'http://purl.org/rss/1.0/modules/enc/'
-        }
+        return list(self.iter_rdf_or_rss(xml_content))
+
+    def iter_rdf_or_rss(self, xml_content: bytes):
+        """
+        Streams normalized listings out of an RDF (RSS 1.0) or RSS 2.0 document.
+
+        Items are handled as their end tag is parsed and then detached from the
+        tree, so memory stays flat regardless of feed size. The first item element
+        seen fixes whether plain or RSS 1.0-namespaced items are read.
+        """
+        item_tag = None
+        open_elements = []
+
+        for event, elem in ET.iterparse(io.BytesIO(xml_content), events=("start", "end")):
+            if event == "start":
+                open_elements.append(elem)
+                continue
+
+            open_elements.pop()
+            if elem.tag not in FEED_ITEM_TAGS or not open_elements:
+                continue
+            if item_tag is None:
+                item_tag = elem.tag
+            elif elem.tag != item_tag:
+                continue
+
+            listing = self._normalize_feed_item(elem)
+            elem.clear()
+            open_elements[-1].remove(elem)
+            if listing is not None:
+                yield listing
+
+    def _normalize_feed_item(self, item):
+        # First child per tag, matching Element.find()
+        children = {}
+        for child in item:
+            children.setdefault(child.tag, child)
+
+        def find_text(tags):
+            for tag in tags:
+                elem = children.get(tag)
+                if elem is not None:
+                    return elem.text or ""
+            return ""
+
+        raw_title = find_text(FEED_TITLE_TAGS)
+        clean_title = raw_title
+
+        price = "N/A"
+        location = self.region
+
+        dc_title_elem = children.get(FEED_DC_TITLE_TAG)
+        if dc_title_elem is not None and dc_title_elem.text:
+            clean_title = dc_title_elem.text
+
+        if raw_title:
+            price_match = TITLE_PRICE_RE.search(raw_title)
+            if price_match:
+                price = f"${price_match.group(1)}"
+
+            loc_match = TITLE_LOCATION_RE.search(raw_title)
+            if loc_match:
+                location = loc_match.group(1)
+
+            if clean_title == raw_title:
+                clean_title = TITLE_PRICE_SUFFIX_RE.sub('', raw_title)
+                clean_title = TITLE_LOCATION_SUFFIX_RE.sub('', clean_title).strip()
+
+        url = find_text(FEED_LINK_TAGS)
+        if not url:
+            url = item.attrib.get(FEED_RDF_ABOUT_ATTR, '')
 
-        root = ET.fromstring(xml_content)
-        items = root.findall('.//item')
-        if not items:
-            items = root.findall('.//{http://purl.org/rss/1.0/}item')
-            if not items:
-                items = root.findall('item')
-
-        normalized_listings = []
-
-        for item in items:
-            def find_text(tag, default=""):
-                for prefix, uri in ns.items():
-                    elem = item.find(f"{prefix}:{tag}", ns)
-                    if elem is not None:
-                        return elem.text or default
-                    elem = item.find(f"{{{uri}}}{tag}")
-                    if elem is not None:
-                        return elem.text or default
-                elem = item.find(tag)
-                return elem.text if elem is not None else default
-
-            raw_title = find_text('title')
-            clean_title = find_text('title')
-            
-            price = "N/A"
-            location = self.region
-
-            dc_title_elem = item.find('{http://purl.org/dc/elements/1.1/}title')
-            if dc_title_elem is not None and dc_title_elem.text:
-                clean_title = dc_title_elem.text
-            
-            if raw_title:
-                price_match = re.search(r'\$([0-9,]+)', raw_title)
-                if price_match:
-                    price = f"${price_match.group(1)}"
-                
-                loc_match = re.search(r'\(([^)]+)\)\s*$', raw_title)
-                if loc_match:
-                    location = loc_match.group(1)
-                
-                if clean_title == raw_title:
-                    clean_title = re.sub(r'\s+-\s+\$[0-9,]+.*$', '', raw_title)
-                    clean_title = re.sub(r'\s*\([^)]+\)\s*$', '', clean_title).strip()
-
-            url = find_text('link')
-            if not url:
-                url = item.attrib.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about', '')
-
-            image_url = ""
-            enclosure = item.find('{http://purl.org/rss/1.0/modules/enc/}enclosure')
+        image_url = ""
+        enclosure = children.get(FEED_ENC_ENCLOSURE_TAG)
+        if enclosure is not None:
+            image_url = enclosure.attrib.get('resource', '')
+        else:
+            enclosure = children.get('enclosure')
             if enclosure is not None:
-                image_url = enclosure.attrib.get('resource', '')
-            else:
-                enclosure = item.find('enclosure')
-                if enclosure is not None:
-                    image_url = enclosure.attrib.get('url', '')
-
-            posted_at = find_text('date')
-            if not posted_at:
-                posted_at = datetime.utcnow().isoformat()
-
-            listing_id = ""
-            if url:
-                id_match = re.search(r'/(\d+)\.html', url)
-                if id_match:
-                    listing_id = id_match.group(1)
+                image_url = enclosure.attrib.get('url', '')
+
+        posted_at = find_text(FEED_DATE_TAGS)
+        if not posted_at:
+            posted_at = datetime.utcnow().isoformat()
+
+        if not clean_title or not url:
+            return None
+
+        return ListingRecord(
+            clean_title, price, location, self.name, url, image_url or DEFAULT_IMAGE_URL,
+            posted_at, listing_id_for_url(url), self.keyword, parse_price_cents(price)
+        )
+
+class BrowserPool:
+    """
+    Long-lived headless Chromium handing out stealth-configured contexts.
+
+    Playwright objects are bound to the event loop that created them, so the pool
+    runs the async API on a private thread; render() can be called from any thread.
+    The browser is launched lazily on first use and relaunched if it crashes.
+    """
+
+    def __init__(self, max_contexts=None, pages_per_context=None):
+        self.max_contexts = max(1, max_contexts or BROWSER_MAX_CONTEXTS)
+        self.pages_per_context = max(1, pages_per_context or BROWSER_PAGES_PER_CONTEXT)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._browser = None
+        self._slots = None
+        self._launch_lock = None
+        self._idle = []
+        # Total Chromium launch time; fetch runs log the part spent during them
+        self.launch_seconds = 0.0
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def render(self, url, evaluate=None, timeout=60000, ready_timeout=15000):
+        """
+        Loads url in a pooled context and returns (page_title, content).
+
+        content is the page HTML, or the result of running the evaluate script in the page.
+        """
+        return self._run(self._render(url, evaluate, timeout, ready_timeout))
+
+    def close(self):
+        if self._loop is None:
+            return
+        try:
+            self._run(self._shutdown())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+    async def _ensure_browser(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_contexts)
+            self._launch_lock = asyncio.Lock()
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+
+        # Renders that find the browser down queue here; the first one (re)launches it and
+        # the rest see the new browser on the re-check instead of launching their own
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+
+            # Contexts of a crashed browser are unusable; drop them with it
+            self._idle = []
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+
+            started = time.monotonic()
+            self._browser = await self._playwright.chromium.launch(headless=True, args=BROWSER_LAUNCH_ARGS)
+            elapsed = time.monotonic() - started
+            self.launch_seconds += elapsed
+            logger.info(f"Launched pooled Chromium in {elapsed:.2f}s")
+            return self._browser
+
+    async def _new_context(self, browser):
+        from playwright_stealth import stealth_async
+
+        context = await browser.new_context(
+            viewport={"width": 1920, "height": 1080},
+            user_agent=BROWSER_USER_AGENT,
+            locale="en-US",
+            timezone_id="America/New_York"
+        )
+        # Remove webdriver property
+        await context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        await stealth_async(context)
+        return {"context": context, "pages": 0}
+
+    async def _render(self, url, evaluate, timeout, ready_timeout):
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+        browser = await self._ensure_browser()
+        async with self._slots:
+            entry = self._idle.pop() if self._idle else await self._new_context(browser)
+            healthy = False
+            try:
+                page = await entry["context"].new_page()
+                try:
+                    await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+                    # Wait for result rows to hydrate instead of sleeping a fixed interval
+                    try:
+                        await page.wait_for_selector(RESULT_SELECTOR, state="attached", timeout=ready_timeout)
+                    except PlaywrightTimeoutError:
+                        # Empty searches and block pages never render rows; callers inspect the title
+                        pass
+                    title = await page.title()
+                    content = await page.content() if evaluate is None else await page.evaluate(evaluate)
+                finally:
+                    await page.close()
+                healthy = True
+                return title, content
+            finally:
+                entry["pages"] += 1
+                if healthy and entry["pages"] < self.pages_per_context and browser.is_connected():
+                    self._idle.append(entry)
                 else:
-                    import hashlib
-                    listing_id = hashlib.md5(url.encode('utf-8')).hexdigest()
+                    try:
+                        await entry["context"].close()
+                    except Exception:
+                        pass
 
-            if not clean_title or not url:
-                continue
+    async def _shutdown(self):
+        for entry in self._idle:
+            try:
+                await entry["context"].close()
+            except Exception:
+                pass
+        self._idle = []
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        # Bound to this loop; close() discards it, so a later render starts afresh
+        self._slots = None
+        self._launch_lock = None
+
+_shared_browser_pool = None
+_shared_browser_pool_lock = threading.Lock()
 
-            normalized_listings.append({
-                "title": clean_title,
-                "price": price,
-                "location": location,
-                "source": self.name,
-                "url": url,
-                "image_url": image_url or "https://www.transparenttextures.com/patterns/aged-paper.png",
-                "posted_at": posted_at,
-                "listing_id": listing_id,
-                "keyword": self.keyword
-            })
+def get_shared_browser_pool():
+    """Returns the process-wide BrowserPool, used when fetches are triggered from app.py."""
+    global _shared_browser_pool
+    with _shared_browser_pool_lock:
+        if _shared_browser_pool is None:
+            _shared_browser_pool = BrowserPool()
+        return _shared_browser_pool
 
-        return normalized_listings
+def close_shared_browser_pool():
+    global _shared_browser_pool
+    with _shared_browser_pool_lock:
+        if _shared_browser_pool is not None:
+            _shared_browser_pool.close()
+            _shared_browser_pool = None
 
 # Craigslist Browser Scraping Source Subclass
+def _payload_size(content):
+    """Characters returned by a render: the HTML, or the text of the rows extracted in the page."""
+    if isinstance(content, str):
+        return len(content)
+    return sum(len(value) for row in content for value in row.values() if isinstance(value, str))
+
 class CraigslistListingSource(ListingSource):
-    def fetch(self) -> list:
+    def __init__(self, config, browser_pool=None):
+        super().__init__(config)
+        self.browser_pool = browser_pool
+        self.extractor = config.get("extractor", "dom")
+        self.max_pages = max(1, int(config.get("max_pages", CRAIGSLIST_MAX_PAGES)))
+
+    def page_url(self, offset):
+        """The search URL for the result page starting at offset (Craigslist's s= parameter)."""
+        if not offset:
+            return self.url
+        parsed = urllib.parse.urlparse(self.url)
+        query = [(key, value) for key, value in urllib.parse.parse_qsl(parsed.query, keep_blank_values=True) if key != "s"]
+        query.append(("s", str(offset)))
+        return urllib.parse.urlunparse(parsed._replace(query=urllib.parse.urlencode(query)))
+
+    def stream(self):
         if not self.enabled:
             logger.info(f"Source '{self.name}' is disabled. Skipping.")
-            return []
+            return
+
+        # Saved result pages are parsed directly, without a browser
+        if self.url.startswith("file://"):
+            file_path = urllib.request.url2pathname(urllib.parse.urlparse(self.url).path)
+            logger.info(f"Reading saved Craigslist page from: {file_path}")
+            with open(file_path, "r", encoding="utf-8") as f:
+                content = f.read()
+            self.pages_fetched = 1
+            self.bytes_downloaded = len(content)
+            with self.parse_timer:
+                rows = extract_result_rows(content)
+            yield from self._timed(self.iter_normalized_rows(rows))
+            return
 
         logger.info(f"Fetching listings from Craigslist browser view: {self.name} ({self.url})")
-        from playwright.sync_api import sync_playwright
-        from playwright_stealth import stealth_sync
-        from bs4 import BeautifulSoup
 
-        normalized_listings = []
+        # Standalone use gets a private pool that lives only for this fetch
+        pool = self.browser_pool or BrowserPool(max_contexts=1)
 
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(
-                    headless=True,
-                    args=[
-                        "--disable-blink-features=AutomationControlled",
-                        "--no-sandbox",
-                        "--disable-setuid-sandbox",
-                        "--disable-infobars",
-                        "--window-position=0,0",
-                        "--ignore-certificate-errors"
-                    ]
-                )
-                context = browser.new_context(
-                    viewport={"width": 1920, "height": 1080},
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-                    locale="en-US",
-                    timezone_id="America/New_York"
-                )
-                
-                # Remove webdriver property
-                context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-                stealth_sync(context)
-
-                page = context.new_page()
-                page.goto(self.url, wait_until="domcontentloaded", timeout=60000)
-                
-                # Wait 2 seconds for JS hydration
-                time.sleep(2)
-                
+            try:
+                yield from self._crawl(pool)
+            finally:
+                if pool is not self.browser_pool:
+                    pool.close()
+        except Exception as e:
+            logger.error(f"Error fetching from Craigslist source '{self.name}': {e}")
+            raise e
+
+    def _crawl(self, pool):
+        """
+        Walks result pages newest first until one holds no unseen listing, yielding each
+        page's listings once it has been checked.
+
+        A page whose listing_ids are all stored already means everything older was captured
+        by an earlier run, so steady-state runs read one page and a new search walks its
+        backlog up to max_pages. Paging also stops at an empty or repeated page (past the end),
+        and at a later page that fails for any reason but a block, whose error goes to page_error.
+        """
+        # "dom" extracts rows inside the page; "html" ships the markup back and parses it here
+        evaluate = EXTRACT_ROWS_JS if self.extractor == "dom" else None
+        crawled_ids = set()
+        offset = 0
+        self.pages_fetched = 0
+        self.page_error = None
+
+        while self.pages_fetched < self.max_pages:
+            if self.pages_fetched and self.before_page is not None:
+                try:
+                    self.before_page()
+                except Exception as e:
+                    # Deferred or cancelled mid-crawl: keep the pages already read
+                    logger.info(f"  Stopping '{self.name}' after page {self.pages_fetched}: {e.__class__.__name__}")
+                    break
+
+            pages_read = self.pages_fetched
+            try:
+                page_title, content = pool.render(self.page_url(offset), evaluate=evaluate)
+                self.pages_fetched += 1
+                self.bytes_downloaded += _payload_size(content)
+
                 # Check for block
-                page_title = page.title()
                 if "blocked" in page_title.lower():
-                    browser.close()
                     raise PermissionError(f"Craigslist blocked browser session for '{self.name}'.")
 
-                content = page.content()
-                browser.close()
+                with self.parse_timer:
+                    rows = content if evaluate else extract_result_rows(content)
+                    page = [listing for listing in self.iter_normalized_rows(rows) if listing.listing_id not in crawled_ids]
+            except Exception as e:
+                # A later page failing (timeout, selector miss) keeps the pages already read; the
+                # first page failing, or a block on any page, fails the source
+                if not pages_read or is_block_error(e):
+                    raise
+                self.page_error = f"stopped after page {pages_read}: {e}"
+                logger.warning(f"  Stopping '{self.name}' {self.page_error}")
+                break
+            logger.info(f"  Parsed {len(rows)} items from HTML (page {self.pages_fetched}, s={offset})")
+            if not page:
+                break
+            page_ids = {listing.listing_id for listing in page}
+            crawled_ids |= page_ids
+
+            # Checked before the page is yielded, while none of it can have been ingested yet
+            all_known = self.known_ids is not None and len(self.known_ids(page_ids)) == len(page_ids)
+            yield from page
+            if all_known:
+                break
+            offset += len(rows)
+        else:
+            logger.info(f"  Reached the {self.max_pages}-page cap for '{self.name}'")
+
+    def normalize_rows(self, rows) -> list:
+        return list(self.iter_normalized_rows(rows))
+
+    def iter_normalized_rows(self, rows):
+        """Yields a ListingRecord for each raw extracted result row."""
+        match = URL_ORIGIN_RE.match(self.url or "")
+        base = match.group(1) if match else "https://craigslist.org"
+        today = datetime.now().strftime("%Y-%m-%d")
+
+        for row in rows:
+            try:
+                title = row["title"]
+                link = row["href"]
+                if title is None or link is None:
+                    continue
+                if not link.startswith("http"):
+                    link = base + link
+
+                price = row["price"] if row["price"] is not None else "N/A"
+                location = row["location"] if row["location"] is not None else self.region
+                post_id = row["pid"] or listing_id_for_url(link)
+
+                # Posted Date
+                posted_date = today
+                if row["datetime"]:
+                    posted_date = row["datetime"].split(" ")[0]
+                elif row["meta"]:
+                    date_match = META_DATE_RE.search(row["meta"])
+                    if date_match:
+                        try:
+                            dt = datetime.strptime(date_match.group(1), "%m/%d")
+                            dt = dt.replace(year=datetime.now().year)
+                            posted_date = dt.strftime("%Y-%m-%d")
+                        except ValueError:
+                            pass
+
+                record = ListingRecord(
+                    title, price, location, self.name, link, DEFAULT_IMAGE_URL,
+                    posted_date, post_id, self.keyword, parse_price_cents(price)
+                )
+            except Exception as row_err:
+                logger.warning(f"Error parsing Craigslist row: {row_err}")
+                continue
+            yield record
+
+def build_source(config, browser_pool=None):
+    """Instantiates the ListingSource subclass matching a sources.json entry."""
+    source_type = config.get("type", "rss")
+    if source_type == "craigslist":
+        return CraigslistListingSource(config, browser_pool=browser_pool)
+    return RssListingSource(config)
+
+class HostLimiter:
+    """Caps the number of concurrent fetches against any single host."""
+
+    def __init__(self, max_per_host):
+        self.max_per_host = max(1, max_per_host)
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def slot(self, url):
+        host = host_for_url(url)
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_per_host)
+                self._semaphores[host] = semaphore
+        return semaphore
+
+INSERT_LISTING_SQL = f"""
+    INSERT OR IGNORE INTO listings (title, price, location, source, url, image_url, posted_at, listing_id, keyword, price_cents, change_seq, posted_ts)
+    VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?11, {POSTED_TS_SQL.format(posted_at='?7')})
+"""
+
+def _chunks(iterable, size):
+    """Yields lists of up to size items without materializing the iterable."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+KNOWN_IDS_SQL = """
+    WITH ids AS (SELECT value FROM json_each(?))
+    SELECT listing_id FROM listings WHERE listing_id IN ids
+    UNION ALL
+    SELECT listing_id FROM listings_archive WHERE listing_id IN ids
+"""
 
-            # Parse DOM
-            soup = BeautifulSoup(content, "html.parser")
-            items = soup.select(".cl-search-result, .cl-static-search-result, .result-row")
-            logger.info(f"  Parsed {len(items)} items from HTML")
+def ingest_listings(conn, listings, chunk_size=None, fingerprints=None):
+    """
+    Bulk-inserts ListingRecords and returns (inserted, skipped, rejected).
 
-            for item in items:
+    listings can be any iterable; it is consumed chunk_size records at a time, so a
+    generator is never held in full. Each chunk is validated (see validate_batch), listing_ids
+    already stored are filtered out with a single query, and the rest are written with
+    executemany in one transaction. INSERT OR IGNORE still resolves repeats inside the batch
+    and url collisions, so the counts match row-at-a-time inserts. Records that fail
+    validation or that the database refuses count as rejected, so the three totals add up
+    to the number of records read. fingerprints, from dedup.fingerprint_listings, saves
+    hashing the new rows while the writer is held.
+    """
+    chunk_size = max(1, chunk_size or INGEST_CHUNK_SIZE)
+    cursor = conn.cursor()
+    inserted = 0
+    skipped = 0
+    rejected_count = 0
+
+    for records in _chunks(listings, chunk_size):
+        records, rejected = validate_batch(records)
+        if rejected:
+            rejected_count += len(rejected)
+            logger.warning(f"  Rejected {len(rejected)} listings with a blank title or invalid URL (first: {rejected[0].url!r})")
+
+        # Archived listings count as known, so retention does not make them come back as new
+        cursor.execute(KNOWN_IDS_SQL, (json.dumps([record.listing_id for record in records]),))
+        known_ids = {row[0] for row in cursor.fetchall()}
+        pending = [record for record in records if record.listing_id not in known_ids]
+        skipped += len(records) - len(pending)
+        if not pending:
+            continue
+
+        # Rows lost to INSERT OR IGNORE leave gaps in change_seq, which only has to be increasing
+        first_seq = reserve_change_seq(cursor, len(pending))
+        chunk = [record + (first_seq + offset,) for offset, record in enumerate(pending)]
+        try:
+            cursor.executemany(INSERT_LISTING_SQL, chunk)
+            chunk_inserted = cursor.rowcount
+        except Exception:
+            # Retry row by row so one bad row costs only itself, as before batching
+            conn.rollback()
+            # The rollback also released the reserved sequence block
+            first_seq = reserve_change_seq(cursor, len(chunk))
+            chunk = [row[:-1] + (first_seq + offset,) for offset, row in enumerate(chunk)]
+            chunk_inserted = 0
+            for row in chunk:
                 try:
-                    title_elem = item.select_one("a.posting-title, .title, .result-title")
-                    if not title_elem:
-                        continue
-                    title = title_elem.get_text(strip=True)
-                    
-                    # Extract link
-                    a_tag = item.select_one("a[href]")
-                    if not a_tag:
-                        continue
-                    link = a_tag["href"]
-                    if not link.startswith("http"):
-                        match = re.match(r"(https?://[^/]+)", self.url)
-                        base = match.group(1) if match else "https://craigslist.org"
-                        link = base + link
-
-                    # Extract price
-                    price_elem = item.select_one(".priceinfo, .price, .result-price")
-                    price = price_elem.get_text(strip=True) if price_elem else "N/A"
-
-                    # Location
-                    location_elem = item.select_one(".location, .nearby")
-                    location = location_elem.get_text(strip=True) if location_elem else self.region
-
-                    # Listing ID
-                    post_id = item.get("data-pid")
-                    if not post_id:
-                        id_match = re.search(r'/(\d+)\.html', link)
-                        if id_match:
-                            post_id = id_match.group(1)
-                        else:
-                            import hashlib
-                            post_id = hashlib.md5(link.encode('utf-8')).hexdigest()
-
-                    # Posted Date
-                    posted_date = datetime.now().strftime("%Y-%m-%d")
-                    time_elem = item.select_one("time")
-                    if time_elem and time_elem.get("datetime"):
-                        posted_date = time_elem["datetime"].split(" ")[0]
+                    cursor.execute(INSERT_LISTING_SQL, row)
+                    if cursor.rowcount > 0:
+                        chunk_inserted += 1
                     else:
-                        meta = item.select_one(".meta")
-                        if meta:
-                            date_match = re.search(r"(\d{1,2}/\d{1,2})", meta.get_text())
-                            if date_match:
-                                try:
-                                    dt = datetime.strptime(date_match.group(1), "%m/%d")
-                                    dt = dt.replace(year=datetime.now().year)
-                                    posted_date = dt.strftime("%Y-%m-%d")
-                                except:
-                                    pass
-
-                    normalized_listings.append({
-                        "title": title,
-                        "price": price,
-                        "location": location,
-                        "source": self.name,
-                        "url": link,
-                        "image_url": "https://www.transparenttextures.com/patterns/aged-paper.png",
-                        "posted_at": posted_date,
-                        "listing_id": post_id,
-                        "keyword": self.keyword
-                    })
-                except Exception as row_err:
-                    logger.warning(f"Error parsing Craigslist row: {row_err}")
-                    continue
+                        skipped += 1
+                except Exception as e:
+                    rejected_count += 1
+                    logger.error(f"Failed to insert listing {row[4]}: {e}")
+        else:
+            skipped += len(chunk) - chunk_inserted
+        if chunk_inserted:
+            # New rows are grouped with their near-duplicates in the same transaction
+            duplicates = assign_pending(cursor, fingerprints)
+            if duplicates:
+                logger.info(f"  Grouped {duplicates} near-duplicate listings")
+            score_pending(cursor)
+            # New rows start unseen
+            adjust_listing_counts(cursor, chunk_inserted, chunk_inserted)
+            bump_generation(cursor)
+        conn.commit()
+        inserted += chunk_inserted
+
+    return inserted, skipped, rejected_count
+
+def known_listing_ids(database, listing_ids):
+    """The subset of listing_ids already stored (live or archived), read through a pooled reader."""
+    with database.reader() as conn:
+        rows = conn.execute(KNOWN_IDS_SQL, (json.dumps(list(listing_ids)),)).fetchall()
+    return {row[0] for row in rows}
+
+def load_http_cache(cursor):
+    """Returns stored HTTP validators keyed by source id."""
+    cursor.execute("SELECT source_id, url, etag, last_modified, content_hash FROM http_cache")
+    return {
+        row[0]: {"url": row[1], "etag": row[2], "last_modified": row[3], "content_hash": row[4]}
+        for row in cursor.fetchall()
+    }
+
+def save_http_cache(cursor, source):
+    """Persists the validators a source observed so the next run can send a conditional request."""
+    validators = source.http_validators
+    if not source.id or not validators:
+        return
+    cursor.execute("""
+        INSERT INTO http_cache (source_id, url, etag, last_modified, content_hash, updated_at)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(source_id) DO UPDATE SET
+            url = excluded.url,
+            etag = excluded.etag,
+            last_modified = excluded.last_modified,
+            content_hash = excluded.content_hash,
+            updated_at = excluded.updated_at
+    """, (source.id, source.url, validators.get("etag"), validators.get("last_modified"), validators.get("content_hash")))
+
+class FetchCancelled(Exception):
+    """Raised in a worker when the run was cancelled before its source started."""
+
+def _clean_error(error):
+    return re.sub(r'token=[^&\s]+', 'token=REDACTED', str(error))
+
+def _fetch_source(source, host_limiter, scheduler, results, cancel_event=None):
+    """
+    Worker entry point: fetches one source while holding its host slot and a rate-limit token.
+
+    Listings go to the writer thread through results, a bounded queue, as
+    (source, chunk, fingerprints) every INGEST_CHUNK_SIZE records, so a large feed is never
+    held in full and a worker waits while the writer is behind. The last item for a source
+    is (source, None, error), error being None when the fetch succeeded. Chunks sent before
+    a failure are still ingested.
+    """
+    try:
+        _stream_source(source, host_limiter, scheduler, results, cancel_event)
+    except Exception as e:
+        results.put((source, None, e))
+    else:
+        results.put((source, None, None))
+
+def _stream_source(source, host_limiter, scheduler, results, cancel_event):
+    with host_limiter.slot(source.url):
+        if cancel_event is not None and cancel_event.is_set():
+            raise FetchCancelled()
+        scheduler.acquire(source.url, cancel_event)
 
+        def before_page():
+            if cancel_event is not None and cancel_event.is_set():
+                raise FetchCancelled()
+            scheduler.acquire(source.url, cancel_event)
+
+        # Every further result page is another request against the host
+        source.before_page = before_page
+        handoff = Stopwatch()
+        started = time.perf_counter()
+        try:
+            for chunk in _chunks(source.stream(), max(1, INGEST_CHUNK_SIZE)):
+                # Near-duplicate fingerprints are pure computation, done here rather than under the writer
+                with handoff:
+                    results.put((source, chunk, fingerprint_listings(chunk)))
+        except (SourceDeferred, FetchCancelled):
+            # Rate limited or cancelled, not failed: the source's backoff is left as it was
+            raise
         except Exception as e:
-            logger.error(f"Error fetching from Craigslist source '{self.name}': {e}")
-            raise e
+            source.blocked = is_block_error(e)
+            # Recorded here, not on the main thread, so a block defers this host's queued sources at once
+            scheduler.record_failure(source, e, _clean_error(e))
+            raise
+        finally:
+            source.fetch_seconds = time.perf_counter() - started - handoff.seconds
 
-        return normalized_listings
+def fetch_and_save(max_workers=None, max_per_host=None, browser_pool=None, progress=None, cancel_event=None, scheduler=None, sources_path=None):
+    """
+    Fetches every due source, ingests the results and logs the run; returns a summary dict.
 
-def fetch_and_save():
+    progress, if given, receives the same start/source event dicts published to /api/stream.
+    Setting cancel_event stops sources that have not started; fetches already in flight
+    finish and are still ingested, and the run is logged as cancelled. Sources whose source
+    or host is cooling down after failures are skipped (see scheduler.py). sources_path
+    defaults to SOURCES_PATH.
+    """
     init_db()
+    run_started = time.perf_counter()
 
     # Load sources.json
-    sources_path = "./sources.json"
+    sources_path = sources_path or SOURCES_PATH
     if not os.path.exists(sources_path):
         logger.error(f"Sources config file not found: {sources_path}")
-        return
+        return {"status": "failure", "error_message": f"Sources config file not found: {sources_path}"}
+
+    # FETCH_PROFILE captures this thread: scheduling, ingest and dedup (workers are timed per source)
+    profile = start_profile()
+
+    def report(event):
+        publish("progress", event)
+        if progress is not None:
+            progress(event)
 
     with open(sources_path, "r", encoding="utf-8") as f:
         sources_config = json.load(f)
 
+    # One browser serves every Craigslist source in the run unless the caller shares its own
+    owns_browser_pool = browser_pool is None
+    if owns_browser_pool:
+        browser_pool = BrowserPool()
+    launch_seconds_before = browser_pool.launch_seconds
+
+    sources = [build_source(config, browser_pool=browser_pool) for config in sources_config]
+    sources = [source for source in sources if source.enabled]
+
+    max_workers = max(1, max_workers or FETCH_MAX_WORKERS)
+    host_limiter = HostLimiter(max_per_host or FETCH_MAX_PER_HOST)
+
     checked_total = 0
     inserted_total = 0
     skipped_total = 0
     failures = []
+    source_results = []
 
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    # Sources are fetched on worker threads; this thread writes through the shared writer
+    database = get_database(DATABASE_PATH)
 
-    for config in sources_config:
-        source_type = config.get("type", "rss")
-        if source_type == "craigslist":
-            source = CraigslistListingSource(config)
+    # Validators are only reused while the source still points at the same URL
+    scheduler = scheduler or SourceScheduler()
+    with database.reader() as conn:
+        http_cache = load_http_cache(conn.cursor())
+        scheduler.load(conn.cursor())
+    for source in sources:
+        cached = http_cache.get(source.id)
+        if cached and cached["url"] == source.url:
+            source.http_cache = cached
+        source.known_ids = lambda ids: known_listing_ids(database, ids)
+
+    report({"phase": "start", "total": len(sources), "sources": [source.name for source in sources]})
+    cancelled = False
+
+    # Sources (or hosts) still backing off from earlier failures, or not yet due for their
+    # adaptive poll, are not attempted
+    due, waiting = scheduler.partition(sources)
+    for source, eligible_at, reason in waiting:
+        index = sources.index(source)
+        if reason == "poll":
+            message = f"next adaptive poll at {format_ts(eligible_at)}"
         else:
-            source = RssListingSource(config)
+            message = f"cooling down until {format_ts(eligible_at)}"
+        source_results.append((index, source, "skipped", 0, 0, 0, message))
+        logger.info(f"Source '{source.name}' skipped: {message}")
+        report({"phase": "source", "source": source.name, "status": "skipped", "checked": 0, "inserted": 0,
+                "completed": len(source_results), "total": len(sources)})
 
-        if not source.enabled:
-            continue
+    # Per source: checked, inserted, skipped and rejected listings so far
+    counts = {source: [0, 0, 0, 0] for source in due}
+    ingest_errors = {}
 
+    def finish(source, error):
+        """Records a source's outcome once its worker is done or it was cancelled unstarted."""
+        nonlocal cancelled
+        index = sources.index(source)
+        checked_count, source_inserted, source_skipped, source_rejected = counts[source]
         try:
-            listings = source.fetch()
-            checked_count = len(listings)
-            checked_total += checked_count
-            
-            source_inserted = 0
-            source_skipped = 0
-
-            for listing in listings:
-                try:
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO listings (title, price, location, source, url, image_url, posted_at, listing_id, keyword)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        listing["title"],
-                        listing["price"],
-                        listing["location"],
-                        listing["source"],
-                        listing["url"],
-                        listing["image_url"],
-                        listing["posted_at"],
-                        listing["listing_id"],
-                        listing["keyword"]
-                    ))
-                    if cursor.rowcount > 0:
-                        source_inserted += 1
-                    else:
-                        source_skipped += 1
-                except Exception as e:
-                    logger.error(f"Failed to insert listing {listing.get('url')}: {e}")
-
-            inserted_total += source_inserted
-            skipped_total += source_skipped
-            logger.info(f"Source '{source.name}' complete. Checked: {checked_count}, Inserted: {source_inserted}, Skipped: {source_skipped}")
+            if error is not None:
+                raise error
+            # Validators are saved only once the body they describe has been ingested
+            with source.insert_timer, database.writer() as conn:
+                save_http_cache(conn.cursor(), source)
+                scheduler.record_success(source, source_inserted)
+                scheduler.save(conn.cursor(), source)
+            # A crawl cut short by a later page still succeeded; the run records why it stopped
+            page_error = _clean_error(source.page_error) if source.page_error else None
+            source_results.append((index, source, "success", checked_count, source_inserted, source_skipped, page_error))
+            cache_note = f", Cache: {source.cache_status}" if source.cache_status else ""
+            pages_note = f", Pages: {source.pages_fetched}" if source.pages_fetched > 1 else ""
+            rejected_note = f", Rejected: {source_rejected}" if source_rejected else ""
+            stopped_note = f", {page_error}" if page_error else ""
+            logger.info(f"Source '{source.name}' complete. Checked: {checked_count}, Inserted: {source_inserted}, Skipped: {source_skipped}{rejected_note}{cache_note}{pages_note}{stopped_note}")
 
+        except FetchCancelled:
+            cancelled = True
+            source_results.append((index, source, "cancelled", checked_count, source_inserted, source_skipped, None))
+        except SourceDeferred as e:
+            source_results.append((index, source, "skipped", checked_count, source_inserted, source_skipped, str(e)))
+            logger.info(f"Source '{source.name}' deferred: {e}")
         except Exception as e:
-            error_msg = str(e)
-            clean_error = re.sub(r'token=[^&\s]+', 'token=REDACTED', error_msg)
-            failures.append(f"{source.name}: {clean_error}")
+            clean_error = _clean_error(e)
+            failures.append((index, f"{source.name}: {clean_error}"))
+            source_results.append((index, source, "failure", checked_count, source_inserted, source_skipped, clean_error))
             logger.error(f"Source '{source.name}' failed: {clean_error}")
+            logger.info(f"Source '{source.name}' backing off until {format_ts(scheduler.eligible_at(source))}")
+            try:
+                with database.writer() as conn:
+                    scheduler.save(conn.cursor(), source)
+            except Exception as health_err:
+                logger.error(f"Failed to save health for source '{source.name}': {health_err}")
+
+        report({
+            "phase": "source",
+            "source": source.name,
+            "status": source_results[-1][2],
+            "checked": checked_count,
+            "inserted": source_inserted,
+            "completed": len(source_results),
+            "total": len(sources)
+        })
+
+    # Workers stream parsed chunks to this thread, which ingests them through the shared
+    # writer; once FETCH_QUEUE_CHUNKS are waiting, workers hold off until it catches up
+    results = queue.Queue(maxsize=max(1, FETCH_QUEUE_CHUNKS))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch") as executor:
+        futures = {
+            executor.submit(_fetch_source, source, host_limiter, scheduler, results, cancel_event): source
+            for source in due
+        }
+        remaining = len(futures)
+
+        while remaining:
+            if not cancelled and cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                logger.info("Fetch run cancelled; skipping sources that have not started.")
+                for pending, source in futures.items():
+                    if pending.cancel():
+                        remaining -= 1
+                        finish(source, FetchCancelled())
+                if not remaining:
+                    break
+
+            source, listings, payload = results.get()
+            if listings is None:
+                remaining -= 1
+                finish(source, payload or ingest_errors.get(source))
+                continue
+            if source in ingest_errors:
+                # The source has already failed; its remaining chunks are dropped
+                continue
+
+            try:
+                # Held per chunk, so API writes interleave with a long run
+                with source.insert_timer, database.writer() as conn:
+                    chunk_inserted, chunk_skipped, chunk_rejected = ingest_listings(conn, listings, fingerprints=payload)
+            except Exception as e:
+                ingest_errors[source] = e
+                continue
+            tally = counts[source]
+            tally[0] += len(listings)
+            tally[1] += chunk_inserted
+            tally[2] += chunk_skipped
+            tally[3] += chunk_rejected
+            if chunk_inserted:
+                # Streams read the new rows back by id; the event only wakes them
+                publish("listings", {"source": source.name, "inserted": chunk_inserted})
+
+    for _, source, _, checked, inserted, skipped, _ in source_results:
+        checked_total += checked
+        inserted_total += inserted
+        skipped_total += skipped
+    rejected_total = sum(tally[3] for tally in counts.values())
+
+    browser_launch_seconds = browser_pool.launch_seconds - launch_seconds_before
+    if owns_browser_pool:
+        browser_pool.close()
+
+    # Report failures in sources.json order regardless of completion order
+    failures = [message for _, message in sorted(failures)]
 
     status = "success"
     error_message = None
     if failures:
         status = "failure"
         error_message = "; ".join(failures)
+    if cancelled:
+        status = "cancelled"
+
+    bytes_total = sum(source.bytes_downloaded for source in sources)
+    blocked_total = sum(1 for source in sources if source.blocked)
 
+    log_id = None
     try:
-        cursor.execute("""
-            INSERT INTO update_logs (status, checked_count, inserted_count, skipped_count, error_message)
-            VALUES (?, ?, ?, ?, ?)
-        """, (status, checked_total, inserted_total, skipped_total, error_message))
-        conn.commit()
-        logger.info(f"Execution logged. Status: {status}, Inserted: {inserted_total}, Skipped: {skipped_total}")
+        with database.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO update_logs (status, checked_count, inserted_count, skipped_count, error_message,
+                                         duration_ms, browser_launch_ms, bytes_downloaded, blocked_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                status, checked_total, inserted_total, skipped_total, error_message,
+                to_ms(time.perf_counter() - run_started), to_ms(browser_launch_seconds), bytes_total, blocked_total
+            ))
+            log_id = cursor.lastrowid
+            bump_generation(cursor)
+            cursor.executemany("""
+                INSERT INTO source_runs (log_id, source_id, source_name, status, checked_count, inserted_count, skipped_count, cache_status, error_message,
+                                         fetch_ms, parse_ms, insert_ms, bytes_downloaded, blocked)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    log_id, source.id, source.name, source_status, checked, inserted, skipped, source.cache_status, error,
+                    to_ms(source.fetch_seconds), to_ms(source.parse_timer.seconds) if source.fetch_seconds is not None else None,
+                    to_ms(source.insert_timer.seconds) if source.insert_timer.seconds else None, source.bytes_downloaded, int(source.blocked)
+                )
+                for _, source, source_status, checked, inserted, skipped, error in sorted(source_results, key=lambda result: result[0])
+            ])
+        logger.info(f"Execution logged. Status: {status}, Inserted: {inserted_total}, Skipped: {skipped_total}, Rejected: {rejected_total}")
+        publish("run", {"log_id": log_id})
     except Exception as log_err:
         logger.error(f"Failed to write execution log to database: {log_err}")
+    stop_profile(profile)
 
-    conn.close()
+    # Archive expired listings and roll up old run logs once per run
+    try:
+        apply_retention(database)
+    except Exception as retention_err:
+        logger.error(f"Failed to apply retention: {retention_err}")
 
     print("\n" + "="*40)
     print(f"FETCH RUN SUMMARY: {status.upper()}")
@@ -453,11 +1652,25 @@ def fetch_and_save():
     print(f"Checked Listings:  {checked_total}")
     print(f"New Inserted:      {inserted_total}")
     print(f"Duplicates Skipped:{skipped_total}")
+    print(f"Invalid Rejected:  {rejected_total}")
     if failures:
         print("\nFailures:")
         for fail in failures:
             print(f" - {fail}")
     print("="*40)
 
+    return {
+        "status": status,
+        "log_id": log_id,
+        "checked_count": checked_total,
+        "inserted_count": inserted_total,
+        "skipped_count": skipped_total,
+        "rejected_count": rejected_total,
+        "error_message": error_message
+    }
+
 if __name__ == "__main__":
     fetch_and_save()
+    if STATIC_EXPORT_DIR:
+        from export_static import export_static
+        export_static(export_dir=STATIC_EXPORT_DIR, database_path=DATABASE_PATH)
@@ -0,0 +1,226 @@
+import os
+import uuid
+import queue
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from events import publish
+
+logger = logging.getLogger("jobs")
+
+# "thread" runs fetches on a dedicated thread in the web process; "process" in a child process
+FETCH_JOB_MODE = os.environ.get("FETCH_JOB_MODE", "thread")
+# Finished jobs kept for /api/jobs
+FETCH_JOB_HISTORY = int(os.environ.get("FETCH_JOB_HISTORY", "20"))
+
+ACTIVE_STATES = ("queued", "running")
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+class Job:
+    """State of one fetch run as reported by /api/jobs/{id}."""
+
+    def __init__(self, mode):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.status = "queued"
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.total_sources = None
+        self.sources = OrderedDict()
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+        self.cancel_event = None
+
+    def apply_progress(self, event):
+        if event.get("phase") == "start":
+            self.total_sources = event["total"]
+            for name in event.get("sources", []):
+                self.sources[name] = {"source": name, "status": "pending"}
+        elif event.get("phase") == "source":
+            self.sources[event["source"]] = {
+                "source": event["source"],
+                "status": event["status"],
+                "checked": event["checked"],
+                "inserted": event["inserted"]
+            }
+
+    def to_dict(self):
+        completed = sum(1 for entry in self.sources.values() if entry["status"] != "pending")
+        return {
+            "id": self.id,
+            "status": self.status,
+            "mode": self.mode,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "cancel_requested": self.cancel_requested,
+            "total_sources": self.total_sources,
+            "completed_sources": completed,
+            "sources": list(self.sources.values()),
+            "result": self.result,
+            "error": self.error
+        }
+
+def _process_main(progress_queue, cancel_event):
+    """Child process entry point: one fetch run, reporting progress and the result over a queue."""
+    from fetch_listings import fetch_and_save
+    try:
+        result = fetch_and_save(progress=progress_queue.put, cancel_event=cancel_event)
+        progress_queue.put({"phase": "result", "result": result})
+    except Exception as e:
+        progress_queue.put({"phase": "error", "error": str(e)})
+
+class JobRunner:
+    """
+    Runs fetch_and_save jobs one at a time (single-flight).
+
+    submit() returns the active job instead of starting a second scrape. In thread mode the
+    run happens on a dedicated thread, off uvicorn's request threadpool, and shares the
+    app's browser pool; in process mode it runs in a spawned child so scraping cannot take
+    the GIL from request handling. Either way the job is tracked here and cancelled through
+    an Event the fetch loop checks between sources.
+    """
+
+    def __init__(self, mode=None, history=None):
+        self.mode = mode or FETCH_JOB_MODE
+        if self.mode not in ("thread", "process"):
+            raise ValueError(f"Unknown FETCH_JOB_MODE '{self.mode}'")
+        self.history = history or FETCH_JOB_HISTORY
+        self._jobs = OrderedDict()
+        self._active = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, browser_pool=None):
+        """Starts a fetch job, or returns the running one; the bool is True when a new job started."""
+        with self._lock:
+            if self._active is not None and self._active.status in ACTIVE_STATES:
+                return self._active, False
+            job = Job(self.mode)
+            if self.mode == "process":
+                job.cancel_event = multiprocessing.get_context("spawn").Event()
+            else:
+                job.cancel_event = threading.Event()
+            self._jobs[job.id] = job
+            self._active = job
+            while len(self._jobs) > self.history:
+                oldest_id = next(iter(self._jobs))
+                if self._jobs[oldest_id] is job:
+                    break
+                del self._jobs[oldest_id]
+
+        target = self._run_process if self.mode == "process" else self._run_thread
+        self._thread = threading.Thread(target=target, args=(job, browser_pool), name=f"fetch-job-{job.id[:8]}", daemon=True)
+        self._thread.start()
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list(self):
+        with self._lock:
+            return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def cancel(self, job_id):
+        """Requests cancellation; returns the job dict, or None for an unknown id."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status in ACTIVE_STATES:
+                job.cancel_requested = True
+                job.cancel_event.set()
+            return job.to_dict()
+
+    def shutdown(self, timeout=30):
+        """Cancels the active job and waits briefly for it to wind down."""
+        with self._lock:
+            active = self._active
+        if active is not None and active.status in ACTIVE_STATES:
+            self.cancel(active.id)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _update(self, job, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(job, name, value)
+
+    def _progress(self, job, event):
+        with self._lock:
+            job.apply_progress(event)
+
+    def _finish(self, job, result=None, error=None):
+        if error is not None:
+            status = "failed"
+        elif result and result.get("status") == "cancelled":
+            status = "cancelled"
+        elif result and result.get("status") == "success":
+            status = "succeeded"
+        else:
+            status = "failed"
+        self._update(job, status=status, result=result, error=error, finished_at=_now())
+        logger.info(f"Fetch job {job.id} finished: {status}")
+
+    def _run_thread(self, job, browser_pool):
+        from fetch_listings import fetch_and_save
+        self._update(job, status="running", started_at=_now())
+        try:
+            result = fetch_and_save(
+                browser_pool=browser_pool,
+                progress=lambda event: self._progress(job, event),
+                cancel_event=job.cancel_event
+            )
+            self._finish(job, result=result)
+        except Exception as e:
+            logger.error(f"Fetch job {job.id} failed: {e}")
+            self._finish(job, error=str(e))
+
+    def _run_process(self, job, browser_pool):
+        context = multiprocessing.get_context("spawn")
+        progress_queue = context.Queue()
+        process = context.Process(target=_process_main, args=(progress_queue, job.cancel_event), daemon=True)
+        self._update(job, status="running", started_at=_now())
+        try:
+            process.start()
+        except Exception as e:
+            logger.error(f"Fetch job {job.id} could not start its worker process: {e}")
+            self._finish(job, error=str(e))
+            return
+
+        result = None
+        error = None
+        while True:
+            try:
+                event = progress_queue.get(timeout=0.5)
+            except queue.Empty:
+                if not process.is_alive():
+                    break
+                continue
+            phase = event.get("phase")
+            if phase == "result":
+                result = event["result"]
+            elif phase == "error":
+                error = event["error"]
+            else:
+                self._progress(job, event)
+                # The child has no stream subscribers; re-publish for this process's streams
+                publish("progress", event)
+                if event.get("inserted"):
+                    publish("listings", {"source": event.get("source"), "inserted": event["inserted"]})
+        process.join()
+
+        if result is None and error is None:
+            error = f"Fetch process exited with code {process.exitcode}"
+        if result is not None:
+            publish("run", {"log_id": result.get("log_id")})
+        self._finish(job, result=result, error=error)
@@ -0,0 +1,171 @@
+import os
+import time
+import logging
+from datetime import datetime
+
+logger = logging.getLogger("metrics")
+
+# Profile whole fetch runs: "" (off), "cprofile" (.prof for pstats/snakeviz) or "pyinstrument" (.html)
+FETCH_PROFILE = os.environ.get("FETCH_PROFILE", "").lower()
+FETCH_PROFILE_DIR = os.environ.get("FETCH_PROFILE_DIR", "./data/profiles")
+
+METRIC_PREFIX = "oldtimecrank"
+
+def start_profile():
+    """Starts the profiler selected by FETCH_PROFILE; returns a handle for stop_profile, or None."""
+    if not FETCH_PROFILE:
+        return None
+    try:
+        if FETCH_PROFILE == "cprofile":
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif FETCH_PROFILE == "pyinstrument":
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+        else:
+            logger.warning(f"Unknown FETCH_PROFILE '{FETCH_PROFILE}'; profiling disabled.")
+            return None
+    except ImportError:
+        logger.warning(f"FETCH_PROFILE={FETCH_PROFILE} but the profiler is not installed; profiling disabled.")
+        return None
+    return FETCH_PROFILE, profiler
+
+def stop_profile(handle):
+    """Stops the profiler and writes its report to FETCH_PROFILE_DIR; returns the file path."""
+    if handle is None:
+        return None
+    kind, profiler = handle
+    os.makedirs(FETCH_PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    try:
+        if kind == "cprofile":
+            profiler.disable()
+            path = os.path.join(FETCH_PROFILE_DIR, f"fetch-{stamp}.prof")
+            profiler.dump_stats(path)
+        else:
+            profiler.stop()
+            path = os.path.join(FETCH_PROFILE_DIR, f"fetch-{stamp}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+    except Exception as e:
+        logger.error(f"Failed to write fetch profile: {e}")
+        return None
+    logger.info(f"Fetch run profile written to {path}")
+    return path
+
+class Stopwatch:
+    """Accumulates wall time over one or more `with` blocks."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds += time.perf_counter() - self._started
+        return False
+
+def to_ms(seconds):
+    return None if seconds is None else int(round(seconds * 1000))
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_sample(name, value, labels=None):
+    if labels:
+        label_text = ",".join(f'{key}="{_escape_label(label)}"' for key, label in labels.items())
+        return f"{name}{{{label_text}}} {value}"
+    return f"{name} {value}"
+
+class MetricsWriter:
+    """Builds a Prometheus text exposition (format 0.0.4)."""
+
+    def __init__(self):
+        self.lines = []
+
+    def add(self, name, metric_type, help_text, samples):
+        """samples is a value, or a list of (labels, value) pairs; None values are left out."""
+        if not isinstance(samples, list):
+            samples = [(None, samples)]
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            return
+        full_name = f"{METRIC_PREFIX}_{name}"
+        self.lines.append(f"# HELP {full_name} {help_text}")
+        self.lines.append(f"# TYPE {full_name} {metric_type}")
+        for labels, value in samples:
+            self.lines.append(_format_sample(full_name, value, labels))
+
+    def render(self):
+        return "\n".join(self.lines) + "\n"
+
+def write_fetch_metrics(writer, cursor):
+    """Adds run totals and the latest run's per-source timings from update_logs/source_runs."""
+    # Totals include runs retention.py has rolled up into update_log_daily, so counters never go down
+    cursor.execute("""
+        SELECT status, SUM(runs) FROM (
+            SELECT status, COUNT(*) AS runs FROM update_logs GROUP BY status
+            UNION ALL
+            SELECT status, SUM(runs) FROM update_log_daily GROUP BY status
+        ) GROUP BY status ORDER BY status
+    """)
+    writer.add("fetch_runs_total", "counter", "Fetch runs logged, by final status.",
+               [({"status": status}, count) for status, count in cursor.fetchall()])
+
+    cursor.execute("""
+        SELECT COALESCE(SUM(checked_count), 0), COALESCE(SUM(inserted_count), 0),
+               COALESCE(SUM(bytes_downloaded), 0), COALESCE(SUM(blocked_count), 0)
+        FROM (
+            SELECT checked_count, inserted_count, bytes_downloaded, blocked_count FROM update_logs
+            UNION ALL
+            SELECT checked_count, inserted_count, bytes_downloaded, blocked_count FROM update_log_daily
+        )
+    """)
+    checked, inserted, downloaded, blocked = cursor.fetchone()
+    writer.add("fetch_items_parsed_total", "counter", "Listings parsed from sources across all runs.", checked)
+    writer.add("fetch_listings_inserted_total", "counter", "New listings inserted across all runs.", inserted)
+    writer.add("fetch_bytes_downloaded_total", "counter", "Response bytes read from sources across all runs.", downloaded)
+    writer.add("fetch_blocks_total", "counter", "Source fetches that were blocked (403/429 or block page).", blocked)
+
+    cursor.execute("""
+        SELECT id, status, duration_ms, browser_launch_ms, bytes_downloaded, blocked_count,
+               checked_count, inserted_count, CAST(strftime('%s', run_at) AS INTEGER)
+        FROM update_logs ORDER BY id DESC LIMIT 1
+    """)
+    last = cursor.fetchone()
+    if last is None:
+        return
+    log_id, _, duration_ms, launch_ms, downloaded, blocked, checked, inserted, run_at = last
+    writer.add("last_run_timestamp_seconds", "gauge", "When the latest fetch run was logged.", run_at)
+    writer.add("last_run_duration_seconds", "gauge", "Wall time of the latest fetch run.",
+               None if duration_ms is None else duration_ms / 1000)
+    writer.add("last_run_browser_launch_seconds", "gauge", "Chromium launch time during the latest run.",
+               None if launch_ms is None else launch_ms / 1000)
+    writer.add("last_run_bytes_downloaded", "gauge", "Bytes read from sources in the latest run.", downloaded)
+    writer.add("last_run_items_parsed", "gauge", "Listings parsed in the latest run.", checked)
+    writer.add("last_run_listings_inserted", "gauge", "New listings inserted in the latest run.", inserted)
+
+    cursor.execute("""
+        SELECT source_name, status, fetch_ms, parse_ms, insert_ms, bytes_downloaded, checked_count, inserted_count, blocked
+        FROM source_runs WHERE log_id = ? ORDER BY id
+    """, (log_id,))
+    rows = cursor.fetchall()
+    per_source = {
+        "source_fetch_seconds": ("Fetch wall time (request, render and parse) in the latest run.", 2, 1000),
+        "source_parse_seconds": ("Parse and normalize time in the latest run.", 3, 1000),
+        "source_insert_seconds": ("Ingest transaction time (insert and dedup) in the latest run.", 4, 1000),
+        "source_bytes_downloaded": ("Bytes read from the source in the latest run.", 5, None),
+        "source_items_parsed": ("Listings parsed from the source in the latest run.", 6, None),
+        "source_listings_inserted": ("New listings from the source in the latest run.", 7, None),
+        "source_blocked": ("1 when the source was blocked in the latest run.", 8, None),
+    }
+    for name, (help_text, column, divisor) in per_source.items():
+        writer.add(name, "gauge", help_text, [
+            ({"source": row[0]}, row[column] if row[column] is None or divisor is None else row[column] / divisor)
+            for row in rows
+        ])
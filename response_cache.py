@@ -0,0 +1,63 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Query params that only exist to defeat browser caches and must not split cache entries
+IGNORED_PARAMS = {"t"}
+
+
+class ResponseCache:
+    """
+    In-process cache of serialized JSON responses for the read-only API endpoints.
+
+    Entries are tagged with the database generation they were computed at; any write
+    that bumps the generation (a fetch run, a seen update) makes them stale. Each
+    entry carries a strong ETag derived from its body so clients can revalidate.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def make_key(path, query_params):
+        params = sorted((k, v) for k, v in query_params.multi_items() if k not in IGNORED_PARAMS)
+        return (path, tuple(params))
+
+    def get(self, key, generation):
+        """Returns (etag, body) if a fresh entry exists for key, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, generation, body):
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        with self._lock:
+            self._entries[key] = (generation, etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag, body
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries
+            }
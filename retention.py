@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+
+logger = logging.getLogger("retention")
+
+# Listings posted more than this many days ago move to listings_archive (0, the default, keeps them)
+RETENTION_LISTING_DAYS = int(os.environ.get("RETENTION_LISTING_DAYS", "0"))
+# Seen listings move after this many days (0, the default, applies only RETENTION_LISTING_DAYS)
+RETENTION_SEEN_DAYS = int(os.environ.get("RETENTION_SEEN_DAYS", "0"))
+# update_logs rows older than this are rolled up into update_log_daily (0, the default, keeps them)
+RETENTION_LOG_DAYS = int(os.environ.get("RETENTION_LOG_DAYS", "0"))
+# Listings moved per transaction, so the web service's writes interleave with a large backlog
+RETENTION_BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", "1000"))
+# Free pages returned to the file system per run by incremental_vacuum
+RETENTION_VACUUM_PAGES = int(os.environ.get("RETENTION_VACUUM_PAGES", "1000"))
+
+# Columns copied into listings_archive; keep in step with the listings schema in init_db
+ARCHIVED_COLUMNS = (
+    "id, title, price, location, source, url, image_url, posted_at, first_seen_at, listing_id, seen, "
+    "keyword, posted_ts, price_cents, change_seq, canonical_id, score, classification"
+)
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+# One range query per index, so none of them scans the table. Listings without a
+# parseable date (posted_ts = 0) age from when they were first seen.
+EXPIRED_SQL = (
+    "SELECT id FROM listings WHERE posted_ts > 0 AND posted_ts < ? LIMIT ?",
+    # seen IN (0, 1) lets this one use the partial (seen, first_seen_at) index too
+    "SELECT id FROM listings WHERE posted_ts = 0 AND seen IN (0, 1) AND first_seen_at < ? LIMIT ?",
+)
+EXPIRED_SEEN_SQL = (
+    "SELECT id FROM listings WHERE seen = 1 AND posted_ts > 0 AND posted_ts < ? LIMIT ?",
+    "SELECT id FROM listings WHERE posted_ts = 0 AND seen = 1 AND first_seen_at < ? LIMIT ?",
+)
+
+def _cutoff_params(days):
+    """(epoch seconds, first_seen_at text) for days ago, in the order of the EXPIRED_SQL queries."""
+    cutoff = int(time.time()) - days * 86400
+    return cutoff, datetime.fromtimestamp(cutoff, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def expired_listing_ids(cursor, limit, listing_days=None, seen_days=None):
+    """Row ids of up to limit listings due for the archive, lowest id first."""
+    listing_days = RETENTION_LISTING_DAYS if listing_days is None else listing_days
+    seen_days = RETENTION_SEEN_DAYS if seen_days is None else seen_days
+    queries = []
+    if listing_days > 0:
+        queries.extend(zip(EXPIRED_SQL, _cutoff_params(listing_days)))
+    if seen_days > 0:
+        queries.extend(zip(EXPIRED_SEEN_SQL, _cutoff_params(seen_days)))
+    row_ids = set()
+    for sql, cutoff in queries:
+        cursor.execute(sql, (cutoff, limit))
+        row_ids.update(row[0] for row in cursor.fetchall())
+    return sorted(row_ids)[:limit]
+
+def archive_listings(cursor, row_ids):
+    """
+    Moves listings into listings_archive inside the caller's transaction; returns how many.
+
+    The FTS delete trigger drops them from the search index. Their fingerprints go too,
+    and a near-duplicate group that loses its canonical listing is led by its oldest
+    remaining member, so dedupe=true still shows one listing per group. Re-pointed rows
+    get a new change_seq, so delta sync and the static export's shard reuse see them.
+    """
+    # Imported here: fetch_listings imports this module
+    from fetch_listings import adjust_listing_counts, reserve_change_seq
+
+    if not row_ids:
+        return 0
+    ids_json = json.dumps(row_ids)
+    cursor.execute("SELECT COUNT(*) FROM listings WHERE id IN (SELECT value FROM json_each(?)) AND seen = 0", (ids_json,))
+    unseen = cursor.fetchone()[0]
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO listings_archive ({ARCHIVED_COLUMNS})
+        SELECT {ARCHIVED_COLUMNS} FROM listings WHERE id IN (SELECT value FROM json_each(?))
+    """, (ids_json,))
+    cursor.execute("DELETE FROM listing_fingerprints WHERE listing_rowid IN (SELECT value FROM json_each(?))", (ids_json,))
+    cursor.execute("DELETE FROM listings WHERE id IN (SELECT value FROM json_each(?))", (ids_json,))
+    moved = cursor.rowcount
+    adjust_listing_counts(cursor, -moved, -unseen)
+
+    cursor.execute("""
+        SELECT id, canonical_id FROM listings
+        WHERE canonical_id IN (SELECT value FROM json_each(?))
+        ORDER BY id
+    """, (ids_json,))
+    orphans = cursor.fetchall()
+    if not orphans:
+        return moved
+    leaders = {}
+    for row_id, old in orphans:
+        leaders.setdefault(old, row_id)
+    first_seq = reserve_change_seq(cursor, len(orphans))
+    cursor.executemany(
+        "UPDATE listings SET canonical_id = ?, change_seq = ? WHERE id = ?",
+        [(leaders[old], first_seq + offset, row_id) for offset, (row_id, old) in enumerate(orphans)]
+    )
+    cursor.executemany("UPDATE listing_fingerprints SET canonical_id = ? WHERE canonical_id = ?", [(leader, old) for old, leader in leaders.items()])
+    return moved
+
+def roll_up_logs(cursor, log_days=None):
+    """
+    Folds update_logs rows older than log_days into update_log_daily (one row per day
+    and status) and deletes them with their source_runs; returns how many runs were
+    folded. The latest run is always kept for /api/status.
+    """
+    log_days = RETENTION_LOG_DAYS if log_days is None else log_days
+    if log_days <= 0:
+        return 0
+    expired = "run_at < datetime('now', ?) AND id < (SELECT MAX(id) FROM update_logs)"
+    cutoff = f"-{log_days} days"
+    cursor.execute(f"""
+        INSERT INTO update_log_daily (day, status, runs, checked_count, inserted_count, skipped_count,
+                                      duration_ms, bytes_downloaded, blocked_count)
+        SELECT date(run_at), status, COUNT(*), SUM(checked_count), SUM(inserted_count), SUM(skipped_count),
+               SUM(COALESCE(duration_ms, 0)), SUM(COALESCE(bytes_downloaded, 0)), SUM(COALESCE(blocked_count, 0))
+        FROM update_logs WHERE {expired}
+        GROUP BY date(run_at), status
+        ON CONFLICT(day, status) DO UPDATE SET
+            runs = runs + excluded.runs,
+            checked_count = checked_count + excluded.checked_count,
+            inserted_count = inserted_count + excluded.inserted_count,
+            skipped_count = skipped_count + excluded.skipped_count,
+            duration_ms = duration_ms + excluded.duration_ms,
+            bytes_downloaded = bytes_downloaded + excluded.bytes_downloaded,
+            blocked_count = blocked_count + excluded.blocked_count
+    """, (cutoff,))
+    cursor.execute(f"DELETE FROM source_runs WHERE log_id IN (SELECT id FROM update_logs WHERE {expired})", (cutoff,))
+    cursor.execute(f"DELETE FROM update_logs WHERE {expired}", (cutoff,))
+    return cursor.rowcount
+
+def incremental_vacuum(conn, max_pages=None):
+    """Returns up to max_pages free pages to the file system; returns how many were freed."""
+    max_pages = RETENTION_VACUUM_PAGES if max_pages is None else max_pages
+    if max_pages <= 0:
+        return 0
+    if conn.execute("PRAGMA auto_vacuum;").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+        return 0
+    before = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+    if before == 0:
+        return 0
+    # The pragma frees one page per step; execute() would stop after the first,
+    # executescript() steps it to completion
+    conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+    return before - conn.execute("PRAGMA freelist_count;").fetchone()[0]
+
+def apply_retention(database):
+    """
+    Archives expired listings in batches, rolls up old run logs and runs one bounded
+    incremental vacuum step. Each batch is its own transaction. Returns a summary dict.
+    """
+    # Imported here: fetch_listings imports this module
+    from fetch_listings import bump_generation
+
+    archived = 0
+    while True:
+        with database.writer() as conn:
+            cursor = conn.cursor()
+            moved = archive_listings(cursor, expired_listing_ids(cursor, max(1, RETENTION_BATCH_SIZE)))
+            if moved:
+                bump_generation(cursor)
+        archived += moved
+        if moved < RETENTION_BATCH_SIZE:
+            break
+
+    with database.writer() as conn:
+        cursor = conn.cursor()
+        rolled_up = roll_up_logs(cursor)
+        if rolled_up:
+            bump_generation(cursor)
+
+    with database.writer() as conn:
+        freed = incremental_vacuum(conn)
+
+    if archived or rolled_up or freed:
+        logger.info(f"Retention: archived {archived} listings, rolled up {rolled_up} run logs, freed {freed} pages.")
+    return {"archived": archived, "rolled_up": rolled_up, "freed_pages": freed}
+
+def convert_to_incremental(database):
+    """Switches an existing database to auto_vacuum=INCREMENTAL; needs a one-off full VACUUM."""
+    with database.writer() as conn:
+        if conn.execute("PRAGMA auto_vacuum;").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+            return False
+        conn.commit()
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+        logger.info("Rebuilding the database with VACUUM to enable incremental vacuum...")
+        conn.execute("VACUUM;")
+    return True
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    from db import get_database
+    from fetch_listings import DATABASE_PATH, init_db
+
+    parser = argparse.ArgumentParser(description="Apply the listings and run-log retention policy.")
+    parser.add_argument("--convert-vacuum", action="store_true",
+                        help="first switch an existing database to auto_vacuum=INCREMENTAL (runs a full VACUUM)")
+    args = parser.parse_args()
+
+    init_db()
+    database = get_database(DATABASE_PATH)
+    if args.convert_vacuum:
+        convert_to_incremental(database)
+    print(apply_retention(database))
@@ -0,0 +1,372 @@
+import os
+import time
+import random
+import logging
+import threading
+import urllib.error
+import urllib.parse
+from datetime import datetime, timezone
+
+logger = logging.getLogger("scheduler")
+
+# Token bucket per host: sustained requests per minute and the burst allowed after idling
+SCHEDULER_HOST_RATE_PER_MINUTE = float(os.environ.get("SCHEDULER_HOST_RATE_PER_MINUTE", "6"))
+SCHEDULER_HOST_BURST = float(os.environ.get("SCHEDULER_HOST_BURST", "3"))
+# Longest a worker waits for a token before deferring the source to the next run
+SCHEDULER_MAX_WAIT_SECONDS = float(os.environ.get("SCHEDULER_MAX_WAIT_SECONDS", "60"))
+# First retry delay after an error or a block; doubles per consecutive failure up to the max
+SCHEDULER_FAILURE_BACKOFF_SECONDS = float(os.environ.get("SCHEDULER_FAILURE_BACKOFF_SECONDS", "300"))
+SCHEDULER_BLOCK_BACKOFF_SECONDS = float(os.environ.get("SCHEDULER_BLOCK_BACKOFF_SECONDS", "1800"))
+SCHEDULER_MAX_BACKOFF_SECONDS = float(os.environ.get("SCHEDULER_MAX_BACKOFF_SECONDS", "86400"))
+
+# "all" polls every source each run; "adaptive" polls each source at an interval learned from its yield
+FETCH_SCHEDULE_MODE = os.environ.get("FETCH_SCHEDULE_MODE", "all")
+ADAPTIVE_MIN_INTERVAL_SECONDS = float(os.environ.get("ADAPTIVE_MIN_INTERVAL_SECONDS", "3600"))
+ADAPTIVE_MAX_INTERVAL_SECONDS = float(os.environ.get("ADAPTIVE_MAX_INTERVAL_SECONDS", "86400"))
+# Poll often enough to expect about this many new listings per poll
+ADAPTIVE_TARGET_NEW_PER_POLL = float(os.environ.get("ADAPTIVE_TARGET_NEW_PER_POLL", "1"))
+ADAPTIVE_EWMA_ALPHA = float(os.environ.get("ADAPTIVE_EWMA_ALPHA", "0.3"))
+# A poll due within this long after a run starts is taken now rather than a whole cron period later
+ADAPTIVE_SLACK_SECONDS = float(os.environ.get("ADAPTIVE_SLACK_SECONDS", "300"))
+
+class Clock:
+    """Wall clock; tests substitute an object with the same now()/sleep() methods."""
+
+    def now(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class SourceDeferred(Exception):
+    """Raised when a source cannot be fetched this run (host cooling down or rate limited)."""
+
+def host_for_url(url):
+    return urllib.parse.urlparse(url or "").netloc.lower()
+
+def source_key(source):
+    return source.id or source.name
+
+def is_block_error(error):
+    """Blocks are what the sources raise as PermissionError, plus HTTP 403/429 from feeds."""
+    if isinstance(error, PermissionError):
+        return True
+    return isinstance(error, urllib.error.HTTPError) and error.code in (403, 429)
+
+def backoff_delay(failures, base, maximum, rng):
+    """Exponential backoff with equal jitter: half the delay is fixed, half is random."""
+    delay = min(maximum, base * (2 ** max(0, failures - 1)))
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+def format_ts(ts):
+    if not ts:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec="seconds")
+
+class TokenBucket:
+    """Classic token bucket: capacity tokens, refilled at rate per second."""
+
+    def __init__(self, rate, capacity, tokens=None, updated_at=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity if tokens is None else min(capacity, tokens)
+        self.updated_at = updated_at
+
+    def _refill(self, now):
+        if self.updated_at is not None and now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, now):
+        """Takes a token and returns 0, or returns the seconds until one is available."""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+def _new_source_health(source):
+    return {
+        "source_name": source.name,
+        "host": host_for_url(source.url),
+        "consecutive_failures": 0,
+        "blocked_count": 0,
+        "last_status": None,
+        "last_error": None,
+        "last_attempt_at": None,
+        "last_success_at": None,
+        "next_eligible_at": 0,
+        "yield_rate": None,
+        "poll_interval": None,
+        "next_poll_at": None
+    }
+
+def _new_host_health():
+    return {"consecutive_failures": 0, "last_blocked_at": None, "next_eligible_at": 0}
+
+class SourceScheduler:
+    """
+    Decides which sources a run may fetch, and when, from per-source and per-host health.
+
+    State lives in the source_health and host_health tables: load() it at the start of a
+    run, let workers call acquire() before each request, record each outcome, and save()
+    it in the same transaction as the source's ingest. Failures push a source back with
+    exponential backoff and jitter; blocks also cool down the whole host, since Craigslist
+    blocks the session rather than one search. clock and rng are injectable so the timing
+    can be driven deterministically.
+
+    Every success also updates an EWMA of the source's new listings per hour. In adaptive
+    mode that rate sets the source's poll interval, within the configured min/max.
+    """
+
+    def __init__(self, clock=None, rng=None, rate_per_minute=None, burst=None, max_wait=None, mode=None):
+        self.mode = mode or FETCH_SCHEDULE_MODE
+        if self.mode not in ("all", "adaptive"):
+            raise ValueError(f"Unknown FETCH_SCHEDULE_MODE '{self.mode}'")
+        self.clock = clock or Clock()
+        self.rng = rng or random.Random()
+        self.rate = (rate_per_minute if rate_per_minute is not None else SCHEDULER_HOST_RATE_PER_MINUTE) / 60
+        self.burst = burst if burst is not None else SCHEDULER_HOST_BURST
+        self.max_wait = max_wait if max_wait is not None else SCHEDULER_MAX_WAIT_SECONDS
+        self.sources = {}
+        self.hosts = {}
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def load(self, cursor):
+        cursor.execute("""
+            SELECT source_id, source_name, host, consecutive_failures, blocked_count, last_status,
+                   last_error, last_attempt_at, last_success_at, next_eligible_at,
+                   yield_rate, poll_interval, next_poll_at
+            FROM source_health
+        """)
+        for row in cursor.fetchall():
+            self.sources[row[0]] = {
+                "source_name": row[1],
+                "host": row[2],
+                "consecutive_failures": row[3],
+                "blocked_count": row[4],
+                "last_status": row[5],
+                "last_error": row[6],
+                "last_attempt_at": row[7],
+                "last_success_at": row[8],
+                "next_eligible_at": row[9] or 0,
+                "yield_rate": row[10],
+                "poll_interval": row[11],
+                "next_poll_at": row[12]
+            }
+        cursor.execute("SELECT host, consecutive_failures, last_blocked_at, next_eligible_at, tokens, tokens_updated_at FROM host_health")
+        for row in cursor.fetchall():
+            self.hosts[row[0]] = {"consecutive_failures": row[1], "last_blocked_at": row[2], "next_eligible_at": row[3] or 0}
+            self.buckets[row[0]] = TokenBucket(self.rate, self.burst, row[4], row[5])
+
+    def _source(self, source):
+        key = source_key(source)
+        if key not in self.sources:
+            self.sources[key] = _new_source_health(source)
+        return self.sources[key]
+
+    def _host(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = _new_host_health()
+        return self.hosts[host]
+
+    def poll_interval(self, yield_rate):
+        """Seconds between polls for a source finding yield_rate new listings per hour."""
+        if yield_rate is None:
+            return ADAPTIVE_MIN_INTERVAL_SECONDS
+        if yield_rate <= 0:
+            return ADAPTIVE_MAX_INTERVAL_SECONDS
+        interval = ADAPTIVE_TARGET_NEW_PER_POLL / yield_rate * 3600
+        return min(ADAPTIVE_MAX_INTERVAL_SECONDS, max(ADAPTIVE_MIN_INTERVAL_SECONDS, interval))
+
+    def eligible_at(self, source):
+        """Epoch seconds from which the source may be fetched (0 when it is due now)."""
+        with self._lock:
+            source_state = self.sources.get(source_key(source), {})
+            host_state = self.hosts.get(host_for_url(source.url), {})
+            eligible_at = max(source_state.get("next_eligible_at") or 0, host_state.get("next_eligible_at") or 0)
+            if self.mode == "adaptive":
+                eligible_at = max(eligible_at, source_state.get("next_poll_at") or 0)
+            return eligible_at
+
+    def partition(self, sources):
+        """Splits sources into (due, waiting) where waiting holds (source, eligible_at, reason) tuples."""
+        now = self.clock.now()
+        due, waiting = [], []
+        for source in sources:
+            eligible_at = self.eligible_at(source)
+            with self._lock:
+                next_poll_at = (self.sources.get(source_key(source)) or {}).get("next_poll_at") or 0
+            if self.mode == "adaptive" and eligible_at == next_poll_at and eligible_at - now <= ADAPTIVE_SLACK_SECONDS:
+                due.append(source)
+            elif eligible_at > now:
+                reason = "poll" if self.mode == "adaptive" and eligible_at == next_poll_at else "backoff"
+                waiting.append((source, eligible_at, reason))
+            else:
+                due.append(source)
+        return due, waiting
+
+    def acquire(self, url, cancel_event=None):
+        """
+        Blocks until the host's token bucket allows a request.
+
+        Raises SourceDeferred if the host went into cooldown during the run or the wait
+        would exceed max_wait.
+        """
+        host = host_for_url(url)
+        if not host:
+            # Local files (file:// fixtures) have no host to protect
+            return
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock.now()
+                host_state = self.hosts.get(host)
+                if host_state and (host_state["next_eligible_at"] or 0) > now:
+                    raise SourceDeferred(f"host {host} cooling down until {format_ts(host_state['next_eligible_at'])}")
+                bucket = self.buckets.get(host)
+                if bucket is None:
+                    bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+                wait = bucket.try_acquire(now)
+            if wait == 0:
+                return
+            if waited + wait > self.max_wait:
+                raise SourceDeferred(f"rate limit for {host} would need a {wait:.0f}s wait")
+            if cancel_event is not None and cancel_event.is_set():
+                raise SourceDeferred("run cancelled")
+            self.clock.sleep(wait)
+            waited += wait
+
+    def record_success(self, source, inserted=None):
+        """Clears backoff and folds inserted (new listings found) into the source's yield rate."""
+        now = self.clock.now()
+        with self._lock:
+            state = self._source(source)
+            previous_success = state["last_success_at"]
+            # The first poll's inserts are a backlog of unknown age, so it only sets the baseline
+            if inserted is not None and previous_success and now > previous_success:
+                observed = inserted / ((now - previous_success) / 3600)
+                if state["yield_rate"] is None:
+                    state["yield_rate"] = observed
+                else:
+                    state["yield_rate"] = ADAPTIVE_EWMA_ALPHA * observed + (1 - ADAPTIVE_EWMA_ALPHA) * state["yield_rate"]
+            state["poll_interval"] = self.poll_interval(state["yield_rate"])
+            state["next_poll_at"] = now + state["poll_interval"]
+            state.update({
+                "source_name": source.name,
+                "consecutive_failures": 0,
+                "last_status": "success",
+                "last_error": None,
+                "last_attempt_at": now,
+                "last_success_at": now,
+                "next_eligible_at": 0
+            })
+            if state["host"]:
+                self._host(state["host"])["consecutive_failures"] = 0
+
+    def record_failure(self, source, error, message=None):
+        """Backs the source off; a block also backs off its host. Returns the retry time."""
+        now = self.clock.now()
+        blocked = is_block_error(error)
+        base = SCHEDULER_BLOCK_BACKOFF_SECONDS if blocked else SCHEDULER_FAILURE_BACKOFF_SECONDS
+        with self._lock:
+            state = self._source(source)
+            state["consecutive_failures"] += 1
+            delay = backoff_delay(state["consecutive_failures"], base, SCHEDULER_MAX_BACKOFF_SECONDS, self.rng)
+            state.update({
+                "source_name": source.name,
+                "last_status": "blocked" if blocked else "failure",
+                "last_error": message or str(error),
+                "last_attempt_at": now,
+                "next_eligible_at": now + delay
+            })
+            if blocked:
+                state["blocked_count"] += 1
+            # Local files (file:// URLs) have no host to cool down
+            if blocked and state["host"]:
+                host_state = self._host(state["host"])
+                host_state["consecutive_failures"] += 1
+                host_delay = backoff_delay(host_state["consecutive_failures"], base, SCHEDULER_MAX_BACKOFF_SECONDS, self.rng)
+                host_state["last_blocked_at"] = now
+                host_state["next_eligible_at"] = max(host_state["next_eligible_at"] or 0, now + host_delay)
+                logger.warning(f"Host {state['host']} blocked; cooling down until {format_ts(host_state['next_eligible_at'])}")
+            return state["next_eligible_at"]
+
+    def save(self, cursor, source):
+        """Persists the source's health and its host's (if it has one), including the token bucket level."""
+        with self._lock:
+            key = source_key(source)
+            state = dict(self._source(source))
+            host = state["host"]
+            host_state = dict(self._host(host)) if host else None
+            bucket = self.buckets.get(host)
+        cursor.execute("""
+            INSERT INTO source_health (source_id, source_name, host, consecutive_failures, blocked_count, last_status,
+                                       last_error, last_attempt_at, last_success_at, next_eligible_at,
+                                       yield_rate, poll_interval, next_poll_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(source_id) DO UPDATE SET
+                source_name = excluded.source_name,
+                host = excluded.host,
+                consecutive_failures = excluded.consecutive_failures,
+                blocked_count = excluded.blocked_count,
+                last_status = excluded.last_status,
+                last_error = excluded.last_error,
+                last_attempt_at = excluded.last_attempt_at,
+                last_success_at = excluded.last_success_at,
+                next_eligible_at = excluded.next_eligible_at,
+                yield_rate = excluded.yield_rate,
+                poll_interval = excluded.poll_interval,
+                next_poll_at = excluded.next_poll_at
+        """, (
+            key, state["source_name"], host, state["consecutive_failures"], state["blocked_count"], state["last_status"],
+            state["last_error"], state["last_attempt_at"], state["last_success_at"], state["next_eligible_at"],
+            state["yield_rate"], state["poll_interval"], state["next_poll_at"]
+        ))
+        if host_state is None:
+            return
+        cursor.execute("""
+            INSERT INTO host_health (host, consecutive_failures, last_blocked_at, next_eligible_at, tokens, tokens_updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(host) DO UPDATE SET
+                consecutive_failures = excluded.consecutive_failures,
+                last_blocked_at = excluded.last_blocked_at,
+                next_eligible_at = excluded.next_eligible_at,
+                tokens = excluded.tokens,
+                tokens_updated_at = excluded.tokens_updated_at
+        """, (
+            host, host_state["consecutive_failures"], host_state["last_blocked_at"], host_state["next_eligible_at"],
+            bucket.tokens if bucket else None, bucket.updated_at if bucket else None
+        ))
+
+    def describe(self, sources):
+        """Schedule view of the given sources for /api/sources."""
+        now = self.clock.now()
+        described = []
+        for source in sources:
+            with self._lock:
+                state = dict(self.sources.get(source_key(source)) or _new_source_health(source))
+                host_state = dict(self.hosts.get(host_for_url(source.url)) or _new_host_health())
+            eligible_at = self.eligible_at(source)
+            described.append({
+                "id": source.id,
+                "name": source.name,
+                "type": source.source_type,
+                "enabled": source.enabled,
+                "host": host_for_url(source.url),
+                "last_status": state["last_status"],
+                "last_error": state["last_error"],
+                "consecutive_failures": state["consecutive_failures"],
+                "blocked_count": state["blocked_count"],
+                "last_attempt_at": format_ts(state["last_attempt_at"]),
+                "last_success_at": format_ts(state["last_success_at"]),
+                "next_eligible_at": format_ts(eligible_at),
+                "eligible_now": eligible_at <= now,
+                "host_next_eligible_at": format_ts(host_state["next_eligible_at"]),
+                "schedule_mode": self.mode,
+                "yield_per_hour": None if state["yield_rate"] is None else round(state["yield_rate"], 3),
+                "poll_interval_seconds": state["poll_interval"],
+                "next_poll_at": format_ts(state["next_poll_at"])
+            })
+        return described
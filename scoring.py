@@ -0,0 +1,302 @@
+import os
+import json
+import math
+import hashlib
+import logging
+import argparse
+
+import numpy as np
+
+from dedup import WORD_RE
+
+logger = logging.getLogger("scoring")
+
+# Learned term weights and corpus IDF written by `python scoring.py learn`
+SCORING_KEYWORDS_PATH = os.environ.get("SCORING_KEYWORDS_PATH", "./data/scoring_keywords.json")
+# Listings scored per vectorized batch
+SCORE_BATCH_SIZE = int(os.environ.get("SCORE_BATCH_SIZE", "2000"))
+# Price band (cents) where complete machines usually sell; outside it listings lean to parts, records or dealers
+SCORE_PRICE_FLOOR_CENTS = int(os.environ.get("SCORE_PRICE_FLOOR_CENTS", "7500"))
+SCORE_PRICE_CEILING_CENTS = int(os.environ.get("SCORE_PRICE_CEILING_CENTS", "500000"))
+
+# Bump when the scoring formula changes so stored scores are recomputed
+SCORE_VERSION = 2
+SCORE_MAX = 10.0
+# Raw relevance is squashed by tanh(raw / RELEVANCE_SCALE) and moves the score this far from 5
+RELEVANCE_SCALE = 3.0
+RELEVANCE_POINTS = 4.0
+
+# Hand-picked weights for the phonograph hunt; learned weights are added on top.
+# Part-only terms are negative: a "Victrola horn" is a part, not a Victrola.
+SEED_WEIGHTS = {
+    "victrola": 2.0, "phonograph": 2.0, "gramophone": 2.0, "graphophone": 2.0, "grafonola": 2.0,
+    "talking machine": 2.5, "edison": 1.5, "columbia": 1.0, "zonophone": 1.5,
+    "amberola": 1.5, "brunswick": 0.8, "sonora": 0.8, "pathe": 1.0, "cylinder": 1.0,
+    "morning glory": 2.0, "hand crank": 2.0, "wind up": 1.0,
+    "diamond disc": 1.5, "oak": 0.4, "mahogany": 0.4, "antique": 0.5,
+    "horn": -1.5, "crank": -1.0, "reproducer": -1.5, "soundbox": -1.5, "needles": -2.0,
+    "tonearm": -1.5, "parts": -1.5, "motor": -1.0, "spring": -1.0,
+    "record": -0.8, "records": -1.0, "vinyl": -1.5, "lp": -1.5, "78s": -0.5, "album": -0.8,
+    "cd": -2.0, "bluetooth": -3.0, "usb": -2.5, "speaker": -1.0, "cassette": -2.0,
+    "crosley": -2.0, "replica": -2.5, "reproduction": -2.5, "nostalgia": -1.0,
+    "decor": -1.0, "miniature": -1.5, "toy": -1.5, "lamp": -1.5, "poster": -1.5,
+    "wanted": -2.0, "wtb": -2.0
+}
+
+# Classification terms; on a tie the earlier class wins
+CLASS_TERMS = {
+    "REPRODUCTION": ("replica", "reproduction", "crosley", "bluetooth", "usb", "nostalgia", "miniature", "decor"),
+    "PARTS": ("reproducer", "needles", "parts", "tonearm", "motor", "horn", "crank", "soundbox", "spring"),
+    "RECORDS": ("record", "records", "78s", "vinyl", "lp", "album", "cylinders", "disc"),
+    "MACHINE": ("victrola", "phonograph", "gramophone", "graphophone", "grafonola", "talking machine", "amberola",
+                "morning glory", "hand crank", "wind up", "diamond disc")
+}
+# Hits per class are multiplied by these before the vote. A brand name appears in nearly
+# every part and record listing, so one PARTS or RECORDS term outweighs any number of
+# MACHINE terms, and REPRODUCTION ("victrola style bluetooth record player") outweighs all.
+CLASS_BOOSTS = {"REPRODUCTION": 10000.0, "PARTS": 100.0, "RECORDS": 100.0, "MACHINE": 1.0}
+# Machine phrases whose words are also part or record terms: the phrase cancels the word's
+# hit, so a "hand crank phonograph" or an "Edison Diamond Disc" stays a MACHINE
+CLASS_PHRASES = {"hand crank": "crank", "diamond disc": "disc"}
+# Score points for the winning class; the hunt is for complete machines
+CLASS_SCORE_POINTS = {"REPRODUCTION": -1.0, "PARTS": -1.5, "RECORDS": -1.5}
+UNKNOWN_CLASS = "UNKNOWN"
+
+# Learning: terms seen in fewer listings are ignored, and learned weights stay small next to the seeds
+LEARN_MIN_SUPPORT = 5
+LEARN_MAX_WEIGHT = 1.0
+LEARN_MAX_TERMS = 200
+
+def terms(text):
+    """Lowercased words of text and their adjacent pairs."""
+    words = WORD_RE.findall((text or "").lower())
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+def _load_learned(path=None):
+    path = path or SCORING_KEYWORDS_PATH
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable scoring keywords file {path}: {e}")
+        return {}
+
+class ScoringModel:
+    """
+    Term weights, IDF and class indicators as NumPy arrays over one vocabulary.
+
+    score_batch turns a batch of titles into a term-count matrix once and scores every
+    row with a few matrix operations. The model's digest changes whenever the weights
+    or the formula do, which is what tells callers to recompute stored scores.
+    """
+
+    def __init__(self, learned=None):
+        learned = learned or {}
+        weights = dict(SEED_WEIGHTS)
+        for term, weight in learned.get("weights", {}).items():
+            weights[term] = weights.get(term, 0.0) + weight
+        vocabulary = sorted(set(weights) | {term for class_terms in CLASS_TERMS.values() for term in class_terms})
+        self.index = {term: position for position, term in enumerate(vocabulary)}
+        self.weights = np.array([weights.get(term, 0.0) for term in vocabulary])
+        idf = learned.get("idf", {})
+        self.idf = np.array([idf.get(term, 1.0) for term in vocabulary])
+        self.class_names = list(CLASS_TERMS) + [UNKNOWN_CLASS]
+        self.class_matrix = np.zeros((len(vocabulary), len(CLASS_TERMS)))
+        for column, class_terms in enumerate(CLASS_TERMS.values()):
+            for term in class_terms:
+                self.class_matrix[self.index[term], column] = 1.0
+        for phrase, word in CLASS_PHRASES.items():
+            self.class_matrix[self.index[phrase]] -= self.class_matrix[self.index[word]]
+        self.class_matrix *= np.array([CLASS_BOOSTS[name] for name in CLASS_TERMS])
+        self.class_points = np.array([CLASS_SCORE_POINTS.get(name, 0.0) for name in self.class_names])
+
+        description = {
+            "version": SCORE_VERSION,
+            "weights": dict(zip(vocabulary, self.weights.round(6).tolist())),
+            "idf": dict(zip(vocabulary, self.idf.round(6).tolist())),
+            "price": [SCORE_PRICE_FLOOR_CENTS, SCORE_PRICE_CEILING_CENTS]
+        }
+        encoded = json.dumps(description, sort_keys=True).encode("utf-8")
+        # app_meta values are integers; 60 bits of the hash fit in one
+        self.digest = int(hashlib.sha256(encoded).hexdigest()[:15], 16)
+
+    def term_counts(self, texts):
+        """(rows x vocabulary) matrix of term counts."""
+        row_positions = []
+        term_positions = []
+        for row, text in enumerate(texts):
+            for term in terms(text):
+                position = self.index.get(term)
+                if position is not None:
+                    row_positions.append(row)
+                    term_positions.append(position)
+        counts = np.zeros((len(texts), len(self.index)))
+        np.add.at(counts, (row_positions, term_positions), 1.0)
+        return counts
+
+    def price_adjustment(self, price_cents):
+        """Score points added for each price; None (no price) is neutral."""
+        prices = np.array([np.nan if price is None else price for price in price_cents], dtype=float)
+        with np.errstate(invalid="ignore"):
+            return np.select(
+                [np.isnan(prices), prices < SCORE_PRICE_FLOOR_CENTS / 3, prices < SCORE_PRICE_FLOOR_CENTS,
+                 prices <= SCORE_PRICE_CEILING_CENTS],
+                [0.0, -1.5, -0.5, 0.5],
+                default=-1.0
+            )
+
+    def score_batch(self, titles, price_cents):
+        """Returns (scores rounded to 0.1, classifications) for parallel lists of titles and prices."""
+        if not titles:
+            return [], []
+        counts = self.term_counts(titles)
+        class_hits = counts @ self.class_matrix
+        best = np.argmax(class_hits, axis=1)
+        best[class_hits.max(axis=1) <= 0] = len(CLASS_TERMS)
+        classifications = [self.class_names[position] for position in best]
+
+        # Sublinear TF so a keyword-stuffed title does not outrank a descriptive one
+        tf_idf = np.log1p(counts) * self.idf
+        relevance = np.tanh((tf_idf @ self.weights) / RELEVANCE_SCALE)
+        scores = np.clip(
+            SCORE_MAX / 2 + RELEVANCE_POINTS * relevance + self.price_adjustment(price_cents) + self.class_points[best],
+            0.0, SCORE_MAX
+        )
+        return np.round(scores, 1).tolist(), classifications
+
+_model = None
+_model_mtime = None
+
+def get_model():
+    """The scoring model, reloaded when the learned keywords file changes."""
+    global _model, _model_mtime
+    try:
+        mtime = os.path.getmtime(SCORING_KEYWORDS_PATH)
+    except OSError:
+        mtime = None
+    if _model is None or mtime != _model_mtime:
+        _model = ScoringModel(_load_learned())
+        _model_mtime = mtime
+    return _model
+
+def reset_if_model_changed(cursor, model=None):
+    """Clears stored scores when the model differs from the one they were computed with."""
+    model = model or get_model()
+    cursor.execute("SELECT value FROM app_meta WHERE key = 'score_model'")
+    row = cursor.fetchone()
+    if row is not None and row[0] == model.digest:
+        return False
+    if row is not None:
+        logger.info("Scoring model changed; listings will be rescored.")
+        cursor.execute("UPDATE listings SET score = NULL, classification = NULL WHERE score IS NOT NULL")
+    cursor.execute("""
+        INSERT INTO app_meta (key, value) VALUES ('score_model', ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    """, (model.digest,))
+    return True
+
+def score_pending(cursor, batch_size=None):
+    """
+    Scores listings that have no score yet, batch by batch; returns how many were scored.
+
+    Stored scores are reused until the model changes, so a fetch run only scores the rows
+    it inserted.
+    """
+    model = get_model()
+    reset_if_model_changed(cursor, model)
+    batch_size = max(1, batch_size or SCORE_BATCH_SIZE)
+    scored = 0
+    last_id = 0
+    while True:
+        cursor.execute("""
+            SELECT id, title, price_cents FROM listings
+            WHERE score IS NULL AND id > ?
+            ORDER BY id LIMIT ?
+        """, (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            return scored
+        scores, classifications = model.score_batch([row[1] for row in rows], [row[2] for row in rows])
+        cursor.executemany(
+            "UPDATE listings SET score = ?, classification = ? WHERE id = ?",
+            [(score, classification, row[0]) for score, classification, row in zip(scores, classifications, rows)]
+        )
+        scored += len(rows)
+        last_id = rows[-1][0]
+
+def learn_keywords(cursor):
+    """
+    Derives term weights and IDF from the stored listings.
+
+    Listings opened or marked seen count as interesting: each frequent term gets the
+    smoothed log-odds of appearing in seen versus unseen listings, capped at
+    LEARN_MAX_WEIGHT. IDF is log(N / df) over all listings for every vocabulary term.
+    """
+    cursor.execute("SELECT title, seen FROM listings")
+    seen_df = {}
+    unseen_df = {}
+    seen_total = 0
+    unseen_total = 0
+    for title, seen in cursor.fetchall():
+        counts = seen_df if seen else unseen_df
+        if seen:
+            seen_total += 1
+        else:
+            unseen_total += 1
+        for term in set(terms(title)):
+            counts[term] = counts.get(term, 0) + 1
+    total = seen_total + unseen_total
+
+    weights = {}
+    if seen_total and unseen_total:
+        for term in set(seen_df) | set(unseen_df):
+            in_seen = seen_df.get(term, 0)
+            in_unseen = unseen_df.get(term, 0)
+            if in_seen + in_unseen < LEARN_MIN_SUPPORT:
+                continue
+            log_odds = math.log((in_seen + 1) / (seen_total + 2)) - math.log((in_unseen + 1) / (unseen_total + 2))
+            weights[term] = max(-LEARN_MAX_WEIGHT, min(LEARN_MAX_WEIGHT, log_odds / 2))
+        strongest = sorted(weights, key=lambda term: abs(weights[term]), reverse=True)[:LEARN_MAX_TERMS]
+        weights = {term: round(weights[term], 4) for term in sorted(strongest) if abs(weights[term]) >= 0.05}
+
+    vocabulary = set(SEED_WEIGHTS) | set(weights)
+    idf = {}
+    if total:
+        for term in vocabulary:
+            df = seen_df.get(term, 0) + unseen_df.get(term, 0)
+            idf[term] = round(math.log((total + 1) / (df + 1)) + 1, 4)
+    return {"listings": total, "seen": seen_total, "weights": weights, "idf": idf}
+
+def save_keywords(learned, path=None):
+    path = path or SCORING_KEYWORDS_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(learned, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    from db import get_database
+    from fetch_listings import DATABASE_PATH, init_db, bump_generation
+
+    parser = argparse.ArgumentParser(description="Learn scoring keywords and score stored listings.")
+    parser.add_argument("command", choices=("learn", "score"),
+                        help="learn: write SCORING_KEYWORDS_PATH from seen listings, then rescore; score: score unscored listings")
+    args = parser.parse_args()
+
+    init_db()
+    with get_database(DATABASE_PATH).writer() as conn:
+        cursor = conn.cursor()
+        if args.command == "learn":
+            learned = learn_keywords(cursor)
+            save_keywords(learned)
+            logger.info(f"Learned {len(learned['weights'])} keyword weights from {learned['listings']} listings ({learned['seen']} seen).")
+        scored = score_pending(cursor)
+        if scored:
+            bump_generation(cursor)
+    logger.info(f"Scored {scored} listings.")
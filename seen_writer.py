@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+from events import publish
+from fetch_listings import adjust_listing_counts, bump_generation, reserve_change_seq
+
+logger = logging.getLogger("seen_writer")
+
+# How long the writer waits for more seen updates before committing; 0 batches only what queued during the last commit
+SEEN_COALESCE_MS = float(os.environ.get("SEEN_COALESCE_MS", "2"))
+# Listing ids written per transaction at most; a full batch commits without waiting
+SEEN_COALESCE_MAX_IDS = int(os.environ.get("SEEN_COALESCE_MAX_IDS", "5000"))
+
+def mark_seen(cursor, listing_ids):
+    """
+    Marks listing_ids seen inside the caller's transaction.
+
+    Returns (found, changed): the ids that exist and the ones that flipped from unseen.
+    Each flipped row gets its own change_seq, in row order, so delta sync pages never
+    split a group of rows sharing one value.
+    """
+    cursor.execute(
+        "SELECT id, listing_id, seen FROM listings WHERE listing_id IN (SELECT value FROM json_each(?)) ORDER BY id",
+        (json.dumps(list(listing_ids)),)
+    )
+    rows = cursor.fetchall()
+    found = {row[1] for row in rows}
+    unseen = [(row[0], row[1]) for row in rows if not row[2]]
+    if unseen:
+        first_seq = reserve_change_seq(cursor, len(unseen))
+        cursor.executemany(
+            "UPDATE listings SET seen = 1, change_seq = ? WHERE id = ?",
+            [(first_seq + offset, row_id) for offset, (row_id, _) in enumerate(unseen)]
+        )
+        adjust_listing_counts(cursor, unseen=-len(unseen))
+        bump_generation(cursor)
+    return found, [listing_id for _, listing_id in unseen]
+
+class SeenCoalescer:
+    """
+    Funnels seen updates from concurrent requests through one writer thread.
+
+    The thread takes the first pending request plus everything queued behind it, keeps
+    collecting for up to SEEN_COALESCE_MS (or until SEEN_COALESCE_MAX_IDS ids are pending)
+    and writes them all in one transaction, so a burst of clicks costs one commit instead
+    of one per click. Callers wait on a Future for their own found/changed ids.
+    """
+
+    def __init__(self, database, window_ms=None, max_ids=None):
+        self.database = database
+        self.window = (SEEN_COALESCE_MS if window_ms is None else window_ms) / 1000
+        self.max_ids = max(1, max_ids or SEEN_COALESCE_MAX_IDS)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.requests = 0
+        self.transactions = 0
+        self.rows_changed = 0
+
+    def submit(self, listing_ids):
+        """Queues listing_ids to be marked seen; the Future resolves to {"found": [...], "changed": [...]}."""
+        future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="seen-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((list(dict.fromkeys(listing_ids)), future))
+        return future
+
+    def mark_seen(self, listing_ids, timeout=30):
+        return self.submit(listing_ids).result(timeout)
+
+    def close(self, timeout=5):
+        """Writes what is queued, then stops the writer thread."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def stats(self):
+        return {"requests": self.requests, "transactions": self.transactions, "rows_changed": self.rows_changed}
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            pending_ids = len(item[0])
+            deadline = time.monotonic() + self.window
+            stopping = False
+            while pending_ids < self.max_ids:
+                # Whatever queued up during the last commit goes in without waiting
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                pending_ids += len(item[0])
+            self._commit(batch)
+            if stopping:
+                return
+
+    def _commit(self, batch):
+        listing_ids = list(dict.fromkeys(listing_id for ids, _ in batch for listing_id in ids))
+        try:
+            with self.database.writer() as conn:
+                found, changed = mark_seen(conn.cursor(), listing_ids)
+        except Exception as e:
+            logger.error(f"Failed to write {len(listing_ids)} seen updates: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.requests += len(batch)
+        self.transactions += 1
+        self.rows_changed += len(changed)
+        if changed:
+            publish("seen", {"listing_ids": changed})
+        changed_ids = set(changed)
+        for ids, future in batch:
+            future.set_result({
+                "found": [listing_id for listing_id in ids if listing_id in found],
+                "changed": [listing_id for listing_id in ids if listing_id in changed_ids]
+            })
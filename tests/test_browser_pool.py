@@ -0,0 +1,57 @@
+import asyncio
+
+from fetch_listings import BrowserPool
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    async def close(self):
+        self.connected = False
+
+class FakeChromium:
+    """Stands in for playwright's chromium launcher; each launch takes a few loop turns."""
+
+    def __init__(self):
+        self.launched = []
+
+    async def launch(self, **kwargs):
+        await asyncio.sleep(0.01)
+        browser = FakeBrowser()
+        self.launched.append(browser)
+        return browser
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeChromium()
+
+    async def stop(self):
+        pass
+
+async def _ensure_many(pool, count):
+    return await asyncio.gather(*(pool._ensure_browser() for _ in range(count)))
+
+def test_concurrent_renders_launch_one_browser():
+    pool = BrowserPool(max_contexts=4)
+    pool._playwright = playwright = FakePlaywright()
+    try:
+        browsers = pool._run(_ensure_many(pool, 8))
+        assert len(playwright.chromium.launched) == 1
+        assert all(browser is browsers[0] for browser in browsers)
+    finally:
+        pool.close()
+
+def test_crashed_browser_is_relaunched_once():
+    pool = BrowserPool(max_contexts=4)
+    pool._playwright = playwright = FakePlaywright()
+    try:
+        first = pool._run(pool._ensure_browser())
+        first.connected = False
+        browsers = pool._run(_ensure_many(pool, 8))
+        assert len(playwright.chromium.launched) == 2
+        assert all(browser is browsers[0] is not first for browser in browsers)
+    finally:
+        pool.close()
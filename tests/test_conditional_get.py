@@ -0,0 +1,188 @@
+import io
+import json
+import os
+import sqlite3
+import threading
+from contextlib import redirect_stdout
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import fetch_listings
+from fetch_listings import RssListingSource
+from scheduler import SourceScheduler
+
+SAMPLE_FEED = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_feed.xml")
+
+class FeedServer:
+    """Local stand-in for a feed host that honours ETag/If-None-Match and Last-Modified/If-Modified-Since."""
+
+    def __init__(self, body, etag=True, last_modified=True):
+        self.requests = []
+        self.responses = []
+        self.version = 0
+        self.set_body(body, etag, last_modified)
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append({
+                    "path": self.path,
+                    "If-None-Match": self.headers.get("If-None-Match"),
+                    "If-Modified-Since": self.headers.get("If-Modified-Since"),
+                })
+                if (server.etag and self.headers.get("If-None-Match") == server.etag) or (
+                    server.last_modified and self.headers.get("If-Modified-Since") == server.last_modified
+                ):
+                    server.responses.append(304)
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                server.responses.append(200)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/rdf+xml")
+                self.send_header("Content-Length", str(len(server.body)))
+                if server.etag:
+                    self.send_header("ETag", server.etag)
+                if server.last_modified:
+                    self.send_header("Last-Modified", server.last_modified)
+                self.end_headers()
+                self.wfile.write(server.body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/feed.rdf"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def set_body(self, body, etag=True, last_modified=True):
+        self.version += 1
+        self.body = body
+        self.etag = f'"v{self.version}"' if etag else None
+        self.last_modified = formatdate(1_750_000_000 + self.version * 60, usegmt=True) if last_modified else None
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+@pytest.fixture(scope="module")
+def body():
+    with open(SAMPLE_FEED, "rb") as f:
+        return f.read()
+
+@pytest.fixture
+def serve(body):
+    servers = []
+
+    def start(**validators):
+        server = FeedServer(body, **validators)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+def _fetch(url, cache=None):
+    source = RssListingSource({"id": "test_feed", "name": "Test Feed", "type": "rss", "url": url, "region": "Miami", "keyword": "victrola"})
+    source.http_cache = cache
+    return source, source.fetch()
+
+def test_etag_and_last_modified_get_304(serve):
+    server = serve()
+    first, listings = _fetch(server.url)
+    assert server.responses == [200]
+    assert server.requests[0]["If-None-Match"] is None
+    assert server.requests[0]["If-Modified-Since"] is None
+    assert first.cache_status == "miss"
+    assert len(listings) == 2
+    assert first.http_validators["etag"] == server.etag
+    assert first.http_validators["last_modified"] == server.last_modified
+
+    second, listings = _fetch(server.url, first.http_validators)
+    assert server.responses == [200, 304]
+    assert server.requests[1]["If-None-Match"] == server.etag
+    assert server.requests[1]["If-Modified-Since"] == server.last_modified
+    assert second.cache_status == "hit"
+    assert listings == []
+    # A 304 keeps the validators it was sent
+    assert second.http_validators == first.http_validators
+
+@pytest.mark.parametrize("validator", ["etag", "last_modified"])
+def test_either_validator_alone_gets_304(serve, validator):
+    server = serve(etag=validator == "etag", last_modified=validator == "last_modified")
+    first, _ = _fetch(server.url)
+    second, listings = _fetch(server.url, first.http_validators)
+
+    assert server.responses == [200, 304]
+    sent = server.requests[1]
+    if validator == "etag":
+        assert sent["If-None-Match"] == server.etag
+        assert sent["If-Modified-Since"] is None
+    else:
+        assert sent["If-None-Match"] is None
+        assert sent["If-Modified-Since"] == server.last_modified
+    assert second.cache_status == "hit"
+    assert listings == []
+
+def test_changed_feed_is_downloaded_and_revalidated(serve, body):
+    server = serve()
+    first, _ = _fetch(server.url)
+    server.set_body(body.replace(b"$350", b"$325"))
+
+    second, listings = _fetch(server.url, first.http_validators)
+    assert server.responses == [200, 200]
+    assert second.cache_status == "miss"
+    assert len(listings) == 2
+    assert listings[0].price == "$325"
+    assert second.http_validators["etag"] == server.etag != first.http_validators["etag"]
+    assert second.http_validators["content_hash"] != first.http_validators["content_hash"]
+
+def test_unchanged_body_without_validators_skips_parse(serve):
+    server = serve(etag=False, last_modified=False)
+    first, _ = _fetch(server.url)
+    second, listings = _fetch(server.url, first.http_validators)
+
+    assert server.responses == [200, 200]
+    assert server.requests[1]["If-None-Match"] is None
+    assert server.requests[1]["If-Modified-Since"] is None
+    assert second.cache_status == "hit"
+    assert listings == []
+
+def _run(tmp_path, url):
+    sources_path = tmp_path / "sources.json"
+    sources_path.write_text(json.dumps([{"id": "test_feed", "name": "Test Feed", "type": "rss", "url": url, "region": "Miami", "keyword": "victrola"}]))
+    scheduler = SourceScheduler(rate_per_minute=1e9, burst=1e9, max_wait=0, mode="all")
+    with redirect_stdout(io.StringIO()):
+        return fetch_listings.fetch_and_save(scheduler=scheduler, sources_path=str(sources_path))
+
+def test_fetch_runs_persist_and_reuse_validators(serve, tmp_path, monkeypatch):
+    database_path = str(tmp_path / "listings.db")
+    monkeypatch.setattr(fetch_listings, "DATABASE_PATH", database_path)
+    server = serve()
+
+    first = _run(tmp_path, server.url)
+    assert first["inserted_count"] == 2
+    conn = sqlite3.connect(database_path)
+    try:
+        assert conn.execute("SELECT url, etag, last_modified FROM http_cache WHERE source_id = 'test_feed'").fetchone() == (
+            server.url, server.etag, server.last_modified
+        )
+
+        second = _run(tmp_path, server.url)
+        assert server.responses == [200, 304]
+        assert server.requests[1]["If-None-Match"] == server.etag
+        assert second["status"] == "success"
+        assert second["checked_count"] == 0
+        assert conn.execute("SELECT cache_status FROM source_runs WHERE log_id = ?", (second["log_id"],)).fetchone() == ("hit",)
+
+        # Validators belong to the URL they were issued for
+        _run(tmp_path, server.url + "?query=gramophone")
+        assert server.responses == [200, 304, 200]
+        assert server.requests[2]["If-None-Match"] is None
+        assert server.requests[2]["If-Modified-Since"] is None
+    finally:
+        conn.close()
@@ -0,0 +1,63 @@
+import pytest
+
+import app
+import fetch_listings
+from db import get_database
+from fetch_listings import ListingRecord, ingest_listings
+from response_cache import ResponseCache
+
+@pytest.mark.parametrize("sort_value", [0, 1750000000, -3, 12.5, 3.0, 1e-05, -2.5e-07, 1e300])
+def test_cursor_round_trips_value_and_type(sort_value):
+    decoded = app._decode_cursor(app._encode_cursor(sort_value, 42))
+    assert decoded == (sort_value, 42)
+    assert type(decoded[0]) is type(sort_value)
+
+@pytest.mark.parametrize("cursor", ["", "12:5", "1e-05:5", "x:1:5", "i:1.5:5", "f:abc:5", "i:1:2:3"])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        app._decode_cursor(cursor)
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    path = str(tmp_path / "listings.db")
+    monkeypatch.setattr(fetch_listings, "DATABASE_PATH", path)
+    fetch_listings.init_db()
+    monkeypatch.setattr(app, "DATABASE_PATH", path)
+    monkeypatch.setattr(app, "database", get_database(path))
+    # Generations restart with each database, so cached pages from another test must not match
+    monkeypatch.setattr(app, "response_cache", ResponseCache())
+    return TestClient(app.app)
+
+def test_score_pages_with_tiny_scores(client):
+    database = app.database
+    records = [
+        ListingRecord(
+            f"Victrola {i}", "$100", "Miami", "Test", f"https://miami.craigslist.org/atq/d/{i}/{7900000000 + i}.html",
+            fetch_listings.DEFAULT_IMAGE_URL, "2026-06-01", str(7900000000 + i), "victrola", 10000
+        )
+        for i in range(7)
+    ]
+    with database.writer() as conn:
+        ingest_listings(conn, records)
+        # Scores small enough that Python writes them in exponent notation
+        conn.executemany("UPDATE listings SET score = ? WHERE listing_id = ?", [
+            ((i % 3 + 1) * 1e-05, record.listing_id) for i, record in enumerate(records)
+        ])
+
+    seen_ids = []
+    cursor = None
+    while True:
+        params = {"sort": "score", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/listings", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        seen_ids.extend(listing["listing_id"] for listing in page["listings"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen_ids) == sorted(record.listing_id for record in records)
+    assert len(seen_ids) == len(set(seen_ids))
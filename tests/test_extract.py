@@ -0,0 +1,144 @@
+import os
+
+import pytest
+
+from fetch_listings import (
+    DEFAULT_IMAGE_URL,
+    EXTRACT_ROWS_JS,
+    CraigslistListingSource,
+    _extract_rows_bs4,
+    _extract_rows_lxml,
+)
+
+SAMPLE_SEARCH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_search.html")
+
+# The five rows of sample_search.html: two static results, two gallery cards and a legacy result-row
+EXPECTED_ROWS = [
+    {
+        "pid": None,
+        "title": "1915 Victor Victrola Talking Machine",
+        "href": "https://miami.craigslist.org/mdc/atq/d/miami-1915-victrola-talking-machine/7942000001.html",
+        "price": "$350",
+        "location": "Miami",
+        "datetime": None,
+        "meta": None,
+    },
+    {
+        "pid": None,
+        "title": "Antique Edison Cylinder Phonograph",
+        "href": "/mdc/atq/d/miami-antique-edison-phonograph/7942000002.html",
+        "price": "$1,450",
+        "location": "Coral Gables",
+        "datetime": None,
+        "meta": None,
+    },
+    {
+        "pid": "7942000003",
+        "title": "Columbia Grafonola Table Top Phonograph",
+        "href": "https://miami.craigslist.org/brw/atq/d/fort-lauderdale-columbia-grafonola/7942000003.html",
+        "price": "$275",
+        "location": None,
+        "datetime": None,
+        "meta": "6/18·Fort Lauderdale",
+    },
+    {
+        "pid": "7942000004",
+        "title": "Brass Gramophone Horn",
+        "href": "/pbc/atq/d/boca-raton-gramophone-horn/7942000004.html",
+        "price": None,
+        "location": None,
+        "datetime": None,
+        "meta": "6/19·Boca Raton",
+    },
+    {
+        "pid": "7942000005",
+        "title": "Victrola Needles - Tin of 100",
+        "href": "https://miami.craigslist.org/mdc/atq/d/hialeah-victrola-needles/7942000005.html",
+        "price": "$20",
+        "location": "(Hialeah)",
+        "datetime": "2026-06-17 09:15",
+        "meta": None,
+    },
+]
+
+@pytest.fixture(scope="module")
+def html():
+    with open(SAMPLE_SEARCH, "r", encoding="utf-8") as f:
+        return f.read()
+
+@pytest.fixture(scope="module")
+def browser_page():
+    sync_api = pytest.importorskip("playwright.sync_api")
+    with sync_api.sync_playwright() as playwright:
+        try:
+            browser = playwright.chromium.launch()
+        except Exception as e:
+            pytest.skip(f"Chromium is not available: {e}")
+        page = browser.new_page()
+        yield page
+        browser.close()
+
+def _extract_dom(html, page):
+    page.set_content(html)
+    return page.evaluate(EXTRACT_ROWS_JS)
+
+@pytest.fixture(params=["lxml", "bs4", "dom"])
+def extract(request):
+    if request.param == "lxml":
+        pytest.importorskip("lxml")
+        return _extract_rows_lxml
+    if request.param == "bs4":
+        pytest.importorskip("bs4")
+        return _extract_rows_bs4
+    page = request.getfixturevalue("browser_page")
+    return lambda html: _extract_dom(html, page)
+
+@pytest.fixture
+def source():
+    return CraigslistListingSource({
+        "id": "test_craigslist",
+        "name": "Test Craigslist",
+        "type": "craigslist",
+        "url": "https://miami.craigslist.org/search/atq?query=victrola",
+        "region": "Miami",
+        "keyword": "victrola",
+    })
+
+def test_raw_rows_match(extract, html):
+    assert extract(html) == EXPECTED_ROWS
+
+def test_normalized_fields(extract, html, source):
+    records = {record.listing_id: record for record in source.normalize_rows(extract(html))}
+    assert list(records) == ["7942000001", "7942000002", "7942000003", "7942000004", "7942000005"]
+
+    machine = records["7942000001"]
+    assert machine.title == "1915 Victor Victrola Talking Machine"
+    assert machine.price == "$350"
+    assert machine.price_cents == 35000
+    assert machine.location == "Miami"
+    assert machine.source == "Test Craigslist"
+    assert machine.keyword == "victrola"
+
+    # Thousands separators are part of the price text
+    assert records["7942000002"].price_cents == 145000
+    # The <time> datetime wins over the meta date
+    assert records["7942000005"].posted_at == "2026-06-17"
+    # Gallery cards carry no location element; the meta date is used and the region fills in
+    gallery = records["7942000003"]
+    assert gallery.posted_at.endswith("-06-18")
+    assert gallery.location == "Miami"
+
+def test_missing_price(extract, html, source):
+    horn = next(record for record in source.normalize_rows(extract(html)) if record.listing_id == "7942000004")
+    assert horn.price == "N/A"
+    assert horn.price_cents is None
+
+def test_missing_image_falls_back(extract, html, source):
+    # Neither the static results nor the horn card have an image
+    assert all(record.image_url == DEFAULT_IMAGE_URL for record in source.normalize_rows(extract(html)))
+
+def test_relative_urls_are_made_absolute(extract, html, source):
+    records = {record.listing_id: record for record in source.normalize_rows(extract(html))}
+    assert records["7942000002"].url == "https://miami.craigslist.org/mdc/atq/d/miami-antique-edison-phonograph/7942000002.html"
+    assert records["7942000004"].url == "https://miami.craigslist.org/pbc/atq/d/boca-raton-gramophone-horn/7942000004.html"
+    assert all(record.url.startswith("https://miami.craigslist.org/") for record in records.values())
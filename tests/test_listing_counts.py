@@ -0,0 +1,62 @@
+import pytest
+
+import fetch_listings
+from db import get_database
+from fetch_listings import ListingRecord, ingest_listings, read_listing_counts
+from retention import archive_listings
+from seen_writer import mark_seen
+
+def _records(start, count):
+    return [
+        ListingRecord(
+            f"Victor Victrola No. {i}", "$100", "Miami", "Test", f"https://miami.craigslist.org/atq/d/{i}/{7900000000 + i}.html",
+            fetch_listings.DEFAULT_IMAGE_URL, "2026-06-01", str(7900000000 + i), "victrola", 10000
+        )
+        for i in range(start, start + count)
+    ]
+
+def _counts(database):
+    with database.reader() as conn:
+        cursor = conn.cursor()
+        stored = read_listing_counts(cursor)
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(seen = 0), 0) FROM listings")
+        return stored, tuple(cursor.fetchone())
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    path = str(tmp_path / "listings.db")
+    monkeypatch.setattr(fetch_listings, "DATABASE_PATH", path)
+    fetch_listings.init_db()
+    return get_database(path)
+
+def test_counters_follow_ingest_seen_and_archive(database):
+    with database.writer() as conn:
+        ingest_listings(conn, _records(0, 50), chunk_size=20)
+        # Repeats are skipped and must not count twice
+        ingest_listings(conn, _records(40, 20))
+    stored, actual = _counts(database)
+    assert stored == actual == (60, 60)
+
+    with database.writer() as conn:
+        mark_seen(conn.cursor(), [str(7900000000 + i) for i in range(10)])
+        # Already seen rows do not move the counter again
+        mark_seen(conn.cursor(), [str(7900000000 + i) for i in range(5)])
+    stored, actual = _counts(database)
+    assert stored == actual == (60, 50)
+
+    with database.reader() as conn:
+        row_ids = [row[0] for row in conn.execute("SELECT id FROM listings ORDER BY id LIMIT 15")]
+    with database.writer() as conn:
+        assert archive_listings(conn.cursor(), row_ids) == 15
+    stored, actual = _counts(database)
+    assert stored == actual == (45, 45)
+
+def test_counters_are_seeded_from_existing_rows(database):
+    with database.writer() as conn:
+        ingest_listings(conn, _records(0, 8))
+        mark_seen(conn.cursor(), [str(7900000000 + i) for i in range(3)])
+        conn.execute("DELETE FROM app_meta WHERE key IN ('listing_count', 'unseen_count')")
+
+    fetch_listings.init_db()
+    stored, actual = _counts(database)
+    assert stored == actual == (8, 5)
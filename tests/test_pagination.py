@@ -0,0 +1,94 @@
+import io
+import json
+import sqlite3
+from contextlib import redirect_stdout
+
+import pytest
+
+import fetch_listings
+from fetch_listings import CraigslistListingSource
+from scheduler import SourceScheduler
+
+SEARCH_URL = "https://miami.craigslist.org/search/atq?query=victrola"
+
+def _rows(page, count=3):
+    return [
+        {
+            "pid": None,
+            "title": f"Victor Victrola page {page} no. {i}",
+            "href": f"https://miami.craigslist.org/mdc/atq/d/victrola/{7942000000 + page * 100 + i}.html",
+            "price": "$300",
+            "location": "Miami",
+            "datetime": None,
+            "meta": None,
+        }
+        for i in range(count)
+    ]
+
+class FakePool:
+    """Stands in for BrowserPool: each render returns the next page's rows, or raises it if it is an error."""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.urls = []
+        self.launch_seconds = 0.0
+
+    def render(self, url, evaluate=None):
+        self.urls.append(url)
+        page = self.pages.pop(0)
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+    def close(self):
+        pass
+
+def _source(pool, max_pages=5):
+    return CraigslistListingSource(
+        {"id": "miami_cl", "name": "Miami CL", "type": "craigslist", "url": SEARCH_URL,
+         "region": "Miami", "keyword": "victrola", "max_pages": max_pages},
+        browser_pool=pool,
+    )
+
+def test_later_page_error_keeps_pages_already_read():
+    pool = FakePool([("Miami antiques", _rows(1)), ("Miami antiques", _rows(2)), TimeoutError("page 3 timed out")])
+    source = _source(pool)
+
+    listings = source.fetch()
+    assert [listing.title for listing in listings] == [row["title"] for row in _rows(1) + _rows(2)]
+    assert source.pages_fetched == 2
+    assert source.page_error == "stopped after page 2: page 3 timed out"
+
+def test_first_page_error_fails_the_source():
+    source = _source(FakePool([TimeoutError("page 1 timed out")]))
+    with pytest.raises(TimeoutError):
+        source.fetch()
+
+def test_block_on_a_later_page_fails_the_source():
+    source = _source(FakePool([("Miami antiques", _rows(1)), ("blocked", [])]))
+    with pytest.raises(PermissionError):
+        source.fetch()
+
+def test_cut_short_crawl_is_ingested_and_logged(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch_listings, "DATABASE_PATH", str(tmp_path / "listings.db"))
+    sources_path = tmp_path / "sources.json"
+    sources_path.write_text(json.dumps([{
+        "id": "miami_cl", "name": "Miami CL", "type": "craigslist", "url": SEARCH_URL,
+        "region": "Miami", "keyword": "victrola", "max_pages": 5,
+    }]))
+    pool = FakePool([("Miami antiques", _rows(1)), RuntimeError("no result rows matched")])
+    scheduler = SourceScheduler(rate_per_minute=1e9, burst=1e9, max_wait=0, mode="all")
+
+    with redirect_stdout(io.StringIO()):
+        summary = fetch_listings.fetch_and_save(browser_pool=pool, scheduler=scheduler, sources_path=str(sources_path))
+
+    assert summary["status"] == "success"
+    assert summary["inserted_count"] == 3
+    conn = sqlite3.connect(fetch_listings.DATABASE_PATH)
+    try:
+        assert conn.execute("SELECT status, inserted_count, error_message FROM source_runs WHERE log_id = ?", (summary["log_id"],)).fetchone() == (
+            "success", 3, "stopped after page 1: no result rows matched"
+        )
+        assert conn.execute("SELECT consecutive_failures FROM source_health WHERE source_id = 'miami_cl'").fetchone() == (0,)
+    finally:
+        conn.close()
@@ -0,0 +1,102 @@
+import gzip
+import json
+import os
+
+import pytest
+
+import fetch_listings
+import retention
+from db import get_database
+from export_static import export_static
+
+LISTING_SQL = f"""
+    INSERT INTO listings (id, title, price, location, source, url, listing_id, posted_at, posted_ts, change_seq, canonical_id, seen, first_seen_at)
+    VALUES (?1, ?2, '$100', 'Miami', ?3, ?4, ?5, ?6, {fetch_listings.POSTED_TS_SQL.format(posted_at='?6')}, ?7, ?8, ?9, ?10)
+"""
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    path = str(tmp_path / "listings.db")
+    monkeypatch.setattr(fetch_listings, "DATABASE_PATH", path)
+    fetch_listings.init_db()
+    return get_database(path)
+
+def _insert(database, rows):
+    with database.writer() as conn:
+        cursor = conn.cursor()
+        first_seq = fetch_listings.reserve_change_seq(cursor, len(rows))
+        for offset, (row_id, source, posted_at, canonical_id, seen, first_seen_at) in enumerate(rows):
+            url = f"https://miami.craigslist.org/atq/d/{row_id}/{7900000000 + row_id}.html"
+            cursor.execute(LISTING_SQL, (
+                row_id, f"Victrola {row_id}", source, url, str(7900000000 + row_id),
+                posted_at, first_seq + offset, canonical_id, seen, first_seen_at
+            ))
+
+def test_expiry_is_opt_in(database, monkeypatch):
+    monkeypatch.setattr(retention, "RETENTION_LISTING_DAYS", 0)
+    monkeypatch.setattr(retention, "RETENTION_SEEN_DAYS", 0)
+    monkeypatch.setattr(retention, "RETENTION_LOG_DAYS", 0)
+    _insert(database, [(1, "A", "2001-01-01", 1, 1, "2001-01-01 00:00:00")])
+
+    assert retention.apply_retention(database)["archived"] == 0
+    with database.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0] == 1
+
+def test_expired_listing_ids_by_age_and_seen(database):
+    _insert(database, [
+        (1, "A", "2001-01-01", 1, 0, "2001-01-01 00:00:00"),   # old
+        (2, "A", "2026-01-01", 2, 1, "2026-01-01 00:00:00"),   # seen, older than the seen cutoff
+        (3, "A", "2026-01-01", 3, 0, "2026-01-01 00:00:00"),   # unseen, within the listing cutoff
+        (4, "A", "someday", 4, 0, "2001-01-01 00:00:00"),      # undated, first seen long ago
+        (5, "A", "someday", 5, 1, "2099-01-01 00:00:00"),      # undated, first seen recently
+    ])
+    with database.reader() as conn:
+        cursor = conn.cursor()
+        assert retention.expired_listing_ids(cursor, 10, listing_days=3650, seen_days=30) == [1, 2, 4]
+        assert retention.expired_listing_ids(cursor, 10, listing_days=3650, seen_days=0) == [1, 4]
+        assert retention.expired_listing_ids(cursor, 2, listing_days=3650, seen_days=30) == [1, 2]
+        assert retention.expired_listing_ids(cursor, 10, listing_days=0, seen_days=0) == []
+
+def test_archive_repoints_group_and_bumps_change_seq(database):
+    # The canonical listing sits in another source's shard than the rest of its group
+    _insert(database, [
+        (1, "A", "2026-05-01", 1, 0, None),
+        (2, "B", "2026-06-01", 1, 0, None),
+        (3, "B", "2026-06-02", 1, 0, None),
+        (4, "B", "2026-06-03", 4, 0, None),
+    ])
+    with database.reader() as conn:
+        before = dict(conn.execute("SELECT id, change_seq FROM listings").fetchall())
+
+    with database.writer() as conn:
+        assert retention.archive_listings(conn.cursor(), [1]) == 1
+
+    with database.reader() as conn:
+        rows = {row[0]: (row[1], row[2]) for row in conn.execute("SELECT id, canonical_id, change_seq FROM listings")}
+        assert [row[0] for row in conn.execute("SELECT id FROM listings_archive")] == [1]
+    assert rows[2][0] == rows[3][0] == 2
+    assert rows[2][1] > max(before.values()) and rows[3][1] > max(before.values())
+    # Untouched rows keep their sequence number
+    assert rows[4] == (4, before[4])
+
+def test_export_rebuilds_shards_with_repointed_rows(database, tmp_path):
+    _insert(database, [
+        (1, "A", "2026-05-01", 1, 0, None),
+        (2, "B", "2026-06-01", 1, 0, None),
+        (3, "B", "2026-06-02", 1, 0, None),
+        (4, "C", "2026-06-03", 4, 0, None),
+    ])
+    export_dir = str(tmp_path / "snapshot")
+    assert export_static(export_dir=export_dir, database_path=fetch_listings.DATABASE_PATH)["rebuilt"] == 3
+
+    with database.writer() as conn:
+        retention.archive_listings(conn.cursor(), [1])
+
+    # Source A's shard disappears, B's is rebuilt for the new canonical_id, C's is reused
+    assert export_static(export_dir=export_dir, database_path=fetch_listings.DATABASE_PATH)["rebuilt"] == 1
+    with open(os.path.join(export_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    shard = next(shard for shard in manifest["shards"] if shard["source"] == "B")
+    with open(os.path.join(export_dir, shard["gzip"]), "rb") as f:
+        rows = json.loads(gzip.decompress(f.read()))
+    assert {row["id"]: row["canonical_id"] for row in rows} == {2: 2, 3: 2}
@@ -0,0 +1,191 @@
+import queue
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import fetch_listings
+import scheduler
+from scheduler import SourceDeferred, SourceScheduler, TokenBucket, backoff_delay
+
+class FakeClock:
+    """Stands in for scheduler.Clock: sleep() advances now() instead of blocking."""
+
+    def __init__(self, now=1_000_000.0):
+        self.current = now
+        self.sleeps = []
+
+    def now(self):
+        return self.current
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.current += seconds
+
+    def advance(self, seconds):
+        self.current += seconds
+
+class BoundRng:
+    """uniform() always returns its low or high bound, to pin jitter at either end."""
+
+    def __init__(self, high):
+        self.high = high
+
+    def uniform(self, low, high):
+        return high if self.high else low
+
+def _source(url="https://miami.craigslist.org/search/atq", source_id="miami"):
+    return SimpleNamespace(id=source_id, name=source_id.title(), url=url)
+
+def test_token_bucket_refills_at_rate_up_to_capacity():
+    bucket = TokenBucket(rate=0.1, capacity=3)
+    assert [bucket.try_acquire(0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire(0.0) == pytest.approx(10.0)
+    assert bucket.try_acquire(5.0) == pytest.approx(5.0)
+    assert bucket.try_acquire(10.0) == 0.0
+
+    # A long idle stretch refills only to capacity
+    assert [bucket.try_acquire(10_000.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire(10_000.0) > 0
+
+def test_acquire_sleeps_for_the_next_token():
+    clock = FakeClock()
+    limiter = SourceScheduler(clock=clock, rate_per_minute=6, burst=2, max_wait=60, mode="all")
+    url = "https://miami.craigslist.org/search/atq"
+
+    limiter.acquire(url)
+    limiter.acquire(url)
+    assert clock.sleeps == []
+    limiter.acquire(url)
+    assert clock.sleeps == [pytest.approx(10.0)]
+
+def test_acquire_defers_past_max_wait():
+    clock = FakeClock()
+    limiter = SourceScheduler(clock=clock, rate_per_minute=1, burst=1, max_wait=30, mode="all")
+    url = "https://miami.craigslist.org/search/atq"
+
+    limiter.acquire(url)
+    with pytest.raises(SourceDeferred):
+        limiter.acquire(url)
+    assert clock.sleeps == []
+
+@pytest.mark.parametrize("failures", range(1, 12))
+def test_backoff_jitter_stays_within_half_and_full_delay(failures):
+    delay = min(3600, 60 * 2 ** (failures - 1))
+    assert backoff_delay(failures, 60, 3600, BoundRng(high=False)) == pytest.approx(delay / 2)
+    assert backoff_delay(failures, 60, 3600, BoundRng(high=True)) == pytest.approx(delay)
+    rng = random.Random(failures)
+    for _ in range(100):
+        assert delay / 2 <= backoff_delay(failures, 60, 3600, rng) <= delay
+
+def test_record_failure_backs_off_source_and_blocked_host(monkeypatch):
+    monkeypatch.setattr(scheduler, "SCHEDULER_FAILURE_BACKOFF_SECONDS", 300)
+    monkeypatch.setattr(scheduler, "SCHEDULER_BLOCK_BACKOFF_SECONDS", 1800)
+    monkeypatch.setattr(scheduler, "SCHEDULER_MAX_BACKOFF_SECONDS", 86400)
+    clock = FakeClock()
+    limiter = SourceScheduler(clock=clock, rng=BoundRng(high=True), mode="all")
+    source = _source()
+
+    retry_at = limiter.record_failure(source, RuntimeError("timeout"))
+    assert retry_at == pytest.approx(clock.now() + 300)
+    retry_at = limiter.record_failure(source, RuntimeError("timeout"))
+    assert retry_at == pytest.approx(clock.now() + 600)
+    assert "miami.craigslist.org" not in limiter.hosts
+
+    limiter.record_failure(source, PermissionError("blocked"))
+    host_state = limiter.hosts["miami.craigslist.org"]
+    assert host_state["next_eligible_at"] == pytest.approx(clock.now() + 1800)
+    with pytest.raises(SourceDeferred):
+        limiter.acquire(source.url)
+
+def test_ewma_yield_sets_the_adaptive_poll_interval(monkeypatch):
+    monkeypatch.setattr(scheduler, "ADAPTIVE_MIN_INTERVAL_SECONDS", 600)
+    monkeypatch.setattr(scheduler, "ADAPTIVE_MAX_INTERVAL_SECONDS", 86400)
+    monkeypatch.setattr(scheduler, "ADAPTIVE_TARGET_NEW_PER_POLL", 1)
+    monkeypatch.setattr(scheduler, "ADAPTIVE_EWMA_ALPHA", 0.5)
+    clock = FakeClock()
+    limiter = SourceScheduler(clock=clock, mode="adaptive")
+    source = _source()
+    state = limiter.sources
+
+    # The first success is only a baseline
+    limiter.record_success(source, inserted=40)
+    assert state["miami"]["yield_rate"] is None
+    assert state["miami"]["poll_interval"] == 600
+
+    clock.advance(3600)
+    limiter.record_success(source, inserted=2)
+    assert state["miami"]["yield_rate"] == pytest.approx(2.0)
+    assert state["miami"]["poll_interval"] == pytest.approx(1800)
+
+    clock.advance(3600)
+    limiter.record_success(source, inserted=0)
+    assert state["miami"]["yield_rate"] == pytest.approx(1.0)
+    assert state["miami"]["poll_interval"] == pytest.approx(3600)
+    assert state["miami"]["next_poll_at"] == pytest.approx(clock.now() + 3600)
+
+    # Not due yet, but within the slack of the next poll it is taken now
+    monkeypatch.setattr(scheduler, "ADAPTIVE_SLACK_SECONDS", 300)
+    assert limiter.partition([source])[0] == []
+    clock.advance(3400)
+    assert limiter.partition([source])[0] == [source]
+
+    # A busy source is clamped to the minimum interval, a dead one to the maximum
+    assert limiter.poll_interval(100.0) == 600
+    assert limiter.poll_interval(0.0) == 86400
+
+def test_local_files_skip_host_tracking(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch_listings, "DATABASE_PATH", str(tmp_path / "listings.db"))
+    fetch_listings.init_db()
+    clock = FakeClock()
+    limiter = SourceScheduler(clock=clock, mode="all")
+    source = _source(url=f"file://{tmp_path}/feed.xml", source_id="local")
+
+    limiter.acquire(source.url)
+    limiter.record_failure(source, PermissionError("blocked"))
+    limiter.record_success(source, inserted=1)
+    assert "" not in limiter.hosts
+    assert "" not in limiter.buckets
+
+    conn = fetch_listings.connect_db()
+    try:
+        limiter.save(conn.cursor(), source)
+        conn.commit()
+        assert conn.execute("SELECT COUNT(*) FROM host_health").fetchone()[0] == 0
+        assert conn.execute("SELECT host, blocked_count FROM source_health WHERE source_id = 'local'").fetchone() == ("", 1)
+    finally:
+        conn.close()
+
+class RaisingSource:
+    """A source whose stream fails with the given error once its first listing is asked for."""
+
+    def __init__(self, error, url="https://miami.craigslist.org/search/atq"):
+        self.id = "miami"
+        self.name = "Miami"
+        self.url = url
+        self.error = error
+        self.before_page = None
+        self.blocked = False
+
+    def stream(self):
+        raise self.error
+        yield
+
+@pytest.mark.parametrize("error", [SourceDeferred("rate limit"), fetch_listings.FetchCancelled()])
+def test_deferred_or_cancelled_stream_is_not_a_failure(error):
+    limiter = SourceScheduler(clock=FakeClock(), mode="all")
+    source = RaisingSource(error)
+
+    with pytest.raises(type(error)):
+        fetch_listings._stream_source(source, fetch_listings.HostLimiter(1), limiter, queue.Queue(), None)
+    assert limiter.sources.get("miami", {}).get("consecutive_failures", 0) == 0
+    assert limiter.eligible_at(source) <= limiter.clock.now()
+
+def test_failed_stream_backs_the_source_off():
+    limiter = SourceScheduler(clock=FakeClock(), mode="all")
+    source = RaisingSource(RuntimeError("timeout"))
+
+    with pytest.raises(RuntimeError):
+        fetch_listings._stream_source(source, fetch_listings.HostLimiter(1), limiter, queue.Queue(), None)
+    assert limiter.sources["miami"]["consecutive_failures"] == 1
+    assert limiter.eligible_at(source) > limiter.clock.now()
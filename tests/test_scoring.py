@@ -0,0 +1,56 @@
+import pytest
+
+from scoring import ScoringModel
+
+MACHINES = [
+    ("Columbia Grafonola", 35000),
+    ("Victor Victrola VV-XI mahogany", 40000),
+    ("Antique hand crank phonograph", 30000),
+    ("Edison Diamond Disc phonograph", 45000),
+]
+
+PARTS = [
+    ("Victrola horn", 15000),
+    ("Victrola crank handle", 2500),
+    ("Edison phonograph reproducer", 9000),
+    ("Victrola needles tin", 1000),
+    ("Gramophone soundbox", 8000),
+    ("Brass Gramophone Horn", 12000),
+]
+
+RECORDS = [
+    ("Lot of 50 78s records", 5000),
+    ("Victrola with records", 30000),
+]
+
+@pytest.fixture(scope="module")
+def model():
+    return ScoringModel()
+
+def _score(model, listings):
+    scores, classifications = model.score_batch([title for title, _ in listings], [price for _, price in listings])
+    return dict(zip((title for title, _ in listings), zip(scores, classifications)))
+
+def test_machines_are_classified_as_machines(model):
+    for title, (_, classification) in _score(model, MACHINES).items():
+        assert classification == "MACHINE", title
+
+@pytest.mark.parametrize("listings, expected", [(PARTS, "PARTS"), (RECORDS, "RECORDS")])
+def test_part_and_record_terms_win_over_machine_terms(model, listings, expected):
+    for title, (_, classification) in _score(model, listings).items():
+        assert classification == expected, title
+
+@pytest.mark.parametrize("listings", [PARTS, RECORDS])
+def test_parts_and_records_rank_below_every_complete_machine(model, listings):
+    lowest_machine = min(score for score, _ in _score(model, MACHINES).values())
+    for title, (score, _) in _score(model, listings).items():
+        assert score < lowest_machine, title
+
+def test_reproduction_terms_win_over_every_other_class(model):
+    (score, classification), = _score(model, [("Victrola style bluetooth record player", 6000)]).values()
+    assert classification == "REPRODUCTION"
+    assert score < 5
+
+def test_titles_without_class_terms_are_unknown(model):
+    (_, classification), = _score(model, [("Oak dresser", 20000)]).values()
+    assert classification == "UNKNOWN"